@@ -8,9 +8,301 @@ BFC (Bug-Fixing Commit) 自动识别模块
 import re
 import os
 import json
+import hashlib
+import sqlite3
+import subprocess
+import multiprocessing
+from bisect import bisect_right
+from itertools import accumulate, islice
 from datetime import datetime, timedelta
 from typing import List, Dict, Set
-from git import Repo
+from git import GitCommandError, Repo
+
+try:
+    # Python 3.11+
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# git log 中每个提交以 NUL 开头，头部字段以 \x1f 分隔：hash, 父提交, 提交时间, 作者, 邮箱, message
+LOG_FORMAT = '%x00%H%x1f%P%x1f%ct%x1f%an%x1f%ae%x1f%B%x1f'
+
+
+# 提交记录的开头：NUL 后面紧跟提交 hash 和 \x1f（diff 中的文本文件也可能包含 NUL）
+RECORD_START = re.compile(rb'\0(?=[0-9a-f]{40}\x1f)')
+RECORD_START_LEN = 42
+
+
+def iter_log_records(stdout, chunk_size: int = 1 << 20):
+    """
+    从 git log 输出流中逐个切出提交记录（bytes，不含开头的 NUL）
+    """
+    buf = bytearray()
+    # buf 中 scanned 之前（除开头外）没有记录开头
+    scanned = 1
+    while True:
+        chunk = stdout.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        start = 0
+        for match in RECORD_START.finditer(buf, scanned):
+            yield bytes(buf[start + 1:match.start()])
+            start = match.start()
+        del buf[:start]
+        # 结尾的 NUL 之后的 hash 可能还没读到，下次从这里重新查找
+        scanned = max(len(buf) - RECORD_START_LEN + 1, 1)
+
+    if len(buf) > 1:
+        yield bytes(buf[1:])
+
+
+def parse_log_record(record: bytes) -> tuple:
+    """
+    解析 git log -p --numstat 输出中的一个提交记录
+
+    Returns:
+        (header, stats, file_diffs)
+        header: (hash, 父提交列表, 提交时间戳, 作者, 邮箱, message)
+        stats: (修改的文件, 新增行数, 删除行数, 是否包含重命名)
+        file_diffs: 每个文件的 diff 文本（从第一个 @@ 开始，没有 hunk 的文件如二进制文件、纯重命名不包含在内）
+    """
+    text = record.decode('utf-8', errors='ignore')
+    commit_hash, parents, committed_date, author, author_email, rest = text.split('\x1f', 5)
+    message, _, rest = rest.partition('\x1f')
+    stat_text, _, diff_text = rest.partition('\ndiff --git ')
+
+    file_diffs = []
+    if diff_text:
+        for file_diff in diff_text.split('\ndiff --git '):
+            hunk_start = file_diff.find('\n@@')
+            if hunk_start >= 0:
+                file_diffs.append(file_diff[hunk_start + 1:])
+
+    header = (commit_hash, parents.split(), int(committed_date), author, author_email, message)
+    return header, parse_numstat(stat_text), file_diffs
+
+
+def parse_numstat(stat_text: str) -> tuple:
+    """
+    统计 --numstat 输出
+
+    Returns:
+        (修改的文件, 新增行数, 删除行数, 是否包含重命名)
+    """
+    files = []
+    insertions = deletions = 0
+    renamed = False
+    for line in stat_text.split('\n'):
+        fields = line.split('\t', 2)
+        if len(fields) < 3:
+            continue
+        files.append(fields[2])
+        renamed = renamed or ' => ' in fields[2]
+        # 二进制文件的增删行数为 "-"
+        if fields[0] != '-':
+            insertions += int(fields[0])
+            deletions += int(fields[1])
+    return files, insertions, deletions, renamed
+
+
+def iter_batches(iterable, size: int):
+    """
+    把 iterable 切成长度为 size 的列表（最后一批可能更短）
+    """
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def literal_prefixes(items) -> List[str]:
+    """
+    正则解析树开头的字面量前缀，每个分支一个（分支不以字面量开头时为空串）
+    """
+    prefix = ''
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            prefix += chr(av)
+        elif op is sre_constants.BRANCH:
+            return [prefix + tail for branch in av[1] for tail in literal_prefixes(branch)]
+        else:
+            break
+    return [prefix]
+
+
+class CodePatternMatcher:
+    """
+    多模式匹配代码安全模式（类似 Hyperscan 的字面量预过滤）
+    每个模式取各分支的字面量前缀，diff 转小写后用子串查找确认前缀出现，只对前缀出现的模式运行正则，
+    结果与逐个模式 re.search(pattern, text, re.IGNORECASE) 相同
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        # 每个模式的小写字面量前缀，有分支没有前缀（或前缀含非ASCII字符）时为 None，总是运行正则
+        self.prefixes = []
+        for pattern in self.patterns:
+            prefixes = set(literal_prefixes(sre_parse.parse(pattern.pattern, pattern.flags)))
+            if '' in prefixes or not all(prefix.isascii() for prefix in prefixes):
+                self.prefixes.append(None)
+            else:
+                self.prefixes.append([prefix.lower() for prefix in prefixes])
+
+    def search(self, text: str) -> List[int]:
+        """
+        Returns:
+            在 text 中出现的模式下标（升序）
+        """
+        # 非ASCII文本中忽略大小写的匹配不等同于小写后的子串查找，不做预过滤
+        lowered = text.lower() if text.isascii() else None
+        found = []
+        for i, (pattern, prefixes) in enumerate(zip(self.patterns, self.prefixes)):
+            if lowered is not None and prefixes is not None and not any(p in lowered for p in prefixes):
+                continue
+            if pattern.search(text):
+                found.append(i)
+        return found
+
+
+class KeywordMatcher:
+    """
+    批量查找文本中出现的关键词（子串，不区分大小写的文本对小写关键词）
+    一批文本转小写后用 NUL 拼成一个字符串，每个关键词只做一次子串扫描，命中一条文本后直接跳到下一条，
+    Python 层的开销只与（关键词, 文本）的命中数有关，而不是文本数乘关键词数
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        # 关键词 -> 下标（同一关键词可能出现多次）
+        self._indices = {}
+        for i, keyword in enumerate(self.keywords):
+            self._indices.setdefault(keyword, []).append(i)
+
+    def match(self, text: str) -> List[int]:
+        """
+        Returns:
+            text 中出现的关键词下标（升序）
+        """
+        lowered = text.lower()
+        return sorted(i for keyword, indices in self._indices.items() if keyword in lowered for i in indices)
+
+    def match_batch(self, texts: List[str]) -> List[List[int]]:
+        """
+        Returns:
+            每条文本中出现的关键词下标（升序）
+        """
+        lowered = [text.lower() for text in texts]
+        # 每条文本在拼接字符串中的起点，最后一个是结尾之后
+        starts = list(accumulate((len(text) + 1 for text in lowered), initial=0))
+        joined = '\0'.join(lowered)
+
+        hits = [[] for _ in texts]
+        for keyword, indices in self._indices.items():
+            pos = joined.find(keyword)
+            while pos >= 0:
+                i = bisect_right(starts, pos) - 1
+                hits[i].extend(indices)
+                pos = joined.find(keyword, starts[i + 1])
+
+        for text_hits in hits:
+            text_hits.sort()
+        return hits
+
+
+# 关键词优先级：(security_keywords 中的键, 分数, 名称)
+KEYWORD_TIERS = [('high', 10, '高'), ('medium', 5, '中'), ('low', 2, '低')]
+
+# 默认排除的文件（测试文件、文档等），只修改这些文件的候选会被过滤
+DEFAULT_EXCLUDE_PATTERNS = [
+    r'test.*\.py$', r'.*_test\.py$', r'.*Test\.java$',
+    r'README', r'CHANGELOG', r'\.md$',
+    r'\.txt$', r'\.yml$', r'\.yaml$'
+]
+
+
+def all_files_excluded(files: List[str], exclude_patterns: List[str]) -> bool:
+    """
+    提交修改的文件是否全部被排除（没有修改文件时也视为排除）
+    """
+    return all(
+        any(re.search(pattern, f) for pattern in exclude_patterns)
+        for f in files
+    )
+
+
+class BFCIndex:
+    """
+    候选BFC的 SQLite 索引
+    保存每个候选提交的打分结果和修改的文件，以及每个分支上次扫描到的提交（水位）。
+    水位可达的提交都已扫描过，之后只需对新提交打分
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS watermarks (branch TEXT PRIMARY KEY, commit_hash TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS candidates (commit_hash TEXT PRIMARY KEY, total_score INTEGER,
+                                                   scan INTEGER, pos INTEGER, candidate TEXT) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS candidates_order ON candidates (total_score DESC, scan DESC, pos);
+        ''')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM candidates').fetchone()[0]
+
+    def get_meta(self, key: str) -> str:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+        self.conn.commit()
+
+    def reset(self):
+        """ 清空水位和候选（打分规则变化后需要重新扫描） """
+        self.conn.execute('DELETE FROM watermarks')
+        self.conn.execute('DELETE FROM candidates')
+        self.conn.commit()
+
+    def watermarks(self) -> Dict[str, str]:
+        return dict(self.conn.execute('SELECT branch, commit_hash FROM watermarks'))
+
+    def add_scan(self, branch: str, head: str, candidates: List[Dict]):
+        """
+        记录一次扫描：候选按扫描顺序（新提交在前）保存，并把分支的水位移到 head
+        """
+        scan = self.conn.execute('SELECT COALESCE(MAX(scan), 0) + 1 FROM candidates').fetchone()[0]
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?)', (
+                (c['commit_hash'], c['total_score'], scan, pos, json.dumps(c, ensure_ascii=False))
+                for pos, c in enumerate(candidates)))
+            self.conn.execute('INSERT OR REPLACE INTO watermarks VALUES (?, ?)', (branch, head))
+
+    def iter_candidates(self):
+        """ 按分数从高到低（同分时新提交在前）遍历候选 """
+        for (candidate,) in self.conn.execute(
+                'SELECT candidate FROM candidates ORDER BY total_score DESC, scan DESC, pos'):
+            yield json.loads(candidate)
+
+    def close(self):
+        self.conn.close()
+
+
+# 扫描进程中使用的识别器（只用到关键词和代码模式）
+_scan_identifier = None
+
+
+def _init_scan_worker(identifier):
+    global _scan_identifier
+    _scan_identifier = identifier
+
+
+def _score_commit_records(records: List[bytes]):
+    return _scan_identifier._score_commit_records(records)
 
 
 class BFCIdentifier:
@@ -19,15 +311,21 @@ class BFCIdentifier:
     组合多种方法：commit message关键词、代码模式、PR标签等
     """
     
-    def __init__(self, repo_path: str):
+    def __init__(self, repo_path: str, index_path: str = None):
         """
         初始化BFC识别器
         
         Args:
             repo_path: Git仓库路径
+            index_path: 候选BFC索引路径（默认为仓库旁的 <仓库名>-bfc-index.db）
         """
         self.repo_path = repo_path
         self.repo = Repo(repo_path)
+        if index_path is None:
+            repo_dir = os.path.abspath(repo_path)
+            index_path = os.path.join(os.path.dirname(repo_dir), f'{os.path.basename(repo_dir)}-bfc-index.db')
+        self.index_path = index_path
+        self._index = None
         
         # 安全关键词（优先级排序）
         self.security_keywords = {
@@ -46,6 +344,9 @@ class BFCIdentifier:
             ]
         }
         
+        # 修复类词汇（与安全关键词同时出现时加分）
+        self.fix_words = ['fix', 'patch', 'resolve', 'correct', 'address']
+        
         # 代码安全模式（正则表达式）
         self.security_code_patterns = [
             # SQL注入修复
@@ -77,71 +378,277 @@ class BFCIdentifier:
             (r'Path\.normalize|canonicalize', 'Path Traversal Prevention'),
             (r'FilenameUtils\.normalize', 'Filename Validation'),
         ]
+        self._code_matcher = CodePatternMatcher([pattern for pattern, _ in self.security_code_patterns])
+        self._build_keyword_matcher()
+
+    def __getstate__(self):
+        # 传给扫描进程时不带 Repo 对象和索引连接
+        state = self.__dict__.copy()
+        state['repo'] = None
+        state['_index'] = None
+        return state
+    
+    @property
+    def index(self) -> BFCIndex:
+        if self._index is None:
+            self._index = BFCIndex(self.index_path)
+        return self._index
     
     def find_candidate_bfcs(self, 
-                           max_commits: int = 500,
+                           max_commits: int = None,
                            since_date: str = None,
-                           branch: str = 'HEAD') -> List[Dict]:
+                           branch: str = 'HEAD',
+                           n_jobs: int = None) -> List[Dict]:
         """
         查找候选BFC
+        从单个 git log -p 输出流中读取提交，由多个进程并行打分
         
         Args:
-            max_commits: 最多检查的提交数
+            max_commits: 最多检查的提交数（None 表示全部历史）
             since_date: 开始日期（格式: YYYY-MM-DD）
             branch: 分支名
+            n_jobs: 打分进程数（默认CPU核数）
             
         Returns:
             候选BFC列表
         """
-        print(f"🔍 开始扫描仓库提交（最多{max_commits}个）...")
+        scope = '全部' if max_commits is None else f'最多{max_commits}个'
+        print(f"🔍 开始扫描仓库提交（{scope}）...")
         
-        candidates = []
+        _, candidates = self._scan_commits([branch], max_commits, since_date, n_jobs)
         
-        # 构建git log参数
-        kwargs = {'max_count': max_commits}
-        if since_date:
-            kwargs['since'] = since_date
+        # 按分数排序
+        candidates.sort(key=lambda x: x['total_score'], reverse=True)
         
-        # 遍历提交
-        for i, commit in enumerate(self.repo.iter_commits(branch, **kwargs)):
-            if i % 100 == 0:
-                print(f"  已扫描 {i} 个提交...")
-            
-            # 方法1: 基于commit message
-            message_score, message_reason = self._analyze_commit_message(commit.message)
-            
-            # 方法2: 基于代码变更
-            code_score, code_patterns = self._analyze_code_changes(commit)
+        print(f"✓ 找到 {len(candidates)} 个候选BFC")
+        
+        return candidates
+    
+    def update_index(self, branch: str = 'HEAD', n_jobs: int = None) -> int:
+        """
+        增量更新候选BFC索引
+        只对分支上尚未扫描过的提交（所有水位都不可达的提交）打分，并把分支的水位移到当前提交
+        
+        Args:
+            branch: 分支名
+            n_jobs: 打分进程数（默认CPU核数）
             
-            # 综合评分
-            total_score = message_score + code_score
+        Returns:
+            本次扫描的提交数
+        """
+        index = self.index
+        # 打分规则变化后，索引中的分数失效
+        fingerprint = self._scoring_fingerprint()
+        if index.get_meta('fingerprint') != fingerprint:
+            index.reset()
+            index.set_meta('fingerprint', fingerprint)
+        
+        head = self.repo.commit(branch).hexsha
+        branch = self._branch_name(branch)
+        watermarks = index.watermarks()
+        if watermarks.get(branch) == head:
+            print(f"✓ {branch} 没有新提交")
+            return 0
+        
+        # 仓库中已不存在的水位（如被强制推送覆盖后回收）不能用于排除
+        scanned = [w for w in set(watermarks.values()) if self._commit_exists(w)]
+        print(f"🔍 增量扫描 {branch}（已有 {len(scanned)} 个水位）...")
+        count, candidates = self._scan_commits([head] + ['^' + w for w in scanned], n_jobs=n_jobs)
+        index.add_scan(branch, head, candidates)
+        
+        print(f"✓ 扫描 {count} 个新提交，新增 {len(candidates)} 个候选BFC")
+        return count
+    
+    def query_candidates(self, branch: str = 'HEAD',
+                         top_n: int = None,
+                         exclude_patterns: List[str] = None) -> List[Dict]:
+        """
+        从索引中查询分支上的候选BFC（按分数排序），不需要重新扫描
+        
+        Args:
+            branch: 分支名（None 表示索引中的全部候选），以该分支的水位为准，需先 update_index
+            top_n: 最多返回的候选数
+            exclude_patterns: 排除的文件模式，同 filter_by_files（默认排除测试文件、文档等，[] 不过滤）
             
-            if total_score > 0:
-                candidate = {
-                    'commit_hash': commit.hexsha,
-                    'short_hash': commit.hexsha[:8],
-                    'date': datetime.fromtimestamp(commit.committed_date).isoformat(),
-                    'author': commit.author.name,
-                    'author_email': commit.author.email,
-                    'message': commit.message.strip(),
-                    'message_score': message_score,
-                    'message_reason': message_reason,
-                    'code_score': code_score,
-                    'code_patterns': code_patterns,
-                    'total_score': total_score,
-                    'files_changed': len(commit.stats.files),
-                    'insertions': commit.stats.total['insertions'],
-                    'deletions': commit.stats.total['deletions'],
-                }
-                candidates.append(candidate)
+        Returns:
+            候选BFC列表
+        """
+        if exclude_patterns is None:
+            exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
         
-        # 按分数排序
-        candidates.sort(key=lambda x: x['total_score'], reverse=True)
+        reachable = None
+        if branch is not None:
+            branch = self._branch_name(branch)
+            watermark = self.index.watermarks().get(branch)
+            if watermark is None:
+                raise ValueError(f'{branch} has not been indexed, run update_index first')
+            reachable = set(self.repo.git.rev_list(watermark).split())
         
-        print(f"✓ 找到 {len(candidates)} 个候选BFC")
+        candidates = []
+        for candidate in self.index.iter_candidates():
+            if top_n is not None and len(candidates) >= top_n:
+                break
+            if reachable is not None and candidate['commit_hash'] not in reachable:
+                continue
+            if all_files_excluded(candidate['modified_files'], exclude_patterns):
+                continue
+            candidates.append(candidate)
         
         return candidates
     
+    def _branch_name(self, branch: str) -> str:
+        # HEAD 按当前检出的分支记录水位
+        if branch == 'HEAD' and not self.repo.head.is_detached:
+            return self.repo.active_branch.name
+        return branch
+    
+    def _scoring_fingerprint(self) -> str:
+        config = json.dumps([self.security_keywords, self.fix_words, self.security_code_patterns], sort_keys=True)
+        return hashlib.sha1(config.encode('utf-8')).hexdigest()
+    
+    def _commit_exists(self, commit_hash: str) -> bool:
+        try:
+            self.repo.git.cat_file('-e', f'{commit_hash}^{{commit}}')
+            return True
+        except GitCommandError:
+            return False
+    
+    def _scan_commits(self, revs: List[str],
+                      max_commits: int = None,
+                      since_date: str = None,
+                      n_jobs: int = None) -> tuple:
+        """
+        从单个 git log -p 输出流中读取 revs 范围内的提交，由多个进程并行打分
+        
+        Returns:
+            (扫描的提交数, 候选BFC列表（按 git log 顺序）)
+        """
+        candidates = []
+        
+        # 按当前的关键词和代码模式构建匹配器，随识别器一起传给扫描进程
+        self._code_matcher = CodePatternMatcher([pattern for pattern, _ in self.security_code_patterns])
+        self._build_keyword_matcher()
+        
+        count = 0
+        proc = self._git_log_patch_pipe(revs, max_commits, since_date)
+        with proc, multiprocessing.Pool(n_jobs, initializer=_init_scan_worker, initargs=(self,)) as pool:
+            # 每批提交的 message 一起打分
+            batches = iter_batches(iter_log_records(proc.stdout), 64)
+            for batch_candidates in pool.imap(_score_commit_records, batches):
+                for candidate in batch_candidates:
+                    count += 1
+                    if count % 1000 == 0:
+                        print(f"  已扫描 {count} 个提交...")
+                    if candidate is not None:
+                        candidates.append(candidate)
+        
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+        
+        return count, candidates
+    
+    def _git_log_patch_pipe(self, revs: List[str], max_commits: int = None, since_date: str = None):
+        """
+        启动扫描范围内的 git log -p 进程（提交顺序与 iter_commits 相同）
+        每个提交附带 numstat 统计，合并提交与第一个父提交比较
+        """
+        cmd = ['git', '-C', self.repo_path, '-c', 'core.quotePath=false', 'log', '-p', '-M', '--numstat',
+               '--diff-merges=first-parent', '--no-color', '--no-ext-diff', '--no-textconv', f'--format={LOG_FORMAT}']
+        if max_commits is not None:
+            cmd.append(f'--max-count={max_commits}')
+        if since_date:
+            cmd.append(f'--since={since_date}')
+        cmd += revs + ['--']
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    
+    def _numstat_without_renames(self, commit_hash: str, parents: List[str]) -> tuple:
+        """
+        不检测重命名时提交与第一个父提交之间的 (修改的文件, 新增行数, 删除行数)
+        """
+        git = ['git', '-C', self.repo_path, '-c', 'core.quotePath=false']
+        if parents:
+            cmd = git + ['diff', '--numstat', '--no-renames', parents[0], commit_hash, '--']
+        else:
+            cmd = git + ['diff-tree', '-r', '--root', '--numstat', '--no-renames', commit_hash]
+        output = subprocess.check_output(cmd).decode('utf-8', errors='ignore')
+        return parse_numstat(output)[:3]
+    
+    def _score_commit_records(self, records: List[bytes]) -> List[Dict]:
+        """
+        对 git log 输出中的一批提交打分
+        
+        Returns:
+            每个提交的候选BFC（总分为0时为 None）
+        """
+        parsed = [parse_log_record(record) for record in records]
+        
+        # 方法1: 基于commit message（整批一起分析）
+        message_results = self.analyze_commit_messages([header[5] for header, _, _ in parsed])
+        
+        return [self._score_commit(header, stats, file_diffs, message_score, message_reason)
+                for (header, stats, file_diffs), (message_score, message_reason) in zip(parsed, message_results)]
+    
+    def _score_commit(self, header: tuple, stats: tuple, file_diffs: List[str],
+                      message_score: int, message_reason: str):
+        """
+        综合 message 得分和代码变更得分
+        
+        Returns:
+            候选BFC（总分为0时返回 None）
+        """
+        commit_hash, parents, committed_date, author, author_email, message = header
+        
+        # 方法2: 基于代码变更（初始提交跳过）
+        code_score, code_patterns = 0, []
+        if parents:
+            code_score, code_patterns = self._analyze_code_changes(file_diffs)
+        
+        # 综合评分
+        total_score = message_score + code_score
+        if total_score == 0:
+            return None
+        
+        files, insertions, deletions, renamed = stats
+        if renamed:
+            # 与 commit.stats 一致，重命名按删除和新增统计
+            files, insertions, deletions = self._numstat_without_renames(commit_hash, parents)
+        return {
+            'commit_hash': commit_hash,
+            'short_hash': commit_hash[:8],
+            'date': datetime.fromtimestamp(committed_date).isoformat(),
+            'author': author,
+            'author_email': author_email,
+            'message': message.strip(),
+            'message_score': message_score,
+            'message_reason': message_reason,
+            'code_score': code_score,
+            'code_patterns': code_patterns,
+            'total_score': total_score,
+            'files_changed': len(files),
+            'insertions': insertions,
+            'deletions': deletions,
+            'modified_files': files,
+        }
+    
+    def _build_keyword_matcher(self):
+        """
+        按当前的安全关键词和修复类词汇构建关键词匹配器
+        """
+        keywords = []
+        # 每个关键词的 (分数, 原因)，修复类词汇的原因为 None
+        self._keyword_entries = []
+        for tier, weight, name in KEYWORD_TIERS:
+            for keyword in self.security_keywords[tier]:
+                keywords.append(keyword)
+                self._keyword_entries.append((weight, f"包含{name}优先级关键词: '{keyword}'"))
+        for word in self.fix_words:
+            keywords.append(word)
+            self._keyword_entries.append((0, None))
+        
+        self._keyword_matcher = KeywordMatcher(keywords)
+        # 命中的关键词下标 -> (score, reason)，不同的命中组合很少
+        self._keyword_scores = {}
+    
     def _analyze_commit_message(self, message: str) -> tuple:
         """
         分析commit message是否包含安全关键词
@@ -149,75 +656,64 @@ class BFCIdentifier:
         Returns:
             (score, reason)
         """
-        message_lower = message.lower()
-        score = 0
-        reasons = []
-        
-        # 高优先级关键词
-        for keyword in self.security_keywords['high']:
-            if keyword in message_lower:
-                score += 10
-                reasons.append(f"包含高优先级关键词: '{keyword}'")
-        
-        # 中优先级关键词
-        for keyword in self.security_keywords['medium']:
-            if keyword in message_lower:
-                score += 5
-                reasons.append(f"包含中优先级关键词: '{keyword}'")
-        
-        # 低优先级关键词
-        for keyword in self.security_keywords['low']:
-            if keyword in message_lower:
-                score += 2
-                reasons.append(f"包含低优先级关键词: '{keyword}'")
-        
-        # 检查是否包含"fix"类词汇
-        fix_words = ['fix', 'patch', 'resolve', 'correct', 'address']
-        has_fix = any(word in message_lower for word in fix_words)
-        if has_fix and score > 0:
-            score += 3
-            reasons.append("包含修复类关键词")
-        
-        return score, '; '.join(reasons) if reasons else ''
+        return self._score_keyword_hits(self._keyword_matcher.match(message))
+    
+    def analyze_commit_messages(self, messages: List[str]) -> List[tuple]:
+        """
+        批量分析commit message是否包含安全关键词，结果与逐条 _analyze_commit_message 相同
+        
+        Args:
+            messages: commit message 列表
+            
+        Returns:
+            每条 message 的 (score, reason)
+        """
+        return [self._score_keyword_hits(hits) for hits in self._keyword_matcher.match_batch(messages)]
+    
+    def _score_keyword_hits(self, hits: List[int]) -> tuple:
+        hits = tuple(hits)
+        if hits not in self._keyword_scores:
+            score = 0
+            reasons = []
+            has_fix = False
+            for i in hits:
+                weight, reason = self._keyword_entries[i]
+                if reason is None:
+                    has_fix = True
+                else:
+                    score += weight
+                    reasons.append(reason)
+            
+            # 包含"fix"类词汇
+            if has_fix and score > 0:
+                score += 3
+                reasons.append("包含修复类关键词")
+            
+            if len(self._keyword_scores) >= 4096:
+                self._keyword_scores.clear()
+            self._keyword_scores[hits] = (score, '; '.join(reasons))
+        return self._keyword_scores[hits]
     
-    def _analyze_code_changes(self, commit) -> tuple:
+    def _analyze_code_changes(self, file_diffs: List[str]) -> tuple:
         """
         分析代码变更是否包含安全相关模式
+        每个文件的 diff 只扫描一遍，每个命中的模式计3分
         
+        Args:
+            file_diffs: 每个文件的 diff 文本
+            
         Returns:
             (score, patterns_found)
         """
         score = 0
         patterns_found = []
         
-        try:
-            # 获取diff
-            if len(commit.parents) == 0:
-                # 初始提交，跳过
-                return 0, []
-            
-            diffs = commit.diff(commit.parents[0], create_patch=True)
-            
-            for diff in diffs:
-                if diff.diff is None:
-                    continue
-                
-                try:
-                    diff_text = diff.diff.decode('utf-8', errors='ignore')
-                except:
-                    continue
-                
-                # 检查每个安全模式
-                for pattern, description in self.security_code_patterns:
-                    if re.search(pattern, diff_text, re.IGNORECASE):
-                        score += 3
-                        patterns_found.append(description)
-        
-        except Exception as e:
-            # 某些提交可能无法获取diff
-            pass
-        
-        return score, list(set(patterns_found))
+        for diff_text in file_diffs:
+            for i in self._code_matcher.search(diff_text):
+                score += 3
+                patterns_found.append(self.security_code_patterns[i][1])
+        
+        return score, list(dict.fromkeys(patterns_found))
     
     def filter_by_files(self, candidates: List[Dict], 
                        exclude_patterns: List[str] = None) -> List[Dict]:
@@ -229,27 +725,19 @@ class BFCIdentifier:
             exclude_patterns: 排除的文件模式（如测试文件、文档等）
         """
         if exclude_patterns is None:
-            exclude_patterns = [
-                r'test.*\.py$', r'.*_test\.py$', r'.*Test\.java$',
-                r'README', r'CHANGELOG', r'\.md$',
-                r'\.txt$', r'\.yml$', r'\.yaml$'
-            ]
+            exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
         
         filtered = []
         
         for candidate in candidates:
-            commit = self.repo.commit(candidate['commit_hash'])
-            
-            # 获取修改的文件
-            files = list(commit.stats.files.keys())
+            # 获取修改的文件（扫描时已记录的直接使用）
+            files = candidate.get('modified_files')
+            if files is None:
+                commit = self.repo.commit(candidate['commit_hash'])
+                files = list(commit.stats.files.keys())
             
             # 检查是否都是排除的文件
-            all_excluded = all(
-                any(re.search(pattern, f) for pattern in exclude_patterns)
-                for f in files
-            )
-            
-            if not all_excluded:
+            if not all_files_excluded(files, exclude_patterns):
                 candidate['modified_files'] = files
                 filtered.append(candidate)
         
@@ -311,20 +799,25 @@ def main():
     import sys
     
     if len(sys.argv) < 2:
-        print("用法: python bfc_identifier.py <仓库路径> [最大提交数]")
+        print("用法: python bfc_identifier.py <仓库路径> [最大提交数，默认增量扫描全部提交]")
         sys.exit(1)
     
     repo_path = sys.argv[1]
-    max_commits = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    max_commits = int(sys.argv[2]) if len(sys.argv) > 2 else None
     
     # 创建识别器
     identifier = BFCIdentifier(repo_path)
     
-    # 查找候选
-    candidates = identifier.find_candidate_bfcs(max_commits=max_commits)
-    
-    # 过滤（排除测试和文档）
-    candidates = identifier.filter_by_files(candidates)
+    if max_commits is None:
+        # 增量扫描新提交，从索引中查询候选（排除测试和文档）
+        identifier.update_index()
+        candidates = identifier.query_candidates()
+    else:
+        # 查找候选
+        candidates = identifier.find_candidate_bfcs(max_commits=max_commits)
+        
+        # 过滤（排除测试和文档）
+        candidates = identifier.filter_by_files(candidates)
     
     # 显示摘要
     identifier.print_summary(candidates)
@@ -1,53 +1,135 @@
+import io
 import os
 import sys
 import json
 import subprocess
 import re
 import hashlib
+import shutil
 from log_generation import GitLog
 
 from setting import *
 
 from data_loader import JAVA_CVE_FIX_COMMITS, C_CVE_FIX_COMMITS, read_cve_commits, REPOS_DIR, JAVA_PROJECTS, C_PROJECTS, ANNOTATED_CVES
-from git_analysis.analyze_git_logs import retrieve_git_logs, retrieve_git_logs_dict, get_ancestors, get_parent_tags, get_son_tags
+from git_analysis.analyze_git_logs import get_ancestors, get_parent_tags, iter_raw_git_logs, is_separated_log, rgl_to_record
+from git_analysis.commit_dag import load_commit_dag, meta_log_fingerprint
+from git_analysis.version_index import VersionIndex, parse_refs, parse_tag_refs
+from identify_duplicated_patch import update_duplicate_patch, open_patch_store
 
 repos_dir = REPOS_DIR
 log_dir = LOG_DIR
+version_index_dir = VERSION_INDEX_DIR
+
+# per-process caches, keyed by project
+_version_indexes = {}
+_patch_maps = {}
 
 def get_tags(repo_dir):
-    output = GitLog().git_tag(repo_dir)
-    tags = output.split('\n')
-
-    commit_tag_map = {}
-    for tag in tags:
-        if tag.strip() == "":
-            continue
-
-        try:
-            output = GitLog().git_show(repo_dir, tag)
-        except Exception as e:
-            print(tag, e)
-            continue
-
-        commit = None
-        timestamp = None
-        for line in output.split('\n'):
-            if line.startswith('commit:'):
-                commit = line[8:].strip()
-            
-            if line.startswith('timestamp:'):
-                timestamp = line[11:].strip()
-                break
-        
-        if commit is not None:
-            commit_tag_map[commit] = tag
-
-    return commit_tag_map
+    output = GitLog().git_tag_refs(repo_dir)
+    return parse_tag_refs(output)
+
+def get_refs(repo_dir):
+    output = GitLog().git_refs(repo_dir)
+    return {refname: commit_id for commit_id, refname in parse_refs(output)}
+
+def refs_state_path(meta_log_path):
+    return os.path.splitext(meta_log_path)[0] + '-refs.json'
+
+def save_refs_state(meta_log_path, refs):
+    with open(refs_state_path(meta_log_path), 'w') as fout:
+        json.dump(refs, fout, indent=4)
+
+def load_refs_state(meta_log_path):
+    if not os.path.exists(refs_state_path(meta_log_path)):
+        return None
+    with open(refs_state_path(meta_log_path)) as fin:
+        return json.load(fin)
 
 def generate_logs(repo_dir, output):
-    log_str = GitLog().git_log(repo_dir)
-    with open(output, 'w') as fout:
-        fout.write(log_str)
+    # refs are recorded before the log is written, commits added meanwhile are skipped by the next refresh
+    refs = get_refs(repo_dir)
+    with GitLog().git_log_pipe(repo_dir) as proc, open(output, 'w') as fout:
+        shutil.copyfileobj(proc.stdout, fout)
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, 'git log')
+    save_refs_state(output, refs)
+
+def read_new_logs(repo_dir, meta_log_path, dag, refs):
+    """
+    Raw logs of the commits added since the refs recorded for the meta log, or None when the
+    meta log, its DAG and the recorded refs are not consistent and the log has to be regenerated.
+    """
+    old_refs = load_refs_state(meta_log_path)
+    if old_refs is None or not is_separated_log(meta_log_path):
+        return None
+
+    old_tips = set(old_refs.values())
+    if any(c not in dag for c in old_tips):
+        return None
+
+    new_tips = set(refs.values()) - old_tips
+    if len(new_tips) == 0:
+        return []
+
+    log_str = GitLog().git_log_range(repo_dir, sorted(new_tips), sorted(old_tips))
+    new_logs = list(iter_raw_git_logs(io.StringIO(log_str)))
+    # git log writes a newline between two records, drop it so that every record is appended as the
+    # last one of the meta log, which does not end with that newline
+    for rgl in new_logs[:-1]:
+        rgl.commit_msg_lines.pop()
+    new_logs = [rgl for rgl in new_logs if rgl.extract_id() not in dag]
+
+    # every parent must be already known, otherwise the log has gaps
+    new_commits = set(rgl.extract_id() for rgl in new_logs)
+    for rgl in new_logs:
+        for p in rgl.extract_parents():
+            if p not in dag and p not in new_commits:
+                return None
+
+    return new_logs
+
+def refresh_logs(project):
+    """
+    Bring the meta log, the DAG cache and the patch-hash maps of a project up to date with the
+    current refs of its repository, appending only the commits added since the last run
+    (git log old..new). Falls back to a full regeneration when the consistency check fails.
+    Returns the ids of the added commits.
+    """
+    repo_dir = os.path.join(repos_dir, project)
+    meta_log_path = os.path.join(log_dir, project+"-meta.log")
+    dag_path = os.path.join(log_dir, project+"-dag.npz")
+    refs = get_refs(repo_dir)
+
+    new_logs = None
+    if os.path.exists(meta_log_path):
+        dag = load_commit_dag(meta_log_path, dag_path)
+        new_logs = read_new_logs(repo_dir, meta_log_path, dag, refs)
+
+    if new_logs is None:
+        print(project, 'regenerate the whole log')
+        generate_logs(repo_dir, meta_log_path)
+        dag = load_commit_dag(meta_log_path, dag_path, rebuild=True)
+        store = open_patch_store(project)
+        hashed_commits = store.hashed_commits()
+        store.close()
+        new_commits = [dag.commit_id(i) for i in range(len(dag)) if dag.commit_id(i) not in hashed_commits]
+    else:
+        with open(meta_log_path, 'a') as fout:
+            for rgl in new_logs:
+                fout.write('\n' + rgl_to_record(rgl))
+
+        dag = dag.extend((rgl.extract_id(), rgl.extract_parents(), rgl.extract_author()[0], rgl.extract_date()[0]) for rgl in new_logs)
+        dag.source = meta_log_fingerprint(meta_log_path)
+        dag.save(dag_path)
+        save_refs_state(meta_log_path, refs)
+        new_commits = [rgl.extract_id() for rgl in new_logs]
+
+    update_duplicate_patch(project, new_commits).close()
+    _version_indexes.pop(project, None)
+    _patch_maps.pop(project, None)
+
+    return new_commits
 
 
 def get_duplicate_commits(commit_id, commit_patch_map, patch_commit_map):
@@ -67,47 +149,50 @@ def get_duplicate_commits(commit_id, commit_patch_map, patch_commit_map):
 
     return list(duplicated_commits)
 
-def generate_vulnerable_versions(project, fixing_commit, inducing_commit):
-    git_logs = retrieve_git_logs(os.path.join(log_dir, project+"-meta.log"), project)
-    git_log_dict = retrieve_git_logs_dict(git_logs, project)
-    
-    commit_tag_map = get_tags(os.path.join(repos_dir, project))
-    for commit_id in git_log_dict:
-        if commit_id in commit_tag_map:
-            git_log_dict[commit_id].set_tag(commit_tag_map[commit_id])
-        
-        if len(git_log_dict[commit_id].parent) == 0:
-            git_log_dict[commit_id].set_tag("Initial Commit")
-    
-    with open(os.path.join(WORK_DIR, f'data_commit_patch_map/{project}-commit-patch.json')) as fin1, \
-            open(os.path.join(WORK_DIR, f'data_commit_patch_map/{project}-patch-commit.json')) as fin2:
-        commit_patch_map = json.load(fin1)
-        patch_commit_map = json.load(fin2)
+def load_version_index(project, rebuild=False):
+    if not rebuild and project in _version_indexes:
+        return _version_indexes[project]
 
-    try:
-        fc_sons_tag = get_son_tags(git_log_dict, fixing_commit)
+    meta_log_path = os.path.join(log_dir, project+"-meta.log")
+    index_path = os.path.join(version_index_dir, project+"-version-index.json")
+    # tags may be added or moved without changing the meta log
+    tag_refs = GitLog().git_tag_refs(os.path.join(repos_dir, project))
+    fingerprint = meta_log_fingerprint(meta_log_path) + [hashlib.sha1(tag_refs.encode('utf-8')).hexdigest()]
 
-        duplicated_commits = get_duplicate_commits(fixing_commit, commit_patch_map, patch_commit_map)
-        if len(duplicated_commits) > 0:
-            for c in duplicated_commits:
-                fc_sons_tag |= get_son_tags(git_log_dict, c)
+    version_index = None
+    if not rebuild and os.path.exists(index_path):
+        version_index = VersionIndex.load(index_path)
+        if version_index.source != fingerprint:
+            version_index = None
 
-        ic_sons_tag = get_son_tags(git_log_dict, inducing_commit)
+    if version_index is None:
+        dag = load_commit_dag(meta_log_path, os.path.join(log_dir, project+"-dag.npz"))
+        commit_tag_map = parse_tag_refs(tag_refs)
+        version_index = VersionIndex.build(dag, commit_tag_map, fingerprint)
 
-        duplicated_commits = get_duplicate_commits(inducing_commit, commit_patch_map, patch_commit_map)
-        for c in duplicated_commits:
-            ic_sons_tag |= get_son_tags(git_log_dict, c)
+        os.makedirs(version_index_dir, exist_ok=True)
+        version_index.save(index_path)
 
-        ic_sons_tag = set([t.tag for t in ic_sons_tag])
-        fc_sons_tag = set([t.tag for t in fc_sons_tag])
+    _version_indexes[project] = version_index
+    return version_index
 
-        return ic_sons_tag - fc_sons_tag
+def load_patch_maps(project):
+    if project not in _patch_maps:
+        store = open_patch_store(project)
+        _patch_maps[project] = (store.commit_patch_map, store.patch_commit_map)
 
-    except Exception as e:
-        print(e)
-        return None
+    return _patch_maps[project]
 
+def generate_vulnerable_versions(project, fixing_commit, inducing_commit):
+    version_index = load_version_index(project)
+    commit_patch_map, patch_commit_map = load_patch_maps(project)
 
+    try:
+        fixing_commits = [fixing_commit] + get_duplicate_commits(fixing_commit, commit_patch_map, patch_commit_map)
+        inducing_commits = [inducing_commit] + get_duplicate_commits(inducing_commit, commit_patch_map, patch_commit_map)
 
+        return version_index.affected_versions(inducing_commits, fixing_commits)
 
-    
\ No newline at end of file
+    except Exception as e:
+        print(e)
+        return None
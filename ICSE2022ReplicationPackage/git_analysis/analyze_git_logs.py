@@ -1,4 +1,6 @@
+import io
 import re
+import itertools
 
 from git_analysis.git_stats.git_commit_meta import RawGitCommitMeta
 from git_analysis.git_stats.git_commit_meta import RawGitLog
@@ -12,100 +14,122 @@ committer_line_pattern = re.compile(r'committer:')
 committer_email_line_pattern = re.compile(r'committer email:')
 tag_pattern = re.compile(r'tag: ')
 
-def is_commit_head(lines, cur_idx):
-    if cur_idx > len(lines) - 5:
-        return False
-
-    cur_line = lines[cur_idx]
-    if commit_id_line_pattern.match(cur_line) is None or (parent_line_pattern.match(lines[cur_idx+1]) is None):
-        return False
-    return True
-
-
-def assign_line_value(rgl, lines, cur_line_num):
-    assert(isinstance(rgl, RawGitLog))
-    l = lines[cur_line_num]
-    if parent_line_pattern.match(l):
-        rgl.parent_line = l
-        return True
-    if author_line_pattern.match(l):
-        rgl.author_line = l
-        return True
-    if author_email_line_pattern.match(l):
-        rgl.email_line = l
-        return True
-    if time_stamp_line_pattern.match(l):
-        rgl.time_stamp_line = l
-    return False
-
-
-def assign_head_to_rgl(lines, cur_idx):
+# records of meta logs generated by log_generation.GitLog start with a NUL byte, which cannot
+# appear in a commit message; older logs have no separator and are split on their header lines
+RECORD_SEPARATOR = '\0'
+READ_CHUNK_SIZE = 1 << 20
+
+
+def record_to_rgl(record):
+    lines = record.split('\n', 7)
+    assert(len(lines) >= 7 and commit_id_line_pattern.match(lines[0]) is not None)
     rgl = RawGitLog()
-    assert(isinstance(rgl, RawGitLog))
-    assert(commit_id_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.id_line = lines[cur_idx]
-    cur_idx += 1
-    assert(parent_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.parent_line = lines[cur_idx]
-    cur_idx += 1
-    assert(author_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.author_line = lines[cur_idx]
-    cur_idx += 1
-    assert(author_email_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.email_line = lines[cur_idx]
-    cur_idx += 1
-    assert(time_stamp_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.time_stamp_line = lines[cur_idx]
-    cur_idx += 1
-    assert(committer_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.committer_line = lines[cur_idx]
-    cur_idx += 1
-    assert(committer_email_line_pattern.match(lines[cur_idx]) is not None)
-    rgl.committer_email_line = lines[cur_idx]
-    return rgl, cur_idx + 1
+    rgl.id_line, rgl.parent_line, rgl.author_line, rgl.email_line, \
+        rgl.time_stamp_line, rgl.committer_line, rgl.committer_email_line = lines[:7]
+    rgl.commit_msg_lines = lines[7].split('\n') if len(lines) > 7 else ['']
+    return rgl
+
+
+def rgl_to_record(rgl):
+    lines = [rgl.id_line, rgl.parent_line, rgl.author_line, rgl.email_line,
+             rgl.time_stamp_line, rgl.committer_line, rgl.committer_email_line]
+    return RECORD_SEPARATOR + '\n'.join(lines + rgl.commit_msg_lines)
+
+
+def iter_separated_records(first_line, f_obj):
+    buf = first_line
+    while True:
+        chunk = f_obj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf += chunk
+        records = buf.split(RECORD_SEPARATOR)
+        buf = records.pop()
+        for record in records:
+            if record != '':
+                yield record_to_rgl(record)
+
+    if buf.strip() != '':
+        yield record_to_rgl(buf)
+
+
+def iter_legacy_records(lines):
+    # a header starts with a commit line directly followed by a parent line
+    rgl = None
+    prev = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if prev is not None and commit_id_line_pattern.match(prev) and parent_line_pattern.match(line):
+            if rgl is not None:
+                yield rgl
+            rgl = RawGitLog()
+            rgl.id_line = prev
+            rgl.parent_line = line
+            rgl.author_line = next(lines).rstrip('\n')
+            rgl.email_line = next(lines).rstrip('\n')
+            rgl.time_stamp_line = next(lines).rstrip('\n')
+            rgl.committer_line = next(lines).rstrip('\n')
+            rgl.committer_email_line = next(lines).rstrip('\n')
+            assert(author_line_pattern.match(rgl.author_line) is not None)
+            assert(committer_email_line_pattern.match(rgl.committer_email_line) is not None)
+            rgl.commit_msg_lines = list()
+            prev = None
+            continue
 
+        if prev is not None and rgl is not None:
+            rgl.commit_msg_lines.append(prev)
+        prev = line
 
-def logstr_to_gitlogs(project, logstr):
-    lines = logstr.split('\n')
-    line_number = len(lines)
-    i = 0
-    git_logs = list()
-    index_commit_id_map = dict()
-    while i < line_number:
-        assert(i < line_number - 4)
-        # print(i, lines[i])
-        rgl, i = assign_head_to_rgl(lines, i)
-        rgl.commit_msg_lines = list()
-        while not is_commit_head(lines, i):
-            if i < line_number:
-                rgl.commit_msg_lines.append(lines[i])
-                i += 1
-            else:
-                break
+    if rgl is not None:
+        if prev is not None:
+            rgl.commit_msg_lines.append(prev)
+        yield rgl
+
+
+def is_separated_log(meta_log_path):
+    with open(meta_log_path, 'r', errors='ignore') as f_obj:
+        return f_obj.read(1) == RECORD_SEPARATOR
+
+
+def iter_raw_git_logs(f_obj):
+    """
+    Yield one RawGitLog per commit from a meta log stream (an opened file or the stdout of
+    a `git log` process), reading it incrementally.
+    """
+    first_line = f_obj.readline()
+    if first_line.startswith(RECORD_SEPARATOR):
+        return iter_separated_records(first_line[1:], f_obj)
+    return iter_legacy_records(itertools.chain([first_line], f_obj))
+
+
+def iter_git_logs(f_obj, project):
+    for rgl in iter_raw_git_logs(f_obj):
         gl = RawGitCommitMeta(project)
         gl.from_raw_git_log(rgl)
-        index_commit_id_map[gl.commit_id] = len(git_logs)
-        git_logs.append(gl)
+        yield gl
+
+
+def link_sons(git_logs):
+    index_commit_id_map = dict()
+    for i, gl in enumerate(git_logs):
+        index_commit_id_map[gl.commit_id] = i
 
     for gl in git_logs:
-        if len(gl.parent) == 0:
-            continue
         for p in gl.parent:
             git_logs[index_commit_id_map[p]].add_son(gl.commit_id)
-        i += 1
     return git_logs
 
 
+def logstr_to_gitlogs(project, logstr):
+    return link_sons(list(iter_git_logs(io.StringIO(logstr), project)))
+
+
 def retrieve_git_logs(meta_log_path, project_name):
     # meta_log_path = conf.project_log_path(project_name, 'meta')
-    # f_obj = file(meta_log_path, 'r')
-    # log_str = f_obj.read()
-    # f_obj.close()
     with open(meta_log_path,'r', errors='ignore') as f_obj:
-        log_str = f_obj.read()
+        git_logs = list(iter_git_logs(f_obj, project_name))
 
-    git_logs = logstr_to_gitlogs(project_name, log_str)
-    return git_logs
+    return link_sons(git_logs)
 
 
 def retrieve_git_logs_dict(git_logs, project_name):
@@ -120,20 +144,17 @@ def get_ancestors(git_logs, git_log_dict, commit_id):
     # git_log_dict = dict()
     # for gl in git_logs:
         # git_log_dict[gl.commit_id] = gl
-    gl = git_log_dict[commit_id]
     ancestors = set()
-    # ancestors = list()
-    while len(gl.parent) == 1:
-        ancestors |= set(gl.parent)
-        # ancestors.append(gl.parent[0])
-        gl = git_log_dict[gl.parent[0]]
-    
-    if len(gl.parent) >= 2:
-        ancestors |= set(gl.parent)
-        # ancestors.extend(gl.parent)
-        for p in gl.parent:
-            ancestors |= get_ancestors(git_logs, git_log_dict, p)
-            # ancestors.extend(get_ancestors(git_logs, git_log_dict, p))
+    q = list(git_log_dict[commit_id].parent)
+
+    # iterative walk, recursing on merges overflows the stack on deep histories
+    while len(q) > 0:
+        next_commit = q.pop()
+        if next_commit in ancestors:
+            continue
+
+        ancestors.add(next_commit)
+        q.extend(git_log_dict[next_commit].parent)
 
     return ancestors
 
@@ -0,0 +1,243 @@
+import os
+
+import numpy as np
+
+from git_analysis.analyze_git_logs import iter_raw_git_logs
+
+
+def meta_log_fingerprint(meta_log_path):
+    st = os.stat(meta_log_path)
+    return [st.st_size, int(st.st_mtime)]
+
+
+def iter_meta_log_headers(meta_log_path):
+    """
+    Yield (commit_id, parents, author, time_stamp) for each commit of a meta log, streaming
+    the log so that neither the file nor the commit messages are kept in memory.
+    """
+    with open(meta_log_path, 'r', errors='ignore') as f_obj:
+        for rgl in iter_raw_git_logs(f_obj):
+            author, _ = rgl.extract_author()
+            time_stamp, _ = rgl.extract_date()
+            yield rgl.extract_id(), rgl.extract_parents(), author, time_stamp
+
+
+def invert_csr(ptr, idx):
+    """ Reverse the edges of a CSR adjacency (e.g. parents -> sons) """
+    n = len(ptr) - 1
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(ptr))
+    order = np.argsort(idx, kind='stable')
+    inv_ptr = np.zeros(n + 1, dtype=np.int64)
+    inv_ptr[1:] = np.cumsum(np.bincount(idx, minlength=n))
+    return inv_ptr, sources[order]
+
+
+class CommitDAG:
+    """
+    Columnar commit graph: commits are numbered 0..n-1 in log order, parents and sons are stored
+    as CSR arrays (ptr/idx), authors are interned in a table. All walks are iterative.
+    """
+
+    def __init__(self, commit_ids, parent_ptr, parent_idx, child_ptr, child_idx, time_stamps, author_idx, authors):
+        self.commit_ids = commit_ids
+        self.parent_ptr = parent_ptr
+        self.parent_idx = parent_idx
+        self.child_ptr = child_ptr
+        self.child_idx = child_idx
+        self.time_stamps = time_stamps
+        self.author_idx = author_idx
+        self.authors = authors
+        self._sorted_idx = np.argsort(commit_ids, kind='stable')
+        self._sorted_ids = commit_ids[self._sorted_idx]
+        self.tag_idx = np.full(len(commit_ids), -1, dtype=np.int32)
+        self.tags = []
+        self.source = None
+
+    def __len__(self):
+        return len(self.commit_ids)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype='S40'),
+                   np.zeros(1, dtype=np.int64), np.array([], dtype=np.int32),
+                   np.zeros(1, dtype=np.int64), np.array([], dtype=np.int32),
+                   np.array([], dtype=np.int64), np.array([], dtype=np.int32), [])
+
+    @classmethod
+    def from_headers(cls, headers):
+        return cls.empty().extend(headers)
+
+    def extend(self, headers):
+        """
+        Return a new DAG with the commits of the given headers appended after the current ones.
+        Parents may be existing or appended commits.
+        """
+        commit_ids = []
+        parent_lists = []
+        time_stamps = []
+        author_idx = []
+        author_table = {a: i for i, a in enumerate(self.authors)}
+        for commit_id, parents, author, time_stamp in headers:
+            commit_ids.append(commit_id)
+            parent_lists.append(parents)
+            time_stamps.append(time_stamp)
+            author_idx.append(author_table.setdefault(author, len(author_table)))
+
+        n = len(self)
+        index_of = {c: n + i for i, c in enumerate(commit_ids)}
+
+        parent_ptr = np.zeros(len(commit_ids), dtype=np.int64)
+        parent_idx = []
+        for i, parents in enumerate(parent_lists):
+            for p in parents:
+                if p in index_of:
+                    parent_idx.append(index_of[p])
+                elif p in self:
+                    parent_idx.append(self.index(p))
+                # parents outside of the log (e.g. shallow clones) are dropped
+            parent_ptr[i] = len(parent_idx)
+        del index_of, parent_lists
+
+        parent_ptr = np.concatenate([self.parent_ptr, self.parent_ptr[-1] + parent_ptr])
+        parent_idx = np.concatenate([self.parent_idx, np.array(parent_idx, dtype=np.int32)])
+        child_ptr, child_idx = invert_csr(parent_ptr, parent_idx)
+
+        dag = CommitDAG(np.concatenate([self.commit_ids, np.array(commit_ids, dtype='S40')]),
+                        parent_ptr, parent_idx,
+                        child_ptr, child_idx,
+                        np.concatenate([self.time_stamps, np.array(time_stamps, dtype=np.int64)]),
+                        np.concatenate([self.author_idx, np.array(author_idx, dtype=np.int32)]),
+                        list(author_table))
+        dag.source = self.source
+        return dag
+
+    @classmethod
+    def from_meta_log(cls, meta_log_path):
+        dag = cls.from_headers(iter_meta_log_headers(meta_log_path))
+        dag.source = meta_log_fingerprint(meta_log_path)
+        return dag
+
+    def index(self, commit_id):
+        key = commit_id.encode('ascii')
+        pos = np.searchsorted(self._sorted_ids, key)
+        if pos >= len(self._sorted_ids) or self._sorted_ids[pos] != key:
+            raise KeyError(commit_id)
+        return int(self._sorted_idx[pos])
+
+    def __contains__(self, commit_id):
+        try:
+            self.index(commit_id)
+        except KeyError:
+            return False
+        return True
+
+    def commit_id(self, i):
+        return self.commit_ids[i].decode('ascii')
+
+    def parents(self, i):
+        return self.parent_idx[self.parent_ptr[i]:self.parent_ptr[i + 1]]
+
+    def sons(self, i):
+        return self.child_idx[self.child_ptr[i]:self.child_ptr[i + 1]]
+
+    def author(self, i):
+        return self.authors[self.author_idx[i]]
+
+    def set_tags(self, commit_tag_map):
+        self.tags = sorted(set(commit_tag_map.values()))
+        tag_pos = {t: i for i, t in enumerate(self.tags)}
+        self.tag_idx[:] = -1
+        for commit_id, tag in commit_tag_map.items():
+            if commit_id in self:
+                self.tag_idx[self.index(commit_id)] = tag_pos[tag]
+
+    def tag(self, i):
+        t = self.tag_idx[i]
+        return self.tags[t] if t >= 0 else None
+
+    def _walk(self, start, ptr, idx, stop_at_tags=False):
+        visited = np.zeros(len(self), dtype=bool)
+        q = [start]
+        order = []
+        while len(q) > 0:
+            i = q.pop()
+            if visited[i]:
+                continue
+            visited[i] = True
+            order.append(i)
+
+            if stop_at_tags and self.tag_idx[i] >= 0:
+                continue
+            q.extend(idx[ptr[i]:ptr[i + 1]].tolist())
+        return order
+
+    def ancestors(self, commit_id):
+        """ All ancestors of the given commit, the commit itself excluded """
+        start = self.index(commit_id)
+        return set(self.commit_id(i) for i in self._walk(start, self.parent_ptr, self.parent_idx) if i != start)
+
+    def descendants(self, commit_id):
+        """ All descendants of the given commit, the commit itself excluded """
+        start = self.index(commit_id)
+        return set(self.commit_id(i) for i in self._walk(start, self.child_ptr, self.child_idx) if i != start)
+
+    def son_tags(self, commit_id):
+        """ Tags of the given commit and all of its descendants, see analyze_git_logs.get_son_tags """
+        order = self._walk(self.index(commit_id), self.child_ptr, self.child_idx)
+        return set(self.tag(i) for i in order if self.tag_idx[i] >= 0)
+
+    def parent_tags(self, commit_id):
+        """ Nearest tagged ancestors of the given commit, see analyze_git_logs.get_parent_tags """
+        order = self._walk(self.index(commit_id), self.parent_ptr, self.parent_idx, stop_at_tags=True)
+        return set(self.tag(i) for i in order if self.tag_idx[i] >= 0)
+
+    def reverse_topological_order(self):
+        """ Commit indexes ordered so that every commit comes after all of its sons """
+        pending_sons = np.diff(self.child_ptr).tolist()
+        q = [i for i in range(len(self)) if pending_sons[i] == 0]
+        order = []
+        while len(q) > 0:
+            i = q.pop()
+            order.append(i)
+            for p in self.parents(i).tolist():
+                pending_sons[p] -= 1
+                if pending_sons[p] == 0:
+                    q.append(p)
+        return order
+
+    def save(self, cache_path):
+        with open(cache_path, 'wb') as fout:
+            np.savez(fout,
+                     commit_ids=self.commit_ids,
+                     parent_ptr=self.parent_ptr,
+                     parent_idx=self.parent_idx,
+                     child_ptr=self.child_ptr,
+                     child_idx=self.child_idx,
+                     time_stamps=self.time_stamps,
+                     author_idx=self.author_idx,
+                     authors=np.frombuffer('\0'.join(self.authors).encode('utf-8'), dtype=np.uint8),
+                     source=np.array(self.source if self.source is not None else [], dtype=np.int64))
+
+    @classmethod
+    def load(cls, cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            authors = data['authors'].tobytes().decode('utf-8').split('\0')
+            dag = cls(data['commit_ids'],
+                      data['parent_ptr'], data['parent_idx'],
+                      data['child_ptr'], data['child_idx'],
+                      data['time_stamps'], data['author_idx'], authors)
+            source = data['source'].tolist()
+            dag.source = source if len(source) > 0 else None
+        return dag
+
+
+def load_commit_dag(meta_log_path, cache_path, rebuild=False):
+    """ Load the DAG of a meta log from its binary cache, (re)building the cache when the log changed """
+    if not rebuild and os.path.exists(cache_path):
+        dag = CommitDAG.load(cache_path)
+        if dag.source == meta_log_fingerprint(meta_log_path):
+            return dag
+
+    dag = CommitDAG.from_meta_log(meta_log_path)
+    dag.save(cache_path)
+    return dag
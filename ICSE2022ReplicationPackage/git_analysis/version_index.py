@@ -0,0 +1,106 @@
+import json
+
+INITIAL_COMMIT_TAG = "Initial Commit"
+
+
+def parse_refs(output):
+    # output of `git for-each-ref --format="%(objecttype) %(objectname) %(*objecttype) %(*objectname) %(refname)"`,
+    # yields (commit, refname) for the refs pointing (possibly through an annotated tag) to a commit
+    for line in output.split('\n'):
+        if line.strip() == "":
+            continue
+
+        obj_type, obj_id, peeled_type, peeled_id, refname = line.split(' ', 4)
+        if obj_type == 'commit':
+            yield obj_id, refname
+        elif peeled_type == 'commit':
+            yield peeled_id, refname
+
+
+def parse_tag_refs(output):
+    # refs are sorted by name, so a commit with several tags keeps the last one (same as `git tag` + `git show`)
+    commit_tag_map = {}
+    for commit_id, tag in parse_refs(output):
+        commit_tag_map[commit_id] = tag
+
+    return commit_tag_map
+
+
+class VersionIndex:
+    """
+    Reachability index from commits to version tags: for each commit, a bitset (python int)
+    of the tags carried by the commit itself or any of its descendants. Bit i stands for tags[i].
+    """
+
+    def __init__(self, tags, reach, source=None):
+        self.tags = tags
+        self.reach = reach
+        # fingerprint of the meta log and the tags the index was built from
+        self.source = source
+
+    @classmethod
+    def build(cls, dag, commit_tag_map, source=None):
+        dag.set_tags(commit_tag_map)
+
+        commit_tags = [None] * len(dag)
+        for i in range(len(dag)):
+            if len(dag.parents(i)) == 0:
+                commit_tags[i] = INITIAL_COMMIT_TAG
+            else:
+                commit_tags[i] = dag.tag(i)
+
+        tags = sorted(set(t for t in commit_tags if t is not None))
+        tag_bit = {t: 1 << i for i, t in enumerate(tags)}
+        commit_bits = [tag_bit[t] if t is not None else 0 for t in commit_tags]
+
+        # reverse topological pass: every commit is visited after all of its sons
+        reach = [0] * len(dag)
+        for i in dag.reverse_topological_order():
+            bits = commit_bits[i]
+            for s in dag.sons(i).tolist():
+                bits |= reach[s]
+            reach[i] = bits
+
+        return cls(tags, {dag.commit_id(i): reach[i] for i in range(len(dag))}, source)
+
+    def descendant_tags(self, commit_id):
+        return self.bits_to_tags(self.reach[commit_id])
+
+    def bits_to_tags(self, bits):
+        tags = set()
+        while bits:
+            low = bits & -bits
+            tags.add(self.tags[low.bit_length() - 1])
+            bits ^= low
+        return tags
+
+    def affected_versions(self, inducing_commits, fixing_commits):
+        """
+        Tags reachable from any of the inducing commits but from none of the fixing commits.
+        Raises KeyError for commits missing from the index.
+        """
+        ic_bits = 0
+        for c in inducing_commits:
+            ic_bits |= self.reach[c]
+
+        fc_bits = 0
+        for c in fixing_commits:
+            fc_bits |= self.reach[c]
+
+        return self.bits_to_tags(ic_bits & ~fc_bits)
+
+    def save(self, index_path):
+        with open(index_path, 'w') as fout:
+            json.dump({
+                'source': self.source,
+                'tags': self.tags,
+                'reach': {c: format(bits, 'x') for c, bits in self.reach.items()}
+            }, fout)
+
+    @classmethod
+    def load(cls, index_path):
+        with open(index_path) as fin:
+            data = json.load(fin)
+        reach = {c: int(bits, 16) for c, bits in data['reach'].items()}
+        return cls(data['tags'], reach, data['source'])
+
@@ -0,0 +1,365 @@
+"""
+Script to extract the code churn, coupling, diffusion, experience, history and purpose
+features in a single walk over the history of a git repository.
+"""
+
+import csv
+import os
+import sys
+import time
+
+from argparse import ArgumentParser
+from datetime import datetime
+
+import numpy as np
+from pygit2 import Repository, GIT_SORT_TOPOLOGICAL, GIT_SORT_REVERSE
+from tqdm import tqdm
+
+from assemble_code_churns import (INITIAL_CODE_CHURNS, LinesOfCodeCache, count_files,
+                                  count_file_delta, get_commit_code_churns)
+from assemble_coupling_features import (CouplingCounter, get_coupling_features,
+                                        get_tree_paths)
+from assemble_diffusion_features import (get_commit_diffusion_features,
+                                         get_initial_diffusion_features)
+from assemble_history_features import get_files_in_tree
+from assemble_purpose_features import is_fix
+
+
+class FeatureWalk:
+    """
+    State shared by the feature calculators during a walk over a repository.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.head = repo.get(str(repo.head.target))
+        self._head_files = None
+
+    @property
+    def head_files(self):
+        """
+        The (non binary) java files of the checked out commit, which the
+        history and experience graphs are seeded with.
+        """
+        if self._head_files is None:
+            self._head_files = get_files_in_tree(self.head.tree, self.repo)
+        return self._head_files
+
+
+class CommitChange:
+    """
+    A commit and its diff against the previous commit of the walk. The diff is computed
+    once and its patches are shared by all calculators.
+    """
+
+    def __init__(self, repo, commit, parent):
+        self.repo = repo
+        self.commit = commit
+        self.diff = repo.diff(parent, commit)
+        self._patches = None
+        self._diffing_files = None
+
+    @property
+    def patches(self):
+        if self._patches is None:
+            self._patches = [p for p in self.diff]
+        return self._patches
+
+    @property
+    def diffing_files(self):
+        """
+        The (id, path, status) of the non binary files of the diff, see get_diffing_files.
+        """
+        if self._diffing_files is None:
+            self._diffing_files = set()
+            for patch in self.patches:
+                if patch.delta.is_binary:
+                    continue
+                nfile = patch.delta.new_file
+                self._diffing_files.add((nfile.id, nfile.path, patch.delta.status))
+        return self._diffing_files
+
+
+class CodeChurnFeatures:
+    """
+    Relative code churns, see assemble_code_churns. The file count of the tree
+    is kept up to date from the diffs.
+    """
+    names = ["lines_of_code_added", "lines_of_code_deleted", "files_churned",
+             "line_of_code_old"]
+
+    def __init__(self, loc_cache=None):
+        self.loc_cache = loc_cache if loc_cache is not None else {}
+        self.num_files = 0
+
+    def initial(self, walk, commit):
+        self.num_files = count_files(commit.tree, walk.repo)
+        return list(INITIAL_CODE_CHURNS)
+
+    def update(self, walk, change):
+        self.num_files += count_file_delta(change.patches)
+        return get_commit_code_churns(change.repo, change.commit, change.patches,
+                                      change.diff.stats, self.num_files, self.loc_cache)
+
+
+class CouplingFeatures:
+    """
+    Coupling features, see assemble_coupling_features. The co-change counts are kept
+    up to date from the diffs.
+    """
+    names = ["number_of_cruical_files", "number_of_moderate_risk_cruical_files",
+             "number_of_high_risk_cruical_files", "number_of_non_modified_change_couplings"]
+
+    def __init__(self):
+        self.counter = CouplingCounter()
+
+    def initial(self, walk, commit):
+        self.counter.add_changeset(get_tree_paths(commit.tree))
+        return [0.0, 0.0, 0.0, 0.0]
+
+    def update(self, walk, change):
+        paths = [patch.delta.new_file.path for patch in change.patches]
+        self.counter.add_changeset(paths)
+        return [float(f) for f in
+                get_coupling_features(paths, *self.counter.coupling_maps(paths))]
+
+
+class DiffusionFeatures:
+    """
+    Diffusion features, see assemble_diffusion_features.
+    """
+    names = ["modified_subsystems", "modified_subdirectories", "entropy"]
+
+    def initial(self, walk, commit):
+        return get_initial_diffusion_features(commit, walk.repo)
+
+    def update(self, walk, change):
+        return get_commit_diffusion_features(change.patches)
+
+
+class ExperienceFeatures:
+    """
+    Experience features, see assemble_experience_features. The author graph is kept
+    online: only the last state of each author is needed to compute the features.
+    """
+    names = ["experience", "rexp", "sexp"]
+
+    def __init__(self):
+        # author -> [time of the last commit, exp, rexp]
+        self.authors = {}
+
+    def initial(self, walk, commit):
+        head = walk.head
+        self.authors[head.committer.name] = [head.commit_time, 1,
+                                             [[len(walk.head_files), 1]]]
+        return [1.0, float(len(walk.head_files)), 0.0]
+
+    def update(self, walk, change):
+        commit = change.commit
+        author = commit.committer.name
+        num_files = len(change.diffing_files)
+
+        if author not in self.authors:
+            state = [commit.commit_time, 1, [[num_files, 1.0]]]
+        else:
+            last_time, exp, overall = self.authors[author]
+
+            date_current = datetime.fromtimestamp(commit.commit_time)
+            date_last = datetime.fromtimestamp(last_time)
+            diffing_years = abs(np.floor(float((date_current - date_last).days) / 365))
+
+            state = [commit.commit_time, exp + 1,
+                     [[num_files, 1.0]] + [[e[0], e[1] + diffing_years] for e in overall]]
+        self.authors[author] = state
+
+        rrexp = sum([float(float(e[0]) / (float(e[1]) + 1)) for e in state[2]])
+        return [float(state[1]), float(rrexp), 0.0]
+
+
+class HistoryFeatures:
+    """
+    History features, see assemble_history_features. The file graph is kept online:
+    only the last commit touching each file and its authors are needed.
+    """
+    names = ["number_of_authors", "age", "number_unique_changes"]
+
+    def __init__(self):
+        # file -> (last commit, its commit time, authors)
+        self.files = {}
+
+    def initial(self, walk, commit):
+        head = walk.head
+        for (_, name) in walk.head_files:
+            self.files[name] = (head.hex, head.commit_time, set([head.committer.name]))
+        return [1.0, 0.0, 0.0]
+
+    def update(self, walk, change):
+        commit = change.commit
+
+        total_number_of_authors = set()
+        total_age = []
+        total_unique_changes = set()
+
+        for name in set(f[1] for f in change.diffing_files):
+            authors = set([commit.committer.name])
+            if name in self.files:
+                prev_commit, prev_time, prev_authors = self.files[name]
+                authors.update(prev_authors)
+
+                total_unique_changes.add(prev_commit)
+                total_age.append(commit.commit_time - prev_time)
+            total_number_of_authors.update(authors)
+
+            self.files[name] = (commit.hex, commit.commit_time, authors)
+
+        total_age = float(sum(total_age)) / len(total_age) if total_age else 0
+
+        return [float(len(total_number_of_authors)), float(total_age),
+                float(len(total_unique_changes))]
+
+
+class PurposeFeatures:
+    """
+    Purpose feature, see assemble_purpose_features.
+    """
+    names = ["purpose"]
+
+    def initial(self, walk, commit):
+        return [1.0 if is_fix(commit.message) else 0.0]
+
+    def update(self, walk, change):
+        return self.initial(walk, change.commit)
+
+
+CALCULATORS = {
+    "churn": CodeChurnFeatures,
+    "coupling": CouplingFeatures,
+    "diffusion": DiffusionFeatures,
+    "experience": ExperienceFeatures,
+    "history": HistoryFeatures,
+    "purpose": PurposeFeatures,
+}
+
+
+def get_features(repo_path, branch, calculators):
+    """
+    Walk the history once, diff every commit once against the previous commit and
+    feed the change to all calculators. Returns the commits in walk order, the feature
+    names and a feature matrix with one row per commit.
+    """
+    repo = Repository(repo_path)
+    head = repo.references.get(branch)
+    walk = FeatureWalk(repo)
+
+    names = [name for calculator in calculators for name in calculator.names]
+
+    start_time = time.time()
+
+    commits = []
+    rows = []
+    previous = None
+    for commit in tqdm(repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE)):
+        row = []
+        if previous is None:
+            for calculator in calculators:
+                row.extend(calculator.initial(walk, commit))
+        else:
+            change = CommitChange(repo, commit, previous)
+            for calculator in calculators:
+                row.extend(calculator.update(walk, change))
+
+        commits.append(commit.hex)
+        rows.append(row)
+        previous = commit
+
+    end_time = time.time()
+
+    print("Done")
+    print("Overall processing time {}".format(end_time - start_time))
+
+    return commits, names, np.array(rows, dtype=np.float64).reshape(len(rows), len(names))
+
+
+def save_features(commits, names, features, path):
+    """
+    Save the features as a structured numpy array, one field per feature.
+    """
+    dtype = [("commit", "S40")] + [(name, np.float64) for name in names]
+    table = np.zeros(len(commits), dtype=dtype)
+    table["commit"] = commits
+    for i, name in enumerate(names):
+        table[name] = features[:, i]
+    np.save(path, table)
+
+
+def save_features_csv(commits, names, features, path):
+    """
+    Save the features to a csv file.
+    """
+    with open(path, 'w') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["commit"] + names)
+        for commit, row in zip(commits, features):
+            writer.writerow([commit] + [str(f) for f in row])
+
+
+if __name__ == "__main__":
+    PARSER = ArgumentParser(description="Utility to extract all commit features from" +
+                            " a repository in a single pass.")
+
+    PARSER.add_argument(
+        "--repository",
+        "-r",
+        type=str,
+        default="./repos/jenkins",
+        help="Path to local git repository.")
+    PARSER.add_argument(
+        "--branch",
+        "-b",
+        type=str,
+        default="refs/heads/master",
+        help="Which branch to use.")
+    PARSER.add_argument(
+        "--features",
+        "-f",
+        type=str,
+        nargs="+",
+        choices=list(CALCULATORS),
+        default=list(CALCULATORS),
+        help="Which feature groups to extract.")
+    PARSER.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default="./results/features.npy",
+        help="The path where the features are written.")
+    PARSER.add_argument(
+        "--loc-cache",
+        "-lc",
+        type=str,
+        default="./results/loc_cache.db",
+        help="The path to the persistent lines of code cache of the code churns.")
+    PARSER.add_argument(
+        "--csv",
+        type=str,
+        default=None,
+        help="Also write the features to this csv file.")
+
+    ARGS = PARSER.parse_args()
+    REPOPATH = ARGS.repository
+    BRANCH = ARGS.branch
+
+    if not os.path.exists(REPOPATH):
+        print("The repository path does not exist!")
+        sys.exit(1)
+
+    LOC_CACHE = LinesOfCodeCache(ARGS.loc_cache)
+    CALCS = [CALCULATORS[f](LOC_CACHE) if f == "churn" else CALCULATORS[f]()
+             for f in ARGS.features]
+
+    COMMITS, NAMES, FEATURES = get_features(REPOPATH, BRANCH, CALCS)
+    LOC_CACHE.close()
+
+    save_features(COMMITS, NAMES, FEATURES, ARGS.output)
+    if ARGS.csv:
+        save_features_csv(COMMITS, NAMES, FEATURES, ARGS.csv)
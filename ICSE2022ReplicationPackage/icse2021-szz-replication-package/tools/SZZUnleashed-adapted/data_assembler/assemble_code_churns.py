@@ -7,184 +7,226 @@ __license__ = "MIT"
 
 import csv
 import os
+import sqlite3
 import sys
 import time
 
 from argparse import ArgumentParser
+from functools import partial
 
-from multiprocessing import Process, Manager, cpu_count
-from pygit2 import Repository, GIT_SORT_REVERSE, GIT_SORT_TOPOLOGICAL
+from multiprocessing import cpu_count
+from pygit2 import GIT_DELTA_ADDED, GIT_DELTA_DELETED
 from tqdm import tqdm
 
-# Global variables
-MANAGER = Manager()
-RES = MANAGER.dict()
+from work_queue import get_commit_order, map_commit_chunks
 
+# Relative code churns of the initial commit
+INITIAL_CODE_CHURNS = [0.0, 0.0, 1.0, 0.0]
 
-def parse_code_churns(pid, repo_path, branch, start, stop=-1):
+
+class LinesOfCodeCache:
     """
-    Function that is intended to be runned by a process. It extracts the code churns
-    for a set of commits and stores them in the RES dict.
+    Persistent map from blob ids to their lines of code, shared by the processes
+    and kept between runs.
     """
-    repo = Repository(repo_path)
 
-    head = repo.references.get(branch)
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
+    def __init__(self, path, batch_size=10000):
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS loc (oid BLOB PRIMARY KEY, loc INTEGER) WITHOUT ROWID")
+        self.conn.commit()
+        self.batch_size = batch_size
+        self.pending = {}
+
+    def get(self, oid):
+        key = oid.raw
+        if key in self.pending:
+            return self.pending[key]
+        row = self.conn.execute("SELECT loc FROM loc WHERE oid = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __setitem__(self, oid, loc):
+        self.pending[oid.raw] = loc
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany("INSERT OR IGNORE INTO loc VALUES (?, ?)", self.pending.items())
+        self.conn.commit()
+        self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_loc_cache(loc_cache_path, repo):
+    """
+    Open the lines of code cache of a worker, an in-memory dict if there is no path.
+    """
+    return LinesOfCodeCache(loc_cache_path) if loc_cache_path else {}
 
-    start = start - 1 if (start > 0) else start
-    commits = commits[start:stop] if (stop != -1) else commits[start:]
 
-    code_churns = [[] for c in range(len(commits))]
-    for i, commit in enumerate(tqdm(commits[1:], position=pid)):
-        diff = repo.diff(commits[i], commit)
+def parse_code_churns(repo, commits, start, stop, loc_cache):
+    """
+    Function that is intended to be runned by a worker. It extracts the code churns
+    for the commits start:stop, each one compared to the commit before it.
+    """
+    parent = repo.get(commits[start - 1])
 
-        tree = commit.tree
+    # The file count is walked once per chunk, then kept up to date from the diffs
+    num_files = count_files(parent.tree, repo)
+
+    code_churns = []
+    for i in range(start, stop):
+        commit = repo.get(commits[i])
+        diff = repo.diff(parent, commit)
         patches = [p for p in diff]
-        stats = diff.stats
+        num_files += count_file_delta(patches)
 
-        # Count the total lines of code and find the biggest file that have been changed
-        total_tloc = 0
-        line_of_code_old = 0
-        for patch in patches:
-            if patch.delta.is_binary:
-                continue
-            new_file = patch.delta.new_file
+        # Churn features
+        code_churns.append([str(commit.hex)] + [
+            str(m) for m in get_commit_code_churns(repo, commit, patches, diff.stats,
+                                                   num_files, loc_cache)])
+        parent = commit
 
-            # Total lines of code
-            total_tloc += get_file_lines_of_code(repo, tree, new_file)
+    if isinstance(loc_cache, LinesOfCodeCache):
+        loc_cache.flush()
 
-            old_file = patch.delta.old_file
-            # Total lines of code in the old file
-            line_of_code_old = max(
-                line_of_code_old, get_file_lines_of_code(repo, tree, old_file))
+    return code_churns
 
-        # Churned lines of code
-        cloc = stats.insertions
-        # Deleted lines of code
-        dloc = stats.deletions
 
-        # Churned files
-        files_churned = len(patches)
+def get_commit_code_churns(repo, commit, patches, stats, num_files, loc_cache):
+    """
+    Compute the relative code churns of a commit from the patches and stats of its diff
+    against the previous commit. num_files is the number of files in the tree of the commit.
+    """
+    tree = commit.tree
 
-        # File count
-        num_files = count_files(tree, repo)
+    # Count the total lines of code and find the biggest file that have been changed
+    total_tloc = 0
+    line_of_code_old = 0
+    for patch in patches:
+        if patch.delta.is_binary:
+            continue
+        new_file = patch.delta.new_file
 
-        # Apply relative code churns
-        measure_one = float(cloc) / total_tloc if (total_tloc > 0) else float(cloc)
-        measure_two = float(dloc) / total_tloc if (total_tloc > 0) else float(cloc)
-        measure_three = (float(files_churned) / num_files if (num_files > 0)
-                         else float(files_churned))
+        # Total lines of code
+        total_tloc += get_file_lines_of_code(repo, tree, new_file, loc_cache)
 
-        line_of_code_old = float(line_of_code_old)
+        old_file = patch.delta.old_file
+        # Total lines of code in the old file
+        line_of_code_old = max(
+            line_of_code_old, get_file_lines_of_code(repo, tree, old_file, loc_cache))
 
-        # Churn features
-        code_churns[i].append(str(commit.hex))
-        code_churns[i].append(str(measure_one))
-        code_churns[i].append(str(measure_two))
-        code_churns[i].append(str(measure_three))
-        code_churns[i].append(str(line_of_code_old))
+    # Churned lines of code
+    cloc = stats.insertions
+    # Deleted lines of code
+    dloc = stats.deletions
+
+    # Churned files
+    files_churned = len(patches)
+
+    # Apply relative code churns
+    measure_one = float(cloc) / total_tloc if (total_tloc > 0) else float(cloc)
+    measure_two = float(dloc) / total_tloc if (total_tloc > 0) else float(cloc)
+    measure_three = (float(files_churned) / num_files if (num_files > 0)
+                     else float(files_churned))
+
+    line_of_code_old = float(line_of_code_old)
 
-    RES[pid] = code_churns
+    return [measure_one, measure_two, measure_three, line_of_code_old]
 
 
-def count_files(tree, repo):
+def count_files(tree, repo, counts=None):
     """
-    Count how many files there are in a repository.
+    Count how many files there are in a tree, in all its subdirectories. This is
+    the number of entries the diffs add and delete, so count_file_delta keeps it
+    up to date. Identical subtrees are counted each time they appear, but walked
+    once through counts, a map from tree ids to their number of files.
     """
+    if counts is None:
+        counts = {}
+    if tree.id in counts:
+        return counts[tree.id]
+
     num_files = 0
-    trees = []
-    visited = set()
-    visited.add(tree.id)
-    trees.append(tree)
-
-    while trees:
-        current_tree = trees.pop()
-        for entry in current_tree:
-            if entry.type == "tree":
-                if entry.id not in visited:
-                    trees.append(repo[entry.id])
-                    visited.add(entry.id)
-            else:
-                num_files += 1
+    for entry in tree:
+        if entry.type_str == "tree":
+            num_files += count_files(repo[entry.id], repo, counts)
+        else:
+            num_files += 1
+    counts[tree.id] = num_files
     return num_files
 
 
-def get_file_lines_of_code(repo, tree, dfile):
+def count_file_delta(patches):
+    """
+    Change of the number of files in a tree made by a diff.
+    """
+    delta = 0
+    for patch in patches:
+        if patch.delta.status == GIT_DELTA_ADDED:
+            delta += 1
+        elif patch.delta.status == GIT_DELTA_DELETED:
+            delta -= 1
+    return delta
+
+
+def get_file_lines_of_code(repo, tree, dfile, loc_cache):
     """
-    Count how many lines of code there are in a file.
+    Count how many lines of code there are in a file. The count only depends
+    on the blob, so it is looked up in and added to loc_cache by blob id.
     """
     tloc = 0
     try:
-        blob = repo[tree[dfile.path].id]
+        blob_id = tree[dfile.path].id
+        tloc = loc_cache.get(blob_id)
+        if tloc is not None:
+            return tloc
+
+        blob = repo[blob_id]
 
         tloc = len(str(blob.data).split('\\n'))
     except Exception as _:
-        return tloc
+        return 0
+    loc_cache[blob_id] = tloc
     return tloc
 
 
-def get_code_churns(repo_path, branch):
+def get_code_churns(repo_path, branch, loc_cache_path=None, cpus=None, chunk_size=64):
     """
     General function for extracting code churns. It first extracts the code churns for
     the first commit and then starts a number of processes(equal to the number of cores
-    on the computer), which equally extracts the code churns for the remaining commits.
+    on the computer by default), which pull chunks of the remaining commits from a queue.
     """
-    repo = Repository(repo_path)
-
-    head = repo.references.get(branch)
-
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
-    code_churns = [[]]
-
-    initial = commits[0]
+    if loc_cache_path:
+        # Create the cache before the processes share it
+        LinesOfCodeCache(loc_cache_path).close()
 
-    # Relative code churns
-    measure_one = 0.0
-    measure_two = 0.0
-    measure_three = 1.0
+    commits = get_commit_order(repo_path, branch)
 
-    line_of_code_old = 0.0
-
-    code_churns[0].append(str(initial.hex))
-    code_churns[0].append(str(measure_one))
-    code_churns[0].append(str(measure_two))
-    code_churns[0].append(str(measure_three))
-    code_churns[0].append(str(line_of_code_old))
+    initial = [commits[0]] + [str(m) for m in INITIAL_CODE_CHURNS]
 
     # Check how many processes that could be spawned
-    cpus = cpu_count()
+    cpus = cpus or cpu_count()
     print("Using {} cpus...".format(cpus))
 
-    # Equally split the commit set into the equally sized parts.
-    quote, remainder = divmod(len(commits), cpus)
-
-    processes = [
-        Process(
-            target=parse_code_churns,
-            args=(i, repo_path, branch, i * quote + min(i, remainder),
-                  (i + 1) * quote + min(i + 1, remainder))) for i in range(cpus)
-    ]
-
-    for process in processes:
-        process.start()
-
     start_time = time.time()
-    for process in processes:
-        process.join()
+    churns = []
+    chunks = map_commit_chunks(parse_code_churns, repo_path, commits, chunk_size, cpus,
+                               partial(open_loc_cache, loc_cache_path))
+    for chunk in tqdm(chunks, total=-(-(len(commits) - 1) // chunk_size)):
+        churns.extend(chunk)
     end_time = time.time()
 
     print("Done")
     print("Overall processing time {}".format(end_time - start_time))
 
-    # Assemble the results
-    churns = []
-    for _, churn in RES.items():
-        churns.extend(churn)
-
+    # Newest commit first and the initial commit last
     churns = list(reversed(churns))
-    churns.append(code_churns[0])
+    churns.append(initial)
     return churns
 
 def save_churns(churns, path="./results/code_churns_features_multithread.csv"):
@@ -220,6 +262,20 @@ if __name__ == "__main__":
         default="refs/heads/master",
         help="Which branch to use.")
 
+    PARSER.add_argument(
+        "--loc-cache",
+        "-lc",
+        type=str,
+        default="./results/loc_cache.db",
+        help="The path to the persistent lines of code cache.")
+
+    PARSER.add_argument(
+        "--chunk-size",
+        "-cs",
+        type=int,
+        default=64,
+        help="Number of commits handed to a process at a time.")
+
     ARGS = PARSER.parse_args()
     REPOPATH = ARGS.repository
     BRANCH = ARGS.branch
@@ -228,5 +284,5 @@ if __name__ == "__main__":
         print("The repository path does not exist!")
         sys.exit(1)
 
-    CHURNS = get_code_churns(REPOPATH, BRANCH)
+    CHURNS = get_code_churns(REPOPATH, BRANCH, ARGS.loc_cache, chunk_size=ARGS.chunk_size)
     save_churns(CHURNS)
@@ -1,5 +1,6 @@
 """
-Script to extract coupling features from code maat analysis files.
+Script to extract coupling features, either computed in-process or from code maat
+analysis files.
 """
 __author__ = "Oscar Svensson"
 __copyright__ = "Copyright (c) 2018 Axis Communications AB"
@@ -8,8 +9,10 @@ __license__ = "MIT"
 import csv
 import os
 
+from argparse import ArgumentParser
 from git import Repo
 import numpy as np
+from pygit2 import Repository, Index, GIT_SORT_TOPOLOGICAL, GIT_SORT_REVERSE
 from tqdm import tqdm
 
 def save_features(features, res_path):
@@ -30,21 +33,148 @@ def save_features(features, res_path):
             feat_writer.writerow(feature)
 
 
-def get_features():
+def get_coupling_features(paths, files, file_coupling_graph):
     """
-    Get the coupling features from a number of files.
+    Compute the coupling features of a commit from the paths it changed, the
+    (lowest) coupling degree of the coupled files and the files each file is
+    coupled with.
     """
-    commits = list(REPO.iter_commits('master'))
+    cruical_files = 0
+    cruical_degrees = []
+    for path in paths:
+        if path in files:
+            cruical_degrees.append(files[path])
+            cruical_files = cruical_files + 1
+
+    # Check for all non modified cruical non coupled files.
+    cruical_non_modified_couplings = 0
+    set_path = set(paths)
+    for path in paths:
+        if path in file_coupling_graph:
+            file_couplings = set(file_coupling_graph[path])
+            cruical_non_modified_couplings = cruical_non_modified_couplings + len(
+                file_couplings - set_path)
+
+    inds = np.digitize(cruical_degrees, [25, 50, 75, 100])
+    cruical_moderate = sum([1 for i in inds if i == 3])
+    cruical_high = sum([1 for i in inds if i == 4])
+
+    return [cruical_files, cruical_moderate, cruical_high, cruical_non_modified_couplings]
+
+
+class CouplingCounter:
+    """
+    Change coupling as computed by the coupling analysis of Code Maat, maintained
+    incrementally over a walk: the number of revisions of each file and a sparse
+    adjacency of the number of revisions shared by each pair of files.
+    """
+
+    def __init__(self, min_revs=5, min_shared_revs=5, min_coupling=30,
+                 max_coupling=100, max_changeset_size=30):
+        self.min_revs = min_revs
+        self.min_shared_revs = min_shared_revs
+        self.min_coupling = min_coupling
+        self.max_coupling = max_coupling
+        self.max_changeset_size = max_changeset_size
+        self.revs = {}
+        self.shared = {}
+
+    def add_changeset(self, paths):
+        """
+        Count a revision changing the given files. Large changesets count as a
+        revision of each file but do not couple them.
+        """
+        paths = set(paths)
+        for path in paths:
+            self.revs[path] = self.revs.get(path, 0) + 1
+
+        if len(paths) > self.max_changeset_size:
+            return
+
+        for path in paths:
+            coupled = self.shared.setdefault(path, {})
+            for other in paths:
+                if other != path:
+                    coupled[other] = coupled.get(other, 0) + 1
+
+    def couplings(self, path):
+        """
+        Yield the files coupled to a file within the bounds and their degree.
+        """
+        for other, shared_revs in self.shared.get(path, {}).items():
+            average_revs = (self.revs[path] + self.revs[other]) / 2.0
+            coupling = 100.0 * shared_revs / average_revs
+            if (average_revs >= self.min_revs and shared_revs >= self.min_shared_revs and
+                    self.min_coupling <= coupling <= self.max_coupling):
+                yield other, int(coupling)
+
+    def coupling_maps(self, paths):
+        """
+        The lowest coupling degree of each coupled file among paths and the files
+        each of them is coupled to with a degree of at least 50.
+        """
+        files = {}
+        file_coupling_graph = {}
+        for path in set(paths):
+            for other, degree in self.couplings(path):
+                files[path] = min(files.get(path, degree), degree)
+                if degree >= 50:
+                    file_coupling_graph.setdefault(path, []).append(other)
+        return files, file_coupling_graph
+
+
+def get_tree_paths(tree):
+    """
+    Get the paths of all files in a tree.
+    """
+    index = Index()
+    index.read_tree(tree)
+    return [entry.path for entry in index]
+
+
+def get_features(repo_path, branch, counter=None):
+    """
+    Get the coupling features of every commit with a single walk over the history,
+    the coupling of a commit being computed from the history up to and including it.
+    """
+    counter = counter or CouplingCounter()
+
+    repo = Repository(repo_path)
+    head = repo.references.get(branch)
+
+    features = []
+    previous = None
+    for commit in tqdm(repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE)):
+        if previous is None:
+            counter.add_changeset(get_tree_paths(commit.tree))
+            features.append([commit.hex, "0", "0", "0", "0"])
+        else:
+            paths = [patch.delta.new_file.path for patch in repo.diff(previous, commit)]
+            counter.add_changeset(paths)
+
+            feature = get_coupling_features(paths, *counter.coupling_maps(paths))
+            features.append([commit.hex] + [str(f) for f in feature])
+        previous = commit
+
+    # Newest commit first
+    return list(reversed(features))
+
+
+def get_code_maat_features(repo, result_dir):
+    """
+    Get the coupling features from the Code Maat analysis files of assemble_features.py.
+    """
+    commits = list(repo.iter_commits('master'))
 
     couplings = {}
     features = []
 
-    for hexsha in os.listdir("/h/oskars/data_all"):
+    for hexsha in os.listdir(result_dir):
         couplings[hexsha] = os.path.join(
-            os.path.join("/h/oskars/data_all", hexsha),
+            os.path.join(result_dir, hexsha),
             "{}_coupling.log.res".format(hexsha))
 
-    features.append([commits[0].hexsha, 0, 0, 0])
+    features.append([commits[0].hexsha, 0, 0, 0, 0])
     for i in tqdm(range(1, len(commits))):
         first = commits[i - 1]
         second = commits[i]
@@ -53,15 +183,9 @@ def get_features():
 
         paths = [d.b_path for d in diff]
 
-        cruical_moderate = 0
-        cruical_high = 0
-        cruical_files = 0
-        cruical_non_modified_couplings = 0
+        feature = [0, 0, 0, 0]
 
         if second.hexsha in couplings:
-            cruical_commits = 0
-            cruical_degrees = []
-
             with open(couplings[second.hexsha], 'r') as csvfile:
                 coup_rows = csv.reader(csvfile)
                 files = {}
@@ -97,39 +221,47 @@ def get_features():
                     elif degree >= 50:
                         file_coupling_graph[row[1]] = [row[0]]
 
-                for path in paths:
-                    if path in files:
-                        cruical_commits = cruical_commits + 1
-                        cruical_degrees.append(files[path])
-                        cruical_files = cruical_files + 1
-
-                # Check for all non modified cruical non coupled files.
-                set_path = set(paths)
-                for path in paths:
-                    if path in file_coupling_graph:
-                        file_couplings = set(file_coupling_graph[path])
-                        cruical_non_modified_couplings = cruical_non_modified_couplings + len(
-                            file_couplings - set_path)
-
-                inds = np.digitize(cruical_degrees, [25, 50, 75, 100])
-                cruical_moderate = sum([1 for i in inds if i == 3])
-                cruical_high = sum([1 for i in inds if i == 4])
-
-        features.append([
-            second.hexsha,
-            str(cruical_files),
-            str(cruical_moderate),
-            str(cruical_high),
-            str(cruical_non_modified_couplings)
-        ])
+                feature = get_coupling_features(paths, files, file_coupling_graph)
+
+        features.append([second.hexsha] + [str(f) for f in feature])
 
     return features
 
 
 if __name__ == "__main__":
-    global REPO
-    REPO = Repo("../../jenkins")
-    REPO = Repo("./repos/jenkins")
+    PARSER = ArgumentParser(description="Utility to extract coupling features from" +
+                            " a repository.")
+
+    PARSER.add_argument(
+        "--repository",
+        "-r",
+        type=str,
+        default="./repos/jenkins",
+        help="Path to local git repository.")
+    PARSER.add_argument(
+        "--branch",
+        "-b",
+        type=str,
+        default="refs/heads/master",
+        help="Which branch to use.")
+    PARSER.add_argument(
+        "--code-maat-results",
+        "-cm",
+        type=str,
+        default=None,
+        help="Read the couplings from the results of assemble_features.py " +
+        "in this directory instead of computing them.")
+    PARSER.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default="./results/coupling_features.csv",
+        help="The path where the output is written.")
+
+    ARGS = PARSER.parse_args()
 
-    FEATURES = get_features()
-    save_features(FEATURES, './results/coupling_features.csv')
+    if ARGS.code_maat_results:
+        FEATURES = get_code_maat_features(Repo(ARGS.repository), ARGS.code_maat_results)
+    else:
+        FEATURES = get_features(ARGS.repository, ARGS.branch)
+    save_features(FEATURES, ARGS.output)
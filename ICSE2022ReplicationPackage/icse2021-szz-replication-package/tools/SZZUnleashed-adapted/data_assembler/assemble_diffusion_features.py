@@ -11,13 +11,12 @@ import sys
 import time
 
 from argparse import ArgumentParser
-from multiprocessing import Process, Manager, cpu_count
+from multiprocessing import cpu_count
 from numpy import log2
-from pygit2 import Repository, GIT_SORT_TOPOLOGICAL, GIT_SORT_REVERSE
+from pygit2 import Repository
 from tqdm import tqdm
 
-MANAGER = Manager()
-RES = MANAGER.dict()
+from work_queue import get_commit_order, map_commit_chunks
 
 
 def count_diffing_subsystems(subsystems):
@@ -43,65 +42,63 @@ def count_entropy(file_changes, total_change):
     ])
 
 
-def parse_diffusion_features(pid, repo_path, branch, start, stop=-1):
+def parse_diffusion_features(repo, commits, start, stop, _):
     """
-    Function to extract diffusion features from a set of commits.
+    Function to extract diffusion features from the commits start:stop, each one
+    compared to the commit before it.
     """
-    repo = Repository(repo_path)
-
-    head = repo.references.get(branch)
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
-
-    start = start - 1 if (start > 0) else start
-    commits = commits[start:stop] if (stop != -1) else commits[start:]
-
-    features = [[] for c in range(len(commits))]
-    for i, commit in enumerate(tqdm(commits[1:], position=pid)):
-        diff = repo.diff(commits[i], commit)
-
-        patches = [p for p in diff]
+    features = []
+    parent = repo.get(commits[start - 1])
+    for i in range(start, stop):
+        commit = repo.get(commits[i])
+        diff = repo.diff(parent, commit)
 
-        # Extract all different subsystems that have been modified
-        modules = set([])
-        subsystems_mapping = {}
-        entropy_change = 0
+        # Add all features
+        features.append([str(commit.hex)] + [
+            str(float(f)) for f in get_commit_diffusion_features([p for p in diff])])
+        parent = commit
 
-        file_changes = []
-        total_change = 0
-        for patch in patches:
-            # Skip binary files
-            if patch.delta.is_binary:
-                continue
-            _, addition, deletions = patch.line_stats
-            total_change = total_change + (addition + deletions)
-            file_changes.append(addition + deletions)
+    return features
 
-            # Store all subsystems
-            fpath = patch.delta.new_file.path
-            subsystems = fpath.split('/')[:-1]
+def get_commit_diffusion_features(patches):
+    """
+    Compute the number of modified subsystems, the number of modified subdirectories
+    and the entropy of a commit from the patches of its diff against the previous commit.
+    """
+    # Extract all different subsystems that have been modified
+    modules = set([])
+    subsystems_mapping = {}
+    entropy_change = 0
+
+    file_changes = []
+    total_change = 0
+    for patch in patches:
+        # Skip binary files
+        if patch.delta.is_binary:
+            continue
+        _, addition, deletions = patch.line_stats
+        total_change = total_change + (addition + deletions)
+        file_changes.append(addition + deletions)
 
-            root = subsystems_mapping
-            for system in subsystems:
-                if system not in root:
-                    root[system] = {}
-                root = root[system]
-            if subsystems > 0:
-                modules.add(subsystems[0])
+        # Store all subsystems
+        fpath = patch.delta.new_file.path
+        subsystems = fpath.split('/')[:-1]
 
-        # Check how many subsystems that have been touched
-        modified_systems = count_diffing_subsystems(subsystems_mapping)
+        root = subsystems_mapping
+        for system in subsystems:
+            if system not in root:
+                root[system] = {}
+            root = root[system]
+        if subsystems:
+            modules.add(subsystems[0])
 
-        # Calculate the entropy for the commit
-        entropy_change = count_entropy(file_changes, total_change)
+    # Check how many subsystems that have been touched
+    modified_systems = count_diffing_subsystems(subsystems_mapping)
 
-        # Add all features
-        features[i].append(str(commit.hex))
-        features[i].append(str(float(modified_systems)))
-        features[i].append(str(float(len(modules))))
-        features[i].append(str(float(entropy_change)))
+    # Calculate the entropy for the commit
+    entropy_change = count_entropy(file_changes, total_change)
 
-    RES[pid] = features
+    return [modified_systems, len(modules), entropy_change]
 
 def parse_tree(tree, repo):
     """
@@ -114,9 +111,9 @@ def parse_tree(tree, repo):
     tree = repo[tree.id]
 
     for entry in tree:
-        if entry.type == "bin":
+        if entry.type_str == "bin":
             continue
-        if entry.type == "tree":
+        if entry.type_str == "tree":
             sub_additions, sub_file_additions, sub_entries = parse_tree(
                 entry, repo)
             found_sub_entries += (1 + sub_entries)
@@ -133,19 +130,10 @@ def parse_tree(tree, repo):
 
     return additions, file_additions, found_sub_entries
 
-def get_diffusion_features(repo_path, branch):
+def get_initial_diffusion_features(initial, repo):
     """
-    Function that extracts the first commits diffusion features. It then starts
-    a number of processes(equal to the number of cores on the computer), and then
-    distributes the remaining commits to them.
+    Compute the diffusion features of the initial commit from its whole tree.
     """
-    repo = Repository(repo_path)
-
-    head = repo.references.get(branch)
-
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
-    initial = commits[0]
     init_tree = initial.tree
 
     # Count inital total lines of code
@@ -156,7 +144,7 @@ def get_diffusion_features(repo_path, branch):
     init_modules = 0
 
     for entry in init_tree:
-        if entry.type == "tree":
+        if entry.type_str == "tree":
             added, file_additions, subdirectories = parse_tree(entry, repo)
 
             init_modules += 1
@@ -170,41 +158,39 @@ def get_diffusion_features(repo_path, branch):
                 init_file_addtions.append(additions)
             except:
                 continue
-    diffusion_features = []
-    diffusion_features.append(initial.hex)
-    diffusion_features.append(init_subdirectories)
-    diffusion_features.append(init_modules)
-    diffusion_features.append(
-        count_entropy(init_file_addtions, init_total_additions))
 
-    # Check how many processes that could be spawned
-    cpus = cpu_count()
-    print("Using {} cpus...".format(cpus))
-    # Divide the commits eqaully between the processes.
-    quote, remainder = divmod(len(commits), cpus)
+    return [init_subdirectories, init_modules,
+            count_entropy(init_file_addtions, init_total_additions)]
+
+def get_diffusion_features(repo_path, branch, cpus=None, chunk_size=64):
+    """
+    Function that extracts the first commits diffusion features. It then starts
+    a number of processes(equal to the number of cores on the computer by default),
+    which pull chunks of the remaining commits from a queue.
+    """
+    repo = Repository(repo_path)
 
-    processes = [
-        Process(
-            target=parse_diffusion_features,
-            args=(i, repo_path, branch, i * quote + min(i, remainder),
-                  (i + 1) * quote + min(i + 1, remainder))) for i in range(cpus)
-    ]
+    commits = get_commit_order(repo_path, branch)
+    initial = repo.get(commits[0])
 
-    for process in processes:
-        process.start()
+    diffusion_features = [initial.hex]
+    diffusion_features.extend(get_initial_diffusion_features(initial, repo))
+
+    # Check how many processes that could be spawned
+    cpus = cpus or cpu_count()
+    print("Using {} cpus...".format(cpus))
 
     start_time = time.time()
-    for process in processes:
-        process.join()
+    features = []
+    chunks = map_commit_chunks(parse_diffusion_features, repo_path, commits, chunk_size, cpus)
+    for chunk in tqdm(chunks, total=-(-(len(commits) - 1) // chunk_size)):
+        features.extend(chunk)
     end_time = time.time()
 
     print("Done")
     print("Overall processing time {}".format(end_time - start_time))
 
-    # Assemble the results
-    features = []
-    for _, feat in RES.items():
-        features.extend(feat)
+    # Newest commit first and the initial commit last
     features = list(reversed(features))
     features.append(diffusion_features)
     return features
@@ -243,6 +229,13 @@ if __name__ == "__main__":
         default="refs/heads/master",
         help="Which branch to use.")
 
+    PARSER.add_argument(
+        "--chunk-size",
+        "-cs",
+        type=int,
+        default=64,
+        help="Number of commits handed to a process at a time.")
+
     ARGS = PARSER.parse_args()
     REPOPATH = ARGS.repository
     BRANCH = ARGS.branch
@@ -250,5 +243,5 @@ if __name__ == "__main__":
         print("The repository path does not exist!")
         sys.exit(1)
 
-    DIFFUSION_FEATURES = get_diffusion_features(REPOPATH, BRANCH)
+    DIFFUSION_FEATURES = get_diffusion_features(REPOPATH, BRANCH, chunk_size=ARGS.chunk_size)
     save_diffusion_features(DIFFUSION_FEATURES)
@@ -6,8 +6,6 @@ __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
 import csv
-import json
-import sys
 import time
 
 from argparse import ArgumentParser
@@ -16,15 +14,7 @@ from numpy import floor
 from pygit2 import Repository, GIT_SORT_TOPOLOGICAL, GIT_SORT_REVERSE
 from tqdm import tqdm
 
-def set_to_list(obj):
-    """
-    Helper function to turn sets to lists and floats to strings.
-    """
-    if isinstance(obj, set):
-        return list(obj)
-    if isinstance(obj, float):
-        return str('%.15g' % obj)
-    raise TypeError
+from graph_store import ExperienceGraph
 
 
 def get_files_in_tree(tree, repo):
@@ -33,7 +23,7 @@ def get_files_in_tree(tree, repo):
     """
     files = set()
     for entry in tree:
-        if entry.type == "tree":
+        if entry.type_str == "tree":
             sub_files = [(f[0], "{}/{}".format(entry.name, f[1]))
                          for f in get_files_in_tree(repo[entry.id], repo)]
             files.update(sub_files)
@@ -63,6 +53,15 @@ def get_diffing_files(commit, parent, repo):
 
     return files
 
+def diffing_years(commit_time, last_commit_time):
+    """
+    Function to get the number of years counted between two commits of an author.
+    """
+    date_current = datetime.fromtimestamp(commit_time)
+    date_last = datetime.fromtimestamp(last_commit_time)
+
+    return abs(floor(float((date_current - date_last).days) / 365))
+
 def save_experience_features_graph(repo_path, branch, graph_path):
     """
     Function to get and save the experience graph.
@@ -70,8 +69,7 @@ def save_experience_features_graph(repo_path, branch, graph_path):
     repo = Repository(repo_path)
     head = repo.references.get(branch)
 
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
+    walk = repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE)
     current_commit = repo.head.target
 
     start_time = time.time()
@@ -79,108 +77,29 @@ def save_experience_features_graph(repo_path, branch, graph_path):
     current_commit = repo.get(str(current_commit))
     files = get_files_in_tree(current_commit.tree, repo)
 
-    all_authors = {}
-
-    author = current_commit.committer.name
-
-    all_authors[author] = {}
-    all_authors[author]['lastcommit'] = current_commit.hex
-    all_authors[author][current_commit.hex] = {}
-    all_authors[author][current_commit.hex]['prevcommit'] = ""
-    all_authors[author][current_commit.hex]["exp"] = 1
-    all_authors[author][current_commit.hex]["rexp"] = [[len(files), 1]]
-    all_authors[author][current_commit.hex]["sexp"] = {}
-
-    for i, commit in enumerate(tqdm(commits[1:])):
-        files = get_diffing_files(commit, commits[i], repo)
-
-        author = commit.committer.name
-        if author not in all_authors:
-            all_authors[author] = {}
-            all_authors[author]['lastcommit'] = commit.hex
-            all_authors[author][commit.hex] = {}
-            all_authors[author][commit.hex]['prevcommit'] = ""
-            all_authors[author][commit.hex]["exp"] = 1
-            all_authors[author][commit.hex]["rexp"] = [[len(files), 1.0]]
-            all_authors[author][commit.hex]["sexp"] = {}
-        else:
-            last_commit = all_authors[author]["lastcommit"]
-            all_authors[author]["lastcommit"] = commit.hex
-            all_authors[author][commit.hex] = {}
-            all_authors[author][commit.hex]['prevcommit'] = last_commit
-            all_authors[author][commit.hex][
-                'exp'] = 1 + all_authors[author][last_commit]['exp']
-
-            date_current = datetime.fromtimestamp(commit.commit_time)
-            date_last = datetime.fromtimestamp(repo.get(last_commit).commit_time)
-
-            diffing_years = abs(floor(float((date_current - date_last).days) / 365))
-
-            overall = all_authors[author][last_commit]['rexp']
-
-            all_authors[author][commit.hex][
-                'rexp'] = [[len(files), 1.0]] + [[e[0], e[1] + diffing_years]
-                                                 for e in overall]
-
-    with open(graph_path, 'w') as output:
-        json.dump(all_authors, output, default=set_to_list)
+    ExperienceGraph.build(graph_path, tqdm(walk), current_commit, files,
+                          lambda commit, parent: get_diffing_files(commit, parent, repo),
+                          diffing_years)
 
     end_time = time.time()
 
     print("Done")
     print("Overall processing time {}".format(end_time - start_time))
 
-def load_experience_features_graph(path="./results/author_graph.json"):
+def load_experience_features_graph(path="./results/author_graph"):
     """
-    Function to load the feeatures graph.
+    Function to load the (memory-mapped) features graph.
     """
-    file_graph = {}
-    with open(path, 'r') as inp:
-        file_graph = json.load(inp, parse_float=lambda x: float(x))
-    return file_graph
+    return ExperienceGraph.load(path)
 
 
-def get_experience_features(graph, repo_path, branch):
+def get_experience_features(graph):
     """
     Function that extracts the experience features from a experience graph.
     """
-    repo = Repository(repo_path)
-    head = repo.references.get(branch)
-
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
-    current_commit = repo.head.target
-
-    files = get_files_in_tree(repo.get(str(current_commit)).tree, repo)
-
     features = []
-
-    commit_feat = []
-    commit_feat.append(str(commits[0].hex))
-    commit_feat.append(str(1.0))
-    commit_feat.append(str(len(files)))
-    commit_feat.append(str(0.0))
-    features.append(commit_feat)
-
-    for _, commit in enumerate(tqdm(commits[1:])):
-        author = commit.committer.name
-
-        exp = graph[author][commit.hex]['exp']
-        rexp = graph[author][commit.hex]['rexp']
-        try:
-            rrexp = sum([float(float(e[0]) / (float(e[1]) + 1)) for e in rexp])
-        except:
-            print(author)
-            print(commit.hex)
-            print(rexp)
-            sys.exit(1)
-
-        commit_feat = []
-        commit_feat.append(str(commit.hex))
-        commit_feat.append(str(float(exp)))
-        commit_feat.append(str(float(rrexp)))
-        commit_feat.append(str(float(0)))
-        features.append(commit_feat)
+    for feature in tqdm(graph.features(), total=len(graph.commits)):
+        features.append([str(f) for f in feature])
     return features
 
 
@@ -221,8 +140,8 @@ if __name__ == "__main__":
         "--graph-path",
         "-gp",
         type=str,
-        default="./results/author_graph.json",
-        help="The path to where the graph is stored.")
+        default="./results/author_graph",
+        help="The directory where the graph is stored.")
     PARSER.add_argument(
         "--output",
         "-o",
@@ -240,5 +159,5 @@ if __name__ == "__main__":
     if SAVE_GRAPH:
         save_experience_features_graph(REPO_PATH, BRANCH, GRAPH_PATH)
     GRAPH = load_experience_features_graph(GRAPH_PATH)
-    EXPERIENCE_FEATURES = get_experience_features(GRAPH, REPO_PATH, BRANCH)
+    EXPERIENCE_FEATURES = get_experience_features(GRAPH)
     save_experience_features(EXPERIENCE_FEATURES, OUTPUT)
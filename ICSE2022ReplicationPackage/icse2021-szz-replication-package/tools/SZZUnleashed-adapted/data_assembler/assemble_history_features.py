@@ -6,20 +6,13 @@ __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
 import csv
-import json
 import time
 
 from argparse import ArgumentParser
 from pygit2 import Repository, GIT_SORT_TOPOLOGICAL, GIT_SORT_REVERSE
 from tqdm import tqdm
 
-def set_to_list(obj):
-    """
-    Helper function to convert a set to a list.
-    """
-    if isinstance(obj, set):
-        return list(obj)
-    raise TypeError
+from graph_store import HistoryGraph
 
 def get_files_in_tree(tree, repo):
     """
@@ -27,7 +20,7 @@ def get_files_in_tree(tree, repo):
     """
     files = set()
     for entry in tree:
-        if entry.type == "tree":
+        if entry.type_str == "tree":
             sub_files = [(f[0], "{}/{}".format(entry.name, f[1]))
                          for f in get_files_in_tree(repo[entry.id], repo)]
             files.update(sub_files)
@@ -66,49 +59,16 @@ def save_history_features_graph(repo_path, branch, graph_path):
     repo = Repository(repo_path)
     head = repo.references.get(branch)
 
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
+    walk = repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE)
     current_commit = repo.head.target
 
     start_time = time.time()
 
-    all_files = {}
     current_commit = repo.get(str(current_commit))
     files = get_files_in_tree(current_commit.tree, repo)
 
-    for (_, name) in tqdm(files):
-        all_files[name] = {}
-        all_files[name]['lastcommit'] = current_commit.hex
-        all_files[name][current_commit.hex] = {}
-        all_files[name][current_commit.hex]["prevcommit"] = ""
-        all_files[name][current_commit.hex]["authors"] = [
-            current_commit.committer.name
-        ]
-
-    for i, commit in enumerate(tqdm(commits[1:])):
-        files = get_diffing_files(commit, commits[i], repo)
-        for (_, name, _) in files:
-            if name not in all_files:
-                all_files[name] = {}
-
-            last_commit = ""
-            if 'lastcommit' not in all_files[name]:
-                all_files[name]['lastcommit'] = commit.hex
-            else:
-                last_commit = all_files[name]['lastcommit']
-
-            all_files[name][commit.hex] = {}
-            all_files[name][commit.hex]["prevcommit"] = last_commit
-
-            authors = set([commit.committer.name])
-            if last_commit:
-                authors.update(all_files[name][last_commit]["authors"])
-            all_files[name][commit.hex]["authors"] = authors
-
-            all_files[name]['lastcommit'] = commit.hex
-
-    with open(graph_path, 'w') as output:
-        json.dump(all_files, output, default=set_to_list)
+    HistoryGraph.build(graph_path, tqdm(walk), current_commit, files,
+                       lambda commit, parent: get_diffing_files(commit, parent, repo))
 
     end_time = time.time()
 
@@ -117,63 +77,20 @@ def save_history_features_graph(repo_path, branch, graph_path):
 
 def load_history_features_graph(path):
     """
-    Save the history features to a csv file.
+    Load the (memory-mapped) history graph.
     """
-    file_graph = {}
-    with open(path, 'r') as inp:
-        file_graph = json.load(inp)
-    return file_graph
+    return HistoryGraph.load(path)
 
 
-def get_history_features(graph, repo_path, branch):
+def get_history_features(graph):
     """
-    Function that extracts the history features from a git repository.
+    Function that extracts the history features from a history graph.
     They are the total number of authors, the total age and the total
     number of unique changes.
     """
-    repo = Repository(repo_path)
-    head = repo.references.get(branch)
-
-    commits = list(
-        repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE))
-
     features = []
-
-    commit_feat = []
-    commit_feat.append(str(commits[0].hex))
-    commit_feat.append(str(1.0))
-    commit_feat.append(str(0.0))
-    commit_feat.append(str(0.0))
-    features.append(commit_feat)
-
-    for i, commit in enumerate(tqdm(commits[1:])):
-        files = get_diffing_files(commit, commits[i], repo)
-
-        total_number_of_authors = set()
-        total_age = []
-        total_unique_changes = set()
-
-        for (_, name, _) in files:
-            sub_graph = graph[name][commit.hex]
-            total_number_of_authors.update(sub_graph['authors'])
-
-            prev_commit = sub_graph['prevcommit']
-            if prev_commit:
-                total_unique_changes.add(prev_commit)
-
-                prev_commit_obj = repo.get(prev_commit)
-
-                total_age.append(commit.commit_time -
-                                 prev_commit_obj.commit_time)
-
-        total_age = float(sum(total_age)) / len(total_age) if total_age else 0
-
-        commit_feat = []
-        commit_feat.append(str(commit.hex))
-        commit_feat.append(str(float(len(total_number_of_authors))))
-        commit_feat.append(str(float(total_age)))
-        commit_feat.append(str(float(len(total_unique_changes))))
-        features.append(commit_feat)
+    for feature in tqdm(graph.features(), total=len(graph.commits)):
+        features.append([str(f) for f in feature])
     return features
 
 
@@ -215,8 +132,8 @@ if __name__ == "__main__":
         "--graph-path",
         "-gp",
         type=str,
-        default="./results/file_graph.json",
-        help="The path to where the graph is stored.")
+        default="./results/file_graph",
+        help="The directory where the graph is stored.")
     PARSER.add_argument(
         "--output",
         "-o",
@@ -235,5 +152,5 @@ if __name__ == "__main__":
     if SAVE_GRAPH:
         save_history_features_graph(REPO_PATH, BRANCH, GRAPH_PATH)
     GRAPH = load_history_features_graph(GRAPH_PATH)
-    HISTORY_FEATURES = get_history_features(GRAPH, REPO_PATH, BRANCH)
+    HISTORY_FEATURES = get_history_features(GRAPH)
     save_history_features(HISTORY_FEATURES, OUTPUT)
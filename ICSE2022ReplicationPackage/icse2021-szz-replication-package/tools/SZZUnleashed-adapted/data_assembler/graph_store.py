@@ -0,0 +1,309 @@
+"""
+Compact on-disk stores for the history and experience graphs. Every column is an
+append-only binary file which is memory-mapped when the graph is loaded, authors
+and files are interned to integer ids.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+class ColumnWriter:
+    """
+    Append-only column of fixed size values, written to disk in batches.
+    """
+
+    def __init__(self, path, dtype, batch_size=65536):
+        self.fout = open(path, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.batch_size = batch_size
+        self.buffer = []
+        self.size = 0
+
+    def append(self, value):
+        self.buffer.append(value)
+        self.size += 1
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def flush(self):
+        if self.buffer:
+            np.asarray(self.buffer, dtype=self.dtype).tofile(self.fout)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.fout.close()
+
+
+class ColumnStore:
+    """
+    A directory of columns plus a json file with their types and the interned names.
+    """
+    columns = {}
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        for name, dtype in self.columns.items():
+            setattr(self, name, self.read_column(name, dtype))
+
+    def read_column(self, name, dtype):
+        column_path = os.path.join(self.path, name + '.bin')
+        if os.path.getsize(column_path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(column_path, dtype=dtype, mode='r')
+
+    @classmethod
+    def writers(cls, path):
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return {name: ColumnWriter(os.path.join(path, name + '.bin'), dtype)
+                for name, dtype in cls.columns.items()}
+
+    @classmethod
+    def finish(cls, path, writers, meta):
+        for writer in writers.values():
+            writer.close()
+        with open(os.path.join(path, 'meta.json'), 'w') as output:
+            json.dump(meta, output)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json'), 'r') as inp:
+            meta = json.load(inp)
+        return cls(path, meta)
+
+
+class Interner:
+    """
+    Map names to consecutive integer ids.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __call__(self, name):
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+
+class HistoryGraph(ColumnStore):
+    """
+    For each commit of the walk (in walk order), the files it changed with the previous
+    commit that changed them and the authors that have changed them so far.
+
+    The entries of commit i are entry_ptr[i]:entry_ptr[i + 1], entry_prev is -1 for files
+    changed for the first time and HEAD_SEED for files last changed by head. The authors of
+    an entry are a chain in the author pool: author_pool[n] for the nodes n = author_head,
+    author_next[n], ... until -1. A file gets a new node, linked to its previous chain, only
+    for an author who has not changed it yet, so the pool holds one value per distinct
+    (file, author) pair.
+    """
+    columns = {
+        'commits': 'S40',
+        'commit_time': np.int64,
+        'entry_ptr': np.int64,
+        'entry_file': np.int32,
+        'entry_prev': np.int32,
+        'entry_prev_time': np.int64,
+        'author_head': np.int64,
+        'author_pool': np.int32,
+        'author_next': np.int64,
+    }
+
+    HEAD_SEED = -2
+
+    @classmethod
+    def build(cls, path, walk, head, head_files, get_diffing_files):
+        """
+        Build the graph from the commits of a walk. The files of head are seeded as
+        last changed by head, get_diffing_files(commit, parent) gives the changed files.
+        """
+        writers = cls.writers(path)
+        authors = Interner()
+        files = Interner()
+
+        # file id -> (last commit, its time, head of its author chain, bitset of its authors)
+        last = {}
+        head_author = authors(head.committer.name)
+        writers['author_pool'].append(head_author)
+        writers['author_next'].append(-1)
+        for (_, name) in head_files:
+            last[files(name)] = (cls.HEAD_SEED, head.commit_time, 0, 1 << head_author)
+
+        # index of head in the walk, if it is part of it
+        head_index = None
+        num_entries = 0
+        previous = None
+        writers['entry_ptr'].append(0)
+        for i, commit in enumerate(walk):
+            writers['commits'].append(commit.hex.encode('ascii'))
+            writers['commit_time'].append(commit.commit_time)
+            if commit.hex == head.hex:
+                head_index = i
+
+            if previous is not None:
+                author = authors(commit.committer.name)
+                names = set(name for (_, name, _) in get_diffing_files(commit, previous))
+                for name in names:
+                    file_id = files(name)
+                    state = last.get(file_id)
+
+                    if state is None:
+                        prev, prev_time, node, file_authors = -1, 0, -1, 0
+                    else:
+                        prev, prev_time, node, file_authors = state
+                    if not file_authors >> author & 1:
+                        file_authors |= 1 << author
+                        writers['author_pool'].append(author)
+                        writers['author_next'].append(node)
+                        node = writers['author_pool'].size - 1
+
+                    writers['entry_file'].append(file_id)
+                    writers['entry_prev'].append(prev)
+                    writers['entry_prev_time'].append(prev_time)
+                    writers['author_head'].append(node)
+                    last[file_id] = (i, commit.commit_time, node, file_authors)
+                num_entries += len(names)
+
+            writers['entry_ptr'].append(num_entries)
+            previous = commit
+
+        cls.finish(path, writers, {'authors': authors.names, 'files': files.names,
+                                   'head_index': head_index})
+
+    def features(self):
+        """
+        Yield the commit, the number of authors, the average age and the number of unique
+        changes of every commit, see assemble_history_features.get_history_features.
+        """
+        author_pool = self.author_pool.tolist()
+        author_next = self.author_next.tolist()
+        for i in range(len(self.commits)):
+            commit = self.commits[i].decode('ascii')
+            if i == 0:
+                yield commit, 1.0, 0.0, 0.0
+                continue
+
+            start, stop = self.entry_ptr[i], self.entry_ptr[i + 1]
+
+            total_number_of_authors = set()
+            for node in self.author_head[start:stop].tolist():
+                while node != -1:
+                    total_number_of_authors.add(author_pool[node])
+                    node = author_next[node]
+
+            prevs = self.entry_prev[start:stop]
+            has_prev = prevs != -1
+            ages = self.commit_time[i] - self.entry_prev_time[start:stop][has_prev]
+            total_age = float(ages.sum()) / len(ages) if len(ages) else 0
+
+            head_index = self.meta['head_index']
+            unique_changes = set(prevs[has_prev].tolist())
+            if head_index is not None and self.HEAD_SEED in unique_changes:
+                unique_changes.discard(self.HEAD_SEED)
+                unique_changes.add(head_index)
+            total_unique_changes = len(unique_changes)
+
+            yield (commit, float(len(total_number_of_authors)), float(total_age),
+                   float(total_unique_changes))
+
+
+class ExperienceGraph(ColumnStore):
+    """
+    For each commit of the walk, its author, the number of files it changed, the
+    experience of the author and the author's accumulated years between commits.
+
+    The rexp list of an author at a commit is then [files_j, 1 + years - years_j] over
+    the author's commits j so far, so it does not have to be copied for every commit.
+    Row 0 holds the seed entry of the author of head, row i the commit i of the walk.
+    """
+    columns = {
+        'commits': 'S40',
+        'author': np.int32,
+        'files': np.int32,
+        'exp': np.int32,
+        'years': np.float64,
+    }
+
+    @classmethod
+    def build(cls, path, walk, head, head_files, get_diffing_files, years_between):
+        """
+        Build the graph from the commits of a walk, years_between(current, last)
+        gives the years counted between two commits of an author.
+        """
+        writers = cls.writers(path)
+        authors = Interner()
+
+        # author id -> [time of the last commit, exp, years]
+        last = {}
+        head_author = authors(head.committer.name)
+        last[head_author] = [head.commit_time, 1, 0.0]
+        cls.append(writers, head.hex, head_author, len(head_files), 1, 0.0)
+
+        first_commit = None
+        previous = None
+        for commit in walk:
+            if previous is None:
+                first_commit = previous = commit
+                continue
+
+            num_files = len(get_diffing_files(commit, previous))
+            author = authors(commit.committer.name)
+            previous = commit
+
+            if author not in last:
+                state = [commit.commit_time, 1, 0.0]
+            else:
+                last_time, exp, years = last[author]
+                state = [commit.commit_time, exp + 1,
+                         years + years_between(commit.commit_time, last_time)]
+            last[author] = state
+
+            cls.append(writers, commit.hex, author, num_files, state[1], state[2])
+
+        cls.finish(path, writers, {'authors': authors.names,
+                                   'first_commit': first_commit.hex if first_commit else None})
+
+    @staticmethod
+    def append(writers, commit, author, num_files, exp, years):
+        writers['commits'].append(commit.encode('ascii'))
+        writers['author'].append(author)
+        writers['files'].append(num_files)
+        writers['exp'].append(exp)
+        writers['years'].append(years)
+
+    def features(self):
+        """
+        Yield the commit, the experience, the rexp and the sexp of every commit,
+        see assemble_experience_features.get_experience_features.
+        """
+        if self.meta['first_commit'] is None:
+            # the walk was empty
+            return
+        yield self.meta['first_commit'], 1.0, float(self.files[0]), 0.0
+
+        # rows of each author in walk order, the seed row first
+        order = np.argsort(self.author, kind='stable')
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        group_start = np.searchsorted(self.author[order], self.author, side='left')
+        files = np.asarray(self.files)[order].astype(np.float64)
+        years = np.asarray(self.years)[order]
+
+        for row in range(1, len(self.commits)):
+            start, stop = group_start[row], position[row] + 1
+            rexp = files[start:stop] / (1 + (years[stop - 1] - years[start:stop]) + 1)
+            # newest first, as the rexp lists of the former json graph
+            rrexp = sum(rexp[::-1].tolist())
+            yield self.commits[row].decode('ascii'), float(self.exp[row]), float(rrexp), 0.0
@@ -0,0 +1,57 @@
+"""
+Helpers to run a per-commit analysis over the history of a repository with a pool
+of processes pulling chunks of commits from a queue.
+"""
+
+from multiprocessing import Pool, cpu_count
+from pygit2 import Repository, GIT_SORT_REVERSE, GIT_SORT_TOPOLOGICAL
+
+# State of a worker process, set up once by init_worker
+WORKER = {}
+
+
+def get_commit_order(repo_path, branch):
+    """
+    Walk the branch once and return the hex of its commits, oldest first.
+    """
+    repo = Repository(repo_path)
+    head = repo.references.get(branch)
+
+    return [commit.hex for commit in
+            repo.walk(head.target, GIT_SORT_TOPOLOGICAL | GIT_SORT_REVERSE)]
+
+
+def init_worker(repo_path, commits, setup):
+    """
+    Open the repository once per worker. The commit order is handed over once
+    per worker instead of being walked again by each of them.
+    """
+    WORKER['repo'] = Repository(repo_path)
+    WORKER['commits'] = commits
+    WORKER['context'] = setup(WORKER['repo']) if setup else None
+
+
+def run_chunk(task):
+    """
+    Run a chunk function on the commits start:stop of the worker.
+    """
+    func, start, stop = task
+    return func(WORKER['repo'], WORKER['commits'], start, stop, WORKER['context'])
+
+
+def map_commit_chunks(func, repo_path, commits, chunk_size=64, processes=None, setup=None):
+    """
+    Run func(repo, commits, start, stop, context) over chunks of commits[1:], each
+    commit i being compared to commits[i - 1]. Idle workers pull the next chunk, so a
+    few expensive commits do not hold back a whole partition. The results of the
+    chunks are yielded in walk order to the caller, which is the single writer.
+    context is the value returned by setup(repo) in each worker.
+    """
+    processes = processes or cpu_count()
+    tasks = [(func, start, min(start + chunk_size, len(commits)))
+             for start in range(1, len(commits), chunk_size)]
+
+    with Pool(processes, initializer=init_worker,
+              initargs=(repo_path, commits, setup)) as pool:
+        for result in pool.imap(run_chunk, tasks):
+            yield result
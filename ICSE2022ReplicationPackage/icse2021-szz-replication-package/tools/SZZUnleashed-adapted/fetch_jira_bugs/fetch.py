@@ -3,7 +3,11 @@ __author__ = "Kristian Berg"
 __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
-from urllib.parse import quote
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlparse
 
 import urllib.request as url
 import json
@@ -11,56 +15,176 @@ import os
 import argparse
 import io
 import sys
+import threading
+import time
 
-def fetch(project_issue_code, jira_project_name):
-    """ Fetch issues that match given jql query """
-    # Jira Query Language string which filters for resolved issues of type bug
+class HostRateLimiter:
+    """ Space out the requests to each host so that at most rate requests per
+    second are sent to it, whatever the number of threads """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, request_url):
+        host = urlparse(request_url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def fetch_page(request_url, limiter, retries=5):
+    """ Fetch a page of the search API, retrying with an exponential backoff
+    when the server is unavailable or rate limits the requests """
+    for attempt in range(retries + 1):
+        limiter.wait(request_url)
+        try:
+            with url.urlopen(request_url) as conn:
+                return json.loads(conn.read().decode('utf-8', 'ignore'))
+        except HTTPError as err:
+            if err.code != 429 and err.code < 500 or attempt == retries:
+                raise
+        except URLError:
+            if attempt == retries:
+                raise
+        time.sleep(2 ** attempt)
+
+def build_jql(project_issue_code, updated_since=None):
+    """ Jira Query Language string which filters for resolved issues of type
+    bug, updated since the given date if any """
     jql = 'project = ' + project_issue_code + ' ' \
         + 'AND issuetype = Bug '\
         + 'AND status in (Resolved, Closed) '\
         + 'AND resolution = Fixed '\
         + 'AND component = core '\
-        + 'AND created <= "2018-02-20 10:34" '\
-        + 'ORDER BY created DESC'
-    jql = quote(jql, safe='')
+        + 'AND created <= "2018-02-20 10:34" '
+    if updated_since:
+        jql += 'AND updated >= "' + updated_since + '" '
+    return jql + 'ORDER BY created DESC'
+
+def read_state(state_path):
+    """ State of the last run of fetch, see fetch """
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.loads(f.read())
+
+def write_state(state_path, state):
+    """ Replace the state file in one step, so that it is never half written """
+    with open(state_path + '.tmp', 'w') as f:
+        f.write(json.dumps(state))
+    os.replace(state_path + '.tmp', state_path)
+
+def fetch(project_issue_code, jira_project_name, output='issues/issues.jsonl',
+          workers=4, rate=2.0, incremental=False):
+    """ Fetch issues that match given jql query.
+
+    The pages of the search API are downloaded by a bounded pool of threads
+    and appended in order to a single stream of issues, one json object per
+    line. After each page the next page and the size of the stream are saved
+    to a state file, so that an interrupted run resumes from the last
+    completed page. With incremental, only the issues updated since the last
+    completed run are fetched and appended, the last line of an issue being
+    its latest version """
+    state_path = output + '.state'
+    state = read_state(state_path) if os.path.exists(output) else {}
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    if '://' in jira_project_name:
+        base_url = jira_project_name
+    else:
+        base_url = 'https://' + jira_project_name
 
-    start_at = 0
+    if state and not state['done']:
+        # Resume the interrupted run
+        print('Resuming from issue ' + str(state['start_at']))
+    else:
+        updated_since = state.get('last_run') if incremental and state else None
+        state = {'jql': build_jql(project_issue_code, updated_since),
+                 'start_at': 0,
+                 'offset': os.path.getsize(output) if updated_since and os.path.exists(output) else 0,
+                 'run_started': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                 'last_run': state.get('last_run'),
+                 'done': False}
+        write_state(state_path, state)
+
+    jql = quote(state['jql'], safe='')
 
     # max_results parameter is capped at 1000, specifying a higher value will
     # still return only the first 1000 results
     max_results = 1000
 
-    os.makedirs('issues/', exist_ok=True)
-    request = 'https://' + jira_project_name + '/rest/api/2/search?'\
+    request = base_url + '/rest/api/2/search?'\
         + 'jql={}&startAt={}&maxResults={}'
+    limiter = HostRateLimiter(rate)
 
     # Do small request to establish value of 'total'
-    with url.urlopen(request.format(jql, start_at, '1')) as conn:
-        contents = json.loads(conn.read().decode('utf-8'))
-        total = contents['total']
+    total = fetch_page(request.format(jql, 0, '1'), limiter)['total']
 
-    # Fetch all matching issues and write to file(s)
+    # Fetch all matching issues and write them to the stream
     print('Total issue matches: ' + str(total))
     print('Progress: | = ' + str(max_results) + ' issues')
-    while start_at < total:
-        with url.urlopen(request.format(jql, start_at, max_results)) as conn:
-            with io.open('issues/res' + str(start_at) + '.json', 'w', encoding="utf-8") as f:
-                f.write(conn.read().decode('utf-8', 'ignore'))
-        print('|', end='', flush='True')
-        start_at += max_results
 
+    # Drop the part of a page written after the last saved state
+    mode = 'r+' if os.path.exists(output) else 'w'
+    with io.open(output, mode, encoding='utf-8') as f, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        f.truncate(state['offset'])
+        f.seek(state['offset'])
+
+        pending = deque()
+        for start_at in range(state['start_at'], total, max_results):
+            pending.append((start_at, pool.submit(
+                fetch_page, request.format(jql, start_at, max_results), limiter)))
+            if len(pending) < 2 * workers:
+                continue
+
+            start_at, page = pending.popleft()
+            write_page(f, state, state_path, start_at + max_results, page.result())
+
+        while pending:
+            start_at, page = pending.popleft()
+            write_page(f, state, state_path, start_at + max_results, page.result())
+
+    state['done'] = True
+    state['last_run'] = state['run_started']
+    write_state(state_path, state)
     print('\nDone!')
 
+def write_page(f, state, state_path, next_start, contents):
+    """ Append the issues of a page to the stream and save the state """
+    for issue in contents['issues']:
+        f.write(json.dumps(issue) + '\n')
+    f.flush()
+
+    state['start_at'] = next_start
+    state['offset'] = f.tell()
+    write_state(state_path, state)
+    print('|', end='', flush='True')
+
 if __name__ == '__main__':
 
-	parser = argparse.ArgumentParser(description="""Convert a git log output to json.
+    parser = argparse.ArgumentParser(description="""Fetch the resolved bugs of a Jira project.
                                                  """)
-	parser.add_argument('--issue-code', type=str,
-        	help="The code used for the project issues on JIRA: e.g., JENKINS-1123. Only JENKINS needs to be passed as parameter.")
-	parser.add_argument('--jira-project', type=str,
-            help="The name of the Jira repository of the project.")
-
-	args = parser.parse_args()
-	project_issue_code = args.issue_code
-	jira_project_name = args.jira_project
-	fetch(project_issue_code, jira_project_name)
+    parser.add_argument('--issue-code', type=str,
+        help="The code used for the project issues on JIRA: e.g., JENKINS-1123. Only JENKINS needs to be passed as parameter.")
+    parser.add_argument('--jira-project', type=str,
+        help="The name of the Jira repository of the project, or its url " +
+        "(e.g. http://localhost:8080 for the jira_stub.py server).")
+    parser.add_argument('--output', type=str, default='issues/issues.jsonl',
+        help="The file the issues are written to, one per line.")
+    parser.add_argument('--workers', type=int, default=4,
+        help="The number of pages fetched concurrently.")
+    parser.add_argument('--rate', type=float, default=2.0,
+        help="The maximum number of requests per second to the Jira host.")
+    parser.add_argument('--incremental', action='store_true',
+        help="Only fetch the issues updated since the last completed run.")
+
+    args = parser.parse_args()
+    project_issue_code = args.issue_code
+    jira_project_name = args.jira_project
+    fetch(project_issue_code, jira_project_name, args.output, args.workers,
+          args.rate, args.incremental)
@@ -8,6 +8,117 @@ import json
 import re
 import argparse
 
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# Repetitions in a parsed pattern, possessive ones since Python 3.11
+REPEATS = [sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT] + \
+    [op for op in [getattr(sre_constants, 'POSSESSIVE_REPEAT', None)] if op is not None]
+
+# Stands for the issue number when parsing a pattern, two characters so that
+# it cannot be taken for a one character class
+NBR = '\0\1'
+
+# Runs of digits, where the issue numbers are looked for
+DIGITS = re.compile('[0-9]+')
+
+def read_gitlog(gitlog_path):
+    """ Yield the commits of a gitlog.json array or, one line at a time, of a
+    gitlog.jsonl stream written by git_log_to_array.py """
+    with open(gitlog_path) as f:
+        if gitlog_path.endswith('.jsonl'):
+            for line in f:
+                yield json.loads(line)
+        else:
+            for commit in json.loads(f.read()):
+                yield commit
+
+def requires_literal(items, literal):
+    """ Whether every match of a parsed pattern contains the string literal,
+    i.e. it is not only in a branch, an optional part or a lookaround """
+    literals = [(sre_constants.LITERAL, ord(c)) for c in literal]
+    items = list(items)
+    for k, (op, av) in enumerate(items):
+        if items[k:k + len(literals)] == literals:
+            return True
+        if op is sre_constants.SUBPATTERN:
+            if requires_literal(av[-1], literal):
+                return True
+        elif op in REPEATS:
+            if av[0] > 0 and requires_literal(av[2], literal):
+                return True
+        elif op is sre_constants.BRANCH:
+            if all(requires_literal(branch, literal) for branch in av[1]):
+                return True
+    return False
+
+class CommitIndex:
+    """ Inverted index from the issue numbers mentioned in the commits of a
+    git log to those commits. Every commit is scanned once for the issue
+    numbers in its runs of digits, its hash and date are parsed once as well.
+    Only the text of the commits mentioning an issue number is kept """
+
+    def __init__(self, gitlog, gitlog_pattern, numbers):
+        self.commits = {}
+        self.hashes = []
+        self.dates = []
+        self.mentions = {}
+
+        # The pattern of an issue can only match the commits in which its number
+        # is written, unless {nbr} is missing from the pattern or only in a
+        # branch or an optional part of it. Every commit is a candidate then
+        try:
+            parsed = sre_parse.parse(gitlog_pattern.format(nbr=NBR))
+            indexed = requires_literal(parsed, NBR)
+        except re.error:
+            indexed = False
+        self.candidates = None if indexed else []
+        numbers = set(numbers)
+        max_len = max((len(nbr) for nbr in numbers), default=0)
+
+        for i, commit in enumerate(gitlog):
+            match = re.search('(?<=^commit )[a-z0-9]+(?=\n)', commit)
+            self.hashes.append(match.group(0) if match else None)
+            match = re.search('(?<=\nDate:   )[0-9 -:+]+(?=\n)', commit)
+            self.dates.append(match.group(0) if match else None)
+
+            found = set()
+            if indexed:
+                for digits in DIGITS.findall(commit):
+                    # An issue number may be any part of a longer run of digits
+                    for start in range(len(digits)):
+                        for stop in range(start + 1, min(len(digits), start + max_len) + 1):
+                            if digits[start:stop] in numbers:
+                                found.add(digits[start:stop])
+            for nbr in found:
+                self.mentions.setdefault(nbr, []).append(i)
+            if found or self.candidates is not None:
+                self.commits[i] = commit
+            if self.candidates is not None:
+                self.candidates.append(i)
+
+    def matches(self, nbr, gitlog_pattern):
+        """ Indices of the commits matching the pattern of an issue number, in
+        git log order. The candidates of the index are checked with the
+        pattern itself """
+        pattern = gitlog_pattern.format(nbr=nbr)
+        matches = []
+        candidates = self.candidates
+        if candidates is None:
+            candidates = self.mentions.get(nbr, [])
+        for i in candidates:
+            commit = self.commits[i]
+            if re.search(pattern, commit):
+                if re.search(r'#{nbr}\D'.format(nbr=nbr), commit) \
+                    and not re.search('[Ff]ix', commit):
+                    pass
+                else:
+                    matches.append(i)
+        return matches
+
 def find_bug_fixes(issue_path, gitlog_path, gitlog_pattern):
     """ Identify bugfixes in Jenkins repository given a list of issues """
 
@@ -17,35 +128,24 @@ def find_bug_fixes(issue_path, gitlog_path, gitlog_pattern):
     total_matches = 0
 
     issue_list = build_issue_list(issue_path)
-    with open(gitlog_path) as f:
-        gitlog = json.loads(f.read())
+    index = CommitIndex(read_gitlog(gitlog_path), gitlog_pattern,
+                        [key.split('-')[1] for key in issue_list])
 
     for key in issue_list:
         nbr = key.split('-')[1]
-        matches = []
-
-        for commit in gitlog:
-            pattern = gitlog_pattern.format(nbr=nbr)
-            if re.search(pattern, commit):
-                if re.search(r'#{nbr}\D'.format(nbr=nbr), commit) \
-                    and not re.search('[Ff]ix', commit):
-                    pass
-                else:
-                    matches.append(commit)
+        matches = index.matches(nbr, gitlog_pattern)
         total_matches += len(matches)
         matches_per_issue[key] = len(matches)
 
         if matches:
-            selected_commit = commit_selector_heuristic(matches)
+            commits = [index.commits[m] for m in matches]
+            selected_commit = commit_selector_heuristic(commits)
             if not selected_commit:
                 no_matches.append(key)
             else:
-                issue_list[key]['hash'] = \
-                    re.search('(?<=^commit )[a-z0-9]+(?=\n)', \
-                    selected_commit).group(0)
-                issue_list[key]['commitdate'] = \
-                    re.search('(?<=\nDate:   )[0-9 -:+]+(?=\n)',\
-                    selected_commit).group(0)
+                selected = matches[commits.index(selected_commit)]
+                issue_list[key]['hash'] = index.hashes[selected]
+                issue_list[key]['commitdate'] = index.dates[selected]
         else:
             no_matches.append(key)
 
@@ -64,21 +164,35 @@ def find_bug_fixes(issue_path, gitlog_path, gitlog_pattern):
     return issue_list
 
 
-def build_issue_list(path):
-    """ Helper method for find_bug_fixes """
-    issue_list = {}
-    for filename in os.listdir(path):
-        with open(path + '/' + filename) as f:
+def read_issues(path):
+    """ Helper method for build_issue_list. Yields the issues of a page of
+    search results (.json) or of a stream of issues (.jsonl) written by fetch.py """
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
             for issue in json.loads(f.read())['issues']:
-                issue_list[issue['key']] = {}
-
-                created_date = issue['fields']['created'].replace('T', ' ')
-                created_date = created_date.replace('.000', ' ')
-                issue_list[issue['key']]['creationdate'] = created_date
+                yield issue
 
-                res_date = issue['fields']['resolutiondate'].replace('T', ' ')
-                res_date = res_date.replace('.000', ' ')
-                issue_list[issue['key']]['resolutiondate'] = res_date
+def build_issue_list(path):
+    """ Helper method for find_bug_fixes. When an issue occurs more than once,
+    as in an incrementally fetched stream, its last version is used """
+    issue_list = {}
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith(('.json', '.jsonl')):
+            continue
+        for issue in read_issues(path + '/' + filename):
+            issue_list[issue['key']] = {}
+
+            created_date = issue['fields']['created'].replace('T', ' ')
+            created_date = created_date.replace('.000', ' ')
+            issue_list[issue['key']]['creationdate'] = created_date
+
+            res_date = issue['fields']['resolutiondate'].replace('T', ' ')
+            res_date = res_date.replace('.000', ' ')
+            issue_list[issue['key']]['resolutiondate'] = res_date
     return issue_list
 
 def commit_selector_heuristic(commits):
@@ -99,7 +213,7 @@ def main():
                                                     the issue directory is created and populated using
                                                     the fetch.py script.""")
     parser.add_argument('--gitlog', type=str,
-                        help='Path to json file containing gitlog')
+                        help='Path to json or jsonl file containing gitlog')
     parser.add_argument('--issue-list', type=str,
                         help='Path to directory containing issue json files')
     parser.add_argument('--gitlog-pattern', type=str,
@@ -9,22 +9,42 @@ import subprocess
 import sys
 import json
 
-def git_log_to_json(init_hash, path_to_repo):
-    hashes = subprocess.run(['git', 'rev-list', init_hash], cwd=path_to_repo,
-        stdout=subprocess.PIPE).stdout.decode('ascii').split()
+def iter_git_log(init_hash, path_to_repo, chunk_size=1 << 20):
+    """ Yield the commits reachable from init_hash, newest first, as the text
+    of 'git show --quiet --date=iso'. They are read from a single git log
+    stream with the commits separated by NUL bytes """
+    proc = subprocess.Popen(['git', 'log', '-z', '--date=iso', '--no-color',
+                             '--no-decorate', init_hash],
+                            cwd=path_to_repo, stdout=subprocess.PIPE)
+    with proc:
+        buf = b''
+        for chunk in iter(lambda: proc.stdout.read(chunk_size), b''):
+            buf += chunk
+            records = buf.split(b'\0')
+            buf = records.pop()
+            for record in records:
+                yield record.decode(errors='replace')
+        if buf:
+            yield buf.decode(errors='replace')
 
-    logs = []
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, 'git log')
+
+def git_log_to_jsonl(init_hash, path_to_repo, output='gitlog.jsonl'):
+    """ Write the git log as one json string per line and commit """
     i = 0
-    for hash in hashes:
-        entry = subprocess.run(['git', 'show', '--quiet', '--date=iso', hash],
-            cwd=path_to_repo, stdout=subprocess.PIPE)\
-            .stdout.decode(errors='replace')
-        logs.append(entry)
-        i += 1
-        if i % 10 == 0:
-            print(i, end='\r')
-
-    with open('gitlog.json', 'w') as f:
+    with open(output, 'w') as f:
+        for entry in iter_git_log(init_hash, path_to_repo):
+            f.write(json.dumps(entry) + '\n')
+            i += 1
+            if i % 1000 == 0:
+                print(i, end='\r')
+
+def git_log_to_json(init_hash, path_to_repo, output='gitlog.json'):
+    """ Write the git log as a single json array """
+    logs = list(iter_git_log(init_hash, path_to_repo))
+
+    with open(output, 'w') as f:
         f.write(json.dumps(logs))
 
 # Commits are saved in reverse chronological order from newest to oldest
@@ -36,9 +56,14 @@ if __name__ == '__main__':
             help="A SHA-1 representing a commit. Runs git rev-list from this commit.")
     parser.add_argument('--repo-path', type=str,
             help="The absolute path to a local copy of the git repository from where the git log is taken.")
+    parser.add_argument('--output', type=str, default='gitlog.jsonl',
+            help="The file to write, a json array if it ends with .json, one commit per line otherwise.")
 
     args = parser.parse_args()
     path_to_repo = args.repo_path
     init_hash = args.from_commit
-    git_log_to_json(init_hash, path_to_repo)
+    if args.output.endswith('.json'):
+        git_log_to_json(init_hash, path_to_repo, args.output)
+    else:
+        git_log_to_jsonl(init_hash, path_to_repo, args.output)
 
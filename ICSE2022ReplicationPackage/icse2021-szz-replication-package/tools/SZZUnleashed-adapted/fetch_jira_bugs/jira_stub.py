@@ -0,0 +1,105 @@
+""" A local stand-in for the search API of Jira, serving generated issues so
+that fetch.py can be run offline """
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import argparse
+import json
+import random
+import re
+import threading
+
+def generate_issues(project_issue_code, count, seed=0):
+    """ Generate resolved bugs with the fields used by find_bug_fixes.py,
+    newest first as the search of fetch.py orders them """
+    rand = random.Random(seed)
+    date = datetime(2018, 2, 20)
+    issues = []
+    for nbr in range(count, 0, -1):
+        date -= timedelta(hours=rand.randint(1, 48))
+        resolved = date + timedelta(days=rand.randint(1, 60))
+        issues.append({'key': project_issue_code + '-' + str(nbr),
+                       'fields': {'created': jira_date(date),
+                                  'resolutiondate': jira_date(resolved),
+                                  'updated': jira_date(resolved)}})
+    return issues
+
+def jira_date(date):
+    """ Date in the format of the Jira REST API """
+    return date.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+class JiraStubHandler(BaseHTTPRequestHandler):
+    """ Answer /rest/api/2/search with a page of the issues of the server. Only
+    the 'updated >= "date"' clause of the jql is taken into account """
+
+    def do_GET(self):
+        request = urlparse(self.path)
+        if request.path != '/rest/api/2/search':
+            self.send_error(404)
+            return
+
+        if self.server.fail_rate and self.server.random.random() < self.server.fail_rate:
+            self.send_error(503)
+            return
+
+        query = parse_qs(request.query)
+        start_at = int(query.get('startAt', ['0'])[0])
+        max_results = min(int(query.get('maxResults', ['50'])[0]), 1000)
+
+        issues = self.server.issues
+        updated = re.search(r'updated >= "([^"]+)"', query.get('jql', [''])[0])
+        if updated:
+            since = jira_date(datetime.strptime(updated.group(1), '%Y-%m-%d %H:%M'))
+            issues = [issue for issue in issues if issue['fields']['updated'] >= since]
+
+        body = json.dumps({'startAt': start_at,
+                           'maxResults': max_results,
+                           'total': len(issues),
+                           'issues': issues[start_at:start_at + max_results]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(issues, port=0, fail_rate=0.0):
+    """ Create a server of the issues on localhost """
+    server = ThreadingHTTPServer(('localhost', port), JiraStubHandler)
+    server.issues = issues
+    server.fail_rate = fail_rate
+    server.random = random.Random(0)
+    return server
+
+def start_stub(issues, port=0, fail_rate=0.0):
+    """ Serve the issues from a background thread. Returns the server and the
+    url to pass to fetch.py as --jira-project, stop it with server.shutdown() """
+    server = make_server(issues, port, fail_rate)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, 'http://localhost:' + str(server.server_address[1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="""Serve generated issues through a local
+                                                 stand-in of the Jira search API.""")
+    parser.add_argument('--issue-code', type=str, default='JENKINS',
+        help="The code of the generated issues.")
+    parser.add_argument('--issues', type=int, default=5000,
+        help="The number of generated issues.")
+    parser.add_argument('--port', type=int, default=8080,
+        help="The port to listen on.")
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+        help="The fraction of requests answered with an error 503.")
+
+    args = parser.parse_args()
+    server = make_server(generate_issues(args.issue_code, args.issues),
+                         args.port, args.fail_rate)
+    print('Serving ' + str(args.issues) + ' issues on http://localhost:' + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -3,85 +3,47 @@ __author__ = "Kristian Berg"
 __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
+import os
 import subprocess
+import sys
 import re
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+# The commit dates and folds are shared with the time sensitive split of the model
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+from time_sensitive_split import time_sensitive_folds, seconds
+from utils import commit_dates
 
 # TODO: give update parameter as fraction
 def build_sets(path, sgap=timedelta(days=200), gap=timedelta(days=150),
                egap=timedelta(days=150), update=timedelta(days=400),
                testdur=timedelta(days=70), traindur=timedelta(days=2000)):
-    # Determine date of oldest commit in repository
-    command = ['git', 'log', '--reverse', '--date=iso']
-    startdate = datetime_of_commit(path, command=command)
-
-    # Determine date of newest commit in repository
-    command = ['git', 'log', '--date=iso']
-    enddate = datetime_of_commit(path, command=command)
+    hashes, dates = commit_dates(path)
 
-    # Add start and end gaps
-    startdate += sgap
-    enddate -= egap
+    # Determine date of oldest and newest commit in repository,
+    # add start and end gaps
+    startdate = int(dates[0]) + seconds(sgap)
+    enddate = int(dates[-1]) - seconds(egap)
 
     # Print stuff
-    print('Start: ' + str(startdate))
-    print('End: ' + str(enddate))
-    print('Duration: ' + str(enddate - startdate))
+    print('Start: ' + str(datetime.fromtimestamp(startdate, timezone.utc)))
+    print('End: ' + str(datetime.fromtimestamp(enddate, timezone.utc)))
+    print('Duration: ' + str(timedelta(seconds=enddate - startdate)))
     print('len(training) len(testing)')
 
-    # Build list of commit hashes from oldest to newest
-    command = ['git', 'rev-list', '--reverse', 'HEAD']
-    res = subprocess.run(command, cwd=path, stdout=subprocess.PIPE)
-    gitrevlist = res.stdout.decode('utf-8')
-    hashes = gitrevlist.split()
-
-    # Initiate loop variables
     trainsets = []
     testsets = []
-    training = []
-    testing = []
-    train_index = 0
-    test_index = 0
-    tsplit = startdate + traindur
-
-    # Adjust start index to correspond to start date
-    commitdate = datetime_of_commit(path, hash=hashes[train_index])
-    while commitdate < startdate:
-        train_index += 1
-        commitdate = datetime_of_commit(path, hash=hashes[train_index])
 
     # TODO: Last few commits are not used
-    while tsplit + gap + testdur < enddate:
-        # Set test index to correspond to appropriate date
-        test_index = train_index
-        commitdate = datetime_of_commit(path, hash=hashes[test_index])
-        while commitdate < tsplit + gap:
-            test_index += 1
-            commitdate = datetime_of_commit(path, hash=hashes[test_index])
-
-        # Build training set
-        commitdate = datetime_of_commit(path, hash=hashes[train_index])
-        while commitdate < tsplit:
-            training.append(hashes[train_index])
-            train_index += 1
-            commitdate = datetime_of_commit(path, hash=hashes[train_index])
-        trainsets.append(list(training))
-
-        # Build test set
-        testing = []
-        commitdate = datetime_of_commit(path, hash=hashes[test_index])
-        while commitdate < tsplit + gap + testdur:
-            testing.append(hashes[test_index])
-            test_index += 1
-            commitdate = datetime_of_commit(path, hash=hashes[test_index])
-        testsets.append(list(testing))
+    folds = time_sensitive_folds(dates, startdate, enddate, seconds(traindur),
+                                 seconds(gap), seconds(testdur), seconds(update))
+    for train_start, train_stop, test_start, test_stop in folds:
+        trainsets.append(hashes[train_start:train_stop].tolist())
+        testsets.append(hashes[test_start:test_stop].tolist())
 
         # Print stuff
-        print(str(len(training)) + ' ' + str(len(testing)))
-
-        # Loop update
-        tsplit += update
+        print(str(train_stop - train_start) + ' ' + str(test_stop - test_start))
 
     # Write results to file
     with open('trainsets.json', 'w') as f:
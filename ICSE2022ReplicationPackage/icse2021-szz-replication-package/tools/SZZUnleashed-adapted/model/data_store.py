@@ -0,0 +1,116 @@
+""" Binary store of the feature and label data. The features are converted
+once to a .npy matrix which is memory-mapped when loaded, so that the data set
+does not have to fit in memory """
+
+import csv
+import hashlib
+import json
+import os
+import numpy as np
+
+# Files of the binary store in the data directory
+STORE = {'data': 'features_matrix.npy',
+         'labels': 'labels.npy',
+         'hashes': 'hashes.npy',
+         'meta': 'meta.json'}
+
+def store_path(datapath, name):
+    """ Path of a file of the binary store """
+    return os.path.join(datapath, STORE[name])
+
+def read_labels(datapath):
+    """ Read labels.csv into a dict from commit hash to label """
+    with open(os.path.join(datapath, 'labels.csv')) as labelfile:
+        reader = csv.reader(labelfile)
+        next(reader)
+        return {row[0]: int(row[1]) for row in reader}
+
+def file_digest(paths):
+    """ SHA-1 of the content of the given files """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as binfile:
+            for block in iter(lambda: binfile.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def write_store(datapath, names, hashes, labels):
+    """ Write the labels, hashes and metadata next to an already written
+    feature matrix """
+    np.save(store_path(datapath, 'labels'), np.asarray(labels, dtype=np.int64))
+    np.save(store_path(datapath, 'hashes'), np.asarray(hashes, dtype='U40'))
+
+    digest = file_digest([store_path(datapath, 'data'), store_path(datapath, 'labels')])
+    with open(store_path(datapath, 'meta'), 'w') as metafile:
+        json.dump({'names': names, 'digest': digest}, metafile)
+
+def convert_csv(datapath):
+    """ Convert features.csv and labels.csv row by row into the binary store """
+    labelmap = read_labels(datapath)
+    featpath = os.path.join(datapath, 'features.csv')
+
+    with open(featpath) as feats:
+        names = next(csv.reader(feats))
+        num_rows = sum(1 for _ in feats)
+
+    data = np.lib.format.open_memmap(store_path(datapath, 'data'), mode='w+',
+                                     dtype=np.float64, shape=(num_rows, len(names) - 1))
+    hashes = []
+    with open(featpath) as feats:
+        reader = csv.reader(feats)
+        next(reader)
+        for i, row in enumerate(reader):
+            hashes.append(row[0])
+            data[i] = [float(value) for value in row[1:]]
+    data.flush()
+    del data
+
+    write_store(datapath, names, hashes, [labelmap[commit] for commit in hashes])
+
+def convert_structured(datapath, structpath):
+    """ Convert the structured features .npy of assemble_all_features.py, which
+    is in walk order, into the binary store with the newest commit first as in
+    features.csv. Columns are copied one at a time """
+    labelmap = read_labels(datapath)
+    table = np.load(structpath, mmap_mode='r')
+    names = list(table.dtype.names)
+
+    data = np.lib.format.open_memmap(store_path(datapath, 'data'), mode='w+',
+                                     dtype=np.float64, shape=(len(table), len(names) - 1))
+    for i, name in enumerate(names[1:]):
+        data[:, i] = table[name][::-1]
+    data.flush()
+    del data
+
+    hashes = [commit.decode('ascii') for commit in table['commit'][::-1]]
+    write_store(datapath, names, hashes, [labelmap[commit] for commit in hashes])
+
+def is_stale(datapath, sources):
+    """ Whether the binary store is missing or older than one of its sources """
+    meta = store_path(datapath, 'meta')
+    if not os.path.exists(meta):
+        return True
+    return any(os.path.getmtime(source) > os.path.getmtime(meta) for source in sources)
+
+def load_store(datapath):
+    """ Load the binary store of a data directory, converting features.npy
+    (structured, see assemble_all_features.py) or features.csv first if the
+    store is missing or out of date. Returns the memory-mapped feature matrix,
+    the labels, the hashes, the column names and the digest of the data """
+    labelpath = os.path.join(datapath, 'labels.csv')
+    structpath = os.path.join(datapath, 'features.npy')
+    csvpath = os.path.join(datapath, 'features.csv')
+
+    if os.path.exists(structpath):
+        if is_stale(datapath, [structpath, labelpath]):
+            convert_structured(datapath, structpath)
+    elif is_stale(datapath, [csvpath, labelpath]):
+        convert_csv(datapath)
+
+    with open(store_path(datapath, 'meta')) as metafile:
+        meta = json.load(metafile)
+
+    data = np.load(store_path(datapath, 'data'), mmap_mode='r')
+    labels = np.load(store_path(datapath, 'labels'))
+    hashes = np.load(store_path(datapath, 'hashes'))
+    return data, labels, hashes, meta['names'], meta['digest']
@@ -0,0 +1,80 @@
+""" Resampling, training and scoring of single folds. The resampled training
+sets and the fitted models are cached on disk by joblib, keyed by the digest
+of the data, the fold and the configuration, so that re-evaluating a changed
+configuration only redoes the steps it affects """
+
+import hashlib
+import time
+from sklearn.externals import joblib
+from sklearn.metrics import precision_score, recall_score, f1_score
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import ClusterCentroids
+from imblearn.combine import SMOTETomek
+import numpy as np
+from random_forest_wrapper import RandomForestWrapper
+
+def get_sampler(arg, random_state=None):
+    """ Return sampler based on string argument """
+    if arg == 'smote':
+        # Oversampling
+        return SMOTE(random_state=random_state)
+    elif arg == 'cluster':
+        # Undersampling
+        return ClusterCentroids(random_state=random_state)
+    elif arg == 'smotetomek':
+        # Mixed over- and undersampling
+        return SMOTETomek(random_state=random_state)
+    return None
+
+def index_digest(index):
+    """ SHA-1 of an index array, used as the key of a fold """
+    return hashlib.sha1(np.asarray(index, dtype=np.int64).tobytes()).hexdigest()
+
+def resample_fold(data_key, fold_key, sampler_arg, seed, data, labels, train):
+    """ Resample the training set of a fold. Only the keys are part of the
+    cache key, data, labels and train are ignored """
+    X, y = data[train], labels[train]
+    sampler = get_sampler(sampler_arg, seed)
+    if sampler:
+        X, y = sampler.fit_sample(X, y)
+    return X, y
+
+def fit_fold(data_key, fold_key, sampler_arg, seed, params, X, y):
+    """ Fit a random forest on the resampled training set of a fold. X and y
+    are ignored in the cache key """
+    clf = RandomForestWrapper(None, random_state=seed, **params)
+    return clf.fit(X, y)
+
+def run_fold(cachedir, data_key, sampler_arg, seed, params, data, labels, train, test):
+    """ Resample, fit and score a fold, reusing the cached steps. Returns the
+    same scores as cross_validate with the 'p', 'r' and 'f1' scorers """
+    memory = joblib.Memory(cachedir, verbose=0)
+    ignore = ['data', 'labels', 'train']
+    resample = memory.cache(resample_fold, ignore=ignore)
+    fit = memory.cache(fit_fold, ignore=['X', 'y'])
+
+    fold_key = index_digest(train)
+    start = time.time()
+    X, y = resample(data_key, fold_key, sampler_arg, seed, data, labels, train)
+    clf = fit(data_key, fold_key, sampler_arg, seed, params, X, y)
+    fit_time = time.time() - start
+
+    start = time.time()
+    prediction = clf.predict(data[test])
+    truth = labels[test]
+    scores = {'test_p': precision_score(truth, prediction),
+              'test_r': recall_score(truth, prediction),
+              'test_f1': f1_score(truth, prediction)}
+    scores['score_time'] = time.time() - start
+    scores['fit_time'] = fit_time
+    return scores
+
+def evaluate_folds(folds, data, labels, data_key, sampler_arg, seed, params,
+                   cachedir=None, n_jobs=1):
+    """ Run the folds in parallel and collect the scores of each fold into
+    arrays, as cross_validate does """
+    results = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(run_fold)(cachedir, data_key, sampler_arg, seed, params,
+                                 data, labels, train, test)
+        for train, test in folds)
+    return {key: np.array([result[key] for result in results]) for key in results[0]}
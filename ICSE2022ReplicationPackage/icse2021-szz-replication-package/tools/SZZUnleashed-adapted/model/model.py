@@ -6,51 +6,58 @@ __license__ = "MIT"
 
 import argparse
 import configparser
-from sklearn.model_selection import cross_validate
+from sklearn.model_selection import StratifiedKFold
 from sklearn.externals import joblib
-from imblearn.over_sampling import SMOTE
-from imblearn.under_sampling import ClusterCentroids
-from imblearn.combine import SMOTETomek
 from treeinterpreter import treeinterpreter as ti
 import numpy as np
+from data_store import load_store
+from fold_cache import evaluate_folds, get_sampler
 from random_forest_wrapper import RandomForestWrapper
 from time_sensitive_split import GitTimeSensitiveSplit
 
 def evaluate(path, datapath, lastcommit, config, debug):
-    """ Evaluate model performance """
+    """ Evaluate model performance. The folds run in parallel on the
+    memory-mapped data, their resampled training sets and models are cached """
 
-    data, labels, _, _ = load_data(datapath)
+    data, labels, _, _, digest = load_store(datapath)
     args = config['args']
 
+    seed = None
     if args['seed'] != 'None':
-        np.random.seed(args.getint('seed'))
+        seed = args.getint('seed')
+        np.random.seed(seed)
 
-    sampler = get_sampler(args['sampler'])
+    cachedir = None if args['cachedir'] == 'None' else args['cachedir']
 
+    # The folds are computed on the data with the oldest commit first
+    num_rows = len(labels)
+    reversed_labels = labels[::-1]
     if args['split'] == 'kfold':
-        split = int(args['nfolds'])
+        split = StratifiedKFold(int(args['nfolds']))
+        folds = split.split(np.zeros(num_rows), reversed_labels)
     elif args['split'] == 'occ':
-        split = GitTimeSensitiveSplit(path=path, lastcommit=lastcommit, debug=debug)
-
-    scoring = {'p': 'precision',
-               'r': 'recall',
-               'f1': 'f1',
-              }
-
-    data = data[::-1]
-    labels = labels[::-1]
-    wrap = RandomForestWrapper(sampler, n_estimators=args.getint('n_estimators'))
-    scores = cross_validate(wrap, data, labels, scoring=scoring, cv=split, return_train_score=False)
+        split = GitTimeSensitiveSplit(path=path, lastcommit=lastcommit, debug=debug,
+                                      cache_dir=cachedir)
+        folds = split.split(None, reversed_labels)
+
+    # Map the folds back to rows of the stored data instead of reversing it
+    folds = [(num_rows - 1 - np.asarray(train), num_rows - 1 - np.asarray(test))
+             for train, test in folds]
+
+    params = {'n_estimators': args.getint('n_estimators'),
+              'n_jobs': args.getint('tree_jobs')}
+    scores = evaluate_folds(folds, data, labels, digest, args['sampler'], seed, params,
+                            cachedir=cachedir, n_jobs=args.getint('n_jobs'))
     for key in sorted(scores.keys()):
         print(key + ': ' + str(scores[key]))
         print(key + ': ' + str(np.average(scores[key])) + ' ± ' +
               str(np.std(scores[key])))
 
-def train(datapath, sampler_arg=None, printfeats=False):
+def train(datapath, sampler_arg=None, printfeats=False, n_jobs=1):
     """ Train model and save in pkl file """
-    data, labels, _, names = load_data(datapath)
+    data, labels, _, names, _ = load_store(datapath)
     sampler = get_sampler(sampler_arg)
-    clf = RandomForestWrapper(sampler, n_estimators=200)
+    clf = RandomForestWrapper(sampler, n_estimators=200, n_jobs=n_jobs)
     clf.fit(data, labels)
 
     if printfeats:
@@ -66,7 +73,7 @@ def classify(datapath, commithash=None, index=None):
     most significant feature """
     # pylint: disable = too-many-locals
     clf = joblib.load('model.pkl')
-    data, _, hashes, names = load_data(datapath)
+    data, _, hashes, names, _ = load_store(datapath)
 
     if commithash:
         temp, = np.where(hashes == commithash)
@@ -94,35 +101,6 @@ def classify(datapath, commithash=None, index=None):
     print('Predicted result: ' + labeltext)
     print('Top factor: ' + feature)
 
-def get_sampler(arg):
-    """ Return sampler based on string argument """
-    if arg == 'smote':
-        # Oversampling
-        return SMOTE()
-    elif arg == 'cluster':
-        # Undersampling
-        return ClusterCentroids()
-    elif arg == 'smotetomek':
-        # Mixed over- and undersampling
-        return SMOTETomek()
-    return None
-
-def load_data(datapath):
-    """ Load data from label and feature .csv files """
-
-    with open('data/features.csv') as feats:
-        names = feats.readline().split(',')
-        num_cols = len(names)
-
-    data = np.genfromtxt(datapath + '/features.csv', delimiter=',', skip_header=1,
-                         usecols=tuple(range(1, num_cols)))
-    labels = np.genfromtxt(datapath + '/labels.csv', delimiter=',', dtype='int',
-                           skip_header=1, usecols=(1))
-    hashes = np.genfromtxt(datapath + '/features.csv', delimiter=',', dtype='str',
-                           skip_header=1, usecols=0)
-
-    return data, labels, hashes, names
-
 def main():
     """ Main method """
     parser = argparse.ArgumentParser(description='Train or evaluate model for '
@@ -133,7 +111,8 @@ def main():
     parser.add_argument('config', metavar='c', type=str,
                         help='specify .ini config file')
     parser.add_argument('datapath', metavar='d', type=str,
-                        help='filepath of features.csv and label.csv files')
+                        help='filepath of features.csv (or features.npy) and ' +
+                        'label.csv files')
     parser.add_argument('--hash', type=str, default=None,
                         help='when method is "classify", specify data point' +
                         ' by hash')
@@ -159,7 +138,8 @@ def main():
     if args.method == 'evaluate':
         evaluate(args.path, args.datapath, args.lastcommit, config, args.debug)
     elif args.method == 'train':
-        train(args.datapath, args.significance)
+        train(args.datapath, config['args']['sampler'], args.significance,
+              config['args'].getint('tree_jobs'))
     elif args.method == 'classify':
         classify(args.datapath, args.hash, args.index)
 
@@ -4,9 +4,49 @@ __author__ = "Kristian Berg"
 __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
-import subprocess
-from datetime import datetime, timedelta
-from utils import datetime_of_commit
+from datetime import timedelta
+import numpy as np
+from utils import datetime_of_commit, commit_dates
+
+def advance(dates, maxdates, index, date):
+    """ Returns the first index from index on whose date is not before date,
+    as the loop 'while dates[index] < date: index += 1' does. maxdates is the
+    running maximum of dates, which is sorted even if the dates are not """
+    found = int(np.searchsorted(maxdates, date, side='left'))
+    if found >= index:
+        return found
+
+    # Only when a commit before index is dated after date
+    while index < len(dates) and dates[index] < date:
+        index += 1
+    return index
+
+def time_sensitive_folds(dates, startdate, enddate, traindur, gap, testdur, update):
+    """ Yield the (train_start, train_stop, test_start, test_stop) index ranges
+    of the folds over the commit dates, oldest first. The training set grows
+    with each fold and the test set starts gap after its end. All arguments are
+    in seconds, dates as an int64 array """
+    dates = np.asarray(dates, dtype=np.int64)
+    maxdates = np.maximum.accumulate(dates) if len(dates) else dates
+
+    # Adjust start index to correspond to start date
+    train_start = advance(dates, maxdates, 0, startdate)
+    train_stop = train_start
+
+    tsplit = startdate + traindur
+    while tsplit + gap + testdur < enddate:
+        test_start = advance(dates, maxdates, train_stop, tsplit + gap)
+        train_stop = advance(dates, maxdates, train_stop, tsplit)
+        test_stop = advance(dates, maxdates, test_start, tsplit + gap + testdur)
+
+        yield train_start, train_stop, test_start, test_stop
+
+        # Loop update
+        tsplit += update
+
+def seconds(delta):
+    """ Returns a timedelta in whole seconds """
+    return int(delta.total_seconds())
 
 class GitTimeSensitiveSplit:
     """ Time sensitive split for Git repository data based on Tan et al.'s Online
@@ -14,7 +54,7 @@ class GitTimeSensitiveSplit:
     def __init__(self, path, sgap=timedelta(days=331), gap=timedelta(days=73),
                  egap=timedelta(days=781), update=timedelta(days=200),
                  traindur=timedelta(days=1700), testdur=timedelta(days=400),
-                 lastcommit=None, debug=False):
+                 lastcommit=None, debug=False, cache_dir=None):
         self.path = path
         self.gap = gap
         self.update = update
@@ -22,73 +62,49 @@ class GitTimeSensitiveSplit:
         self.traindur = traindur
         self.debug = debug
 
-        # Determine date of oldest commit in repository
-        command = ['git', 'log', '--reverse', '--date=iso']
-        self.startdate = datetime_of_commit(path, command=command)
+        # Commit dates from oldest to newest
+        self.hashes, self.dates = commit_dates(path, cache_dir=cache_dir)
 
-        # Determine date of newest commit in repository
+        # Determine date of oldest and newest commit in repository
+        self.startdate = int(self.dates[0])
         if lastcommit:
-            self.enddate = datetime_of_commit(path, lastcommit)
+            index, = np.where(self.hashes == lastcommit)
+            if len(index):
+                self.enddate = int(self.dates[index[0]])
+            else:
+                self.enddate = int(datetime_of_commit(path, lastcommit).timestamp())
         else:
-            command = ['git', 'log', '--date=iso']
-            self.enddate = datetime_of_commit(path, command=command)
+            self.enddate = int(self.dates[-1])
 
         # Add start and end gaps
-        self.startdate += sgap
-        self.enddate -= egap
+        self.startdate += seconds(sgap)
+        self.enddate -= seconds(egap)
 
         if self.debug:
             print('Start: ' + str(self.startdate))
             print('End: ' + str(self.enddate))
-            print('Duration: ' + str(self.enddate - self.startdate))
+            print('Duration: ' + str(timedelta(seconds=self.enddate - self.startdate)))
 
-        # Build list of commit dates from oldest to newest
-        command = ['git', 'rev-list', '--pretty=%ai', '--reverse', 'HEAD']
-        res = subprocess.run(command, cwd=path, stdout=subprocess.PIPE)
-        gitrevlist = res.stdout.decode('utf-8').split('\n')
-        self.dates = [datetime.strptime(x, '%Y-%m-%d %H:%M:%S %z') for x in gitrevlist[1::2]]
+    def folds(self):
+        """ Index ranges of the folds, see time_sensitive_folds """
+        return time_sensitive_folds(self.dates, self.startdate, self.enddate,
+                                    seconds(self.traindur), seconds(self.gap),
+                                    seconds(self.testdur), seconds(self.update))
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        """ Number of folds """
+        return sum(1 for _ in self.folds())
 
     def split(self, X, y=None, group=None):
         """ Split method used by scikit-learn's cross_validate and cross_val_score
         methods """
-
-        # Initiate loop variables
-        trainset = []
-        testset = []
-        train_index = 0
-        test_index = 0
-        tsplit = self.startdate + self.traindur
-
-        # Adjust start index to correspond to start date
-        while self.dates[train_index] < self.startdate:
-            train_index += 1
-
-        n_pos = 0
-        while tsplit + self.gap + self.testdur < self.enddate:
-            # Set test index to correspond to appropriate date
-            test_index = train_index
-            while self.dates[test_index] < tsplit + self.gap:
-                test_index += 1
-
-            # Build training set
-            while self.dates[train_index] < tsplit:
-                trainset.append(train_index)
-                train_index += 1
-
-            # Build test set
-            testset = []
-            while self.dates[test_index] < tsplit + self.gap + self.testdur:
-                testset.append(test_index)
-                test_index += 1
-                if y[test_index] == 1:
-                    n_pos += 1
+        for train_start, train_stop, test_start, test_stop in self.folds():
+            trainset = np.arange(train_start, train_stop)
+            testset = np.arange(test_start, test_stop)
 
             if self.debug:
+                n_pos = int(np.sum(np.asarray(y)[testset] == 1)) if y is not None else 0
                 print(str(len(trainset)) + ' ' + str(len(testset)) + ' ' \
-                      + str(n_pos) + ' ' + str(self.dates[test_index]))
-            n_pos = 0
-
-            # Loop update
-            tsplit += self.update
+                      + str(n_pos) + ' ' + str(self.dates[min(test_stop, len(self.dates) - 1)]))
 
             yield trainset, testset
@@ -1,12 +1,18 @@
 """Returns date of specific commit given a hash
-OR date of first commit result given a command"""
+OR date of first commit result given a command, and the dates of all commits
+of a repository as a cached array"""
 __author__ = "Kristian Berg"
 __copyright__ = "Copyright (c) 2018 Axis Communications AB"
 __license__ = "MIT"
 
 from datetime import datetime
+import os
 import subprocess
 import re
+import numpy as np
+
+# (repository path, head) -> (hashes, dates), see commit_dates
+COMMIT_DATES = {}
 
 def datetime_of_commit(path, hashval=None, command=None):
     """Returns date of specific commit given a hash
@@ -28,3 +34,36 @@ def datetime_of_commit(path, hashval=None, command=None):
     match = re.search('(?<=\nDate:   )[0-9-+: ]+(?=\n)', gitlog).group(0)
     date = datetime.strptime(match, '%Y-%m-%d %H:%M:%S %z')
     return date
+
+def commit_dates(path, rev='HEAD', cache_dir=None):
+    """Returns the hashes and author dates (int64 seconds since the epoch) of
+    the commits reachable from rev, from oldest to newest as listed by
+    git rev-list --reverse. The arrays are cached per repository and head,
+    in memory and in cache_dir if given"""
+    res = subprocess.run(['git', 'rev-parse', rev], cwd=path, stdout=subprocess.PIPE)
+    head = res.stdout.decode('utf-8').strip()
+    key = (os.path.abspath(path), head)
+    if key in COMMIT_DATES:
+        return COMMIT_DATES[key]
+
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, 'commit_dates_' + head + '.npz')
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            COMMIT_DATES[key] = (cached['hashes'], cached['dates'])
+            return COMMIT_DATES[key]
+
+    command = ['git', 'log', '--reverse', '--format=%H %at', head]
+    res = subprocess.run(command, cwd=path, stdout=subprocess.PIPE)
+    gitlog = res.stdout.decode('utf-8').split()
+    hashes = np.array(gitlog[0::2], dtype='U40')
+    dates = np.array(gitlog[1::2], dtype=np.int64)
+
+    if cache_path:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        np.savez(cache_path, hashes=hashes, dates=dates)
+
+    COMMIT_DATES[key] = (hashes, dates)
+    return hashes, dates
@@ -3,9 +3,9 @@ import traceback
 from typing import List, Set
 from time import time as ts
 from git import Commit
-from pydriller import Repository as RepositoryMining
 
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.core.session import SZZSession
 
 
 class AGSZZ(AbstractSZZ):
@@ -13,20 +13,19 @@ class AGSZZ(AbstractSZZ):
     Annotation-Graph SZZ implementation.
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True):
-        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
 
     def _exclude_commits_by_change_size(self, commit_hash: str, max_change_size: int = 20) -> Set[str]:
         to_exclude = set()
-        repo_mining = RepositoryMining(self.repository_path, to_commit=commit_hash, order='reverse').traverse_commits()
-        for commit in repo_mining:
-            try:
-                if len(commit.modifications) > max_change_size:
-                    to_exclude.add(commit.hash)
-                else:
-                    break
-            except Exception as e:
-                log.error(f'unable to analyze commit: {self.repository_path} {commit.hash}')
+        # walk back from the commit (git log order) while the commits modify too many files
+        walk = (commit.hexsha for commit in self.repository.iter_commits(commit_hash))
+        for commit, stat in self.commit_stats.iter_stats(walk):
+            if stat.files > max_change_size:
+                to_exclude.add(commit)
+            else:
+                break
 
         if len(to_exclude) > 0:
             log.info(f'count of commits excluded by change size > {max_change_size}: {len(to_exclude)}')
@@ -85,9 +84,9 @@ class AGSZZ(AbstractSZZ):
 
             new_commits_to_ignore = set()
             for bd in blame_data:
-                if bd.commit.hexsha not in new_commits_to_ignore:
-                    if bd.commit.hexsha not in commits_to_ignore:
-                        new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size=max_change_size))
+                if bd.hexsha not in new_commits_to_ignore:
+                    if bd.hexsha not in commits_to_ignore:
+                        new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.hexsha, max_change_size=max_change_size))
 
             if len(new_commits_to_ignore) == 0:
                 to_blame = False
@@ -98,6 +97,6 @@ class AGSZZ(AbstractSZZ):
             commits_to_ignore.update(new_commits_to_ignore)
             params['ignore_revs_list'] = list(commits_to_ignore)
 
-        bic = set([bd.commit for bd in blame_data if bd.commit.hexsha not in self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size)])
+        bic = set([bd.commit for bd in blame_data if bd.hexsha not in self._exclude_commits_by_change_size(bd.hexsha, max_change_size)])
 
         return bic
@@ -1,10 +1,11 @@
 import logging as log
 import traceback
-from typing import List, Set
+from typing import Iterator, List, Set
 
 from git import Commit
 
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.core.session import SZZSession
 
 
 class BaseSZZ(AbstractSZZ):
@@ -17,8 +18,9 @@ class BaseSZZ(AbstractSZZ):
 
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True):
-        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
 
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
@@ -30,12 +32,19 @@ class BaseSZZ(AbstractSZZ):
         :returns Set[Commit] a set of bug introducing commits candidates, represented by Commit object
         """
 
+        return set(self.iter_bic(fix_commit_hash, impacted_files, **kwargs))
+
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+        Yield the bug introducing commits candidates as the impacted files are blamed, see find_bic.
+        """
+
         log.info(f"find_bic() kwargs: {kwargs}")
 
         ignore_revs_file_path = kwargs.get('ignore_revs_file_path', None)
         # self._set_working_tree_to_commit(fix_commit_hash)
 
-        bug_introd_commits = set()
+        found = set()
         for imp_file in impacted_files:
             try:
                 blame_data = self._blame(
@@ -47,8 +56,11 @@ class BaseSZZ(AbstractSZZ):
                     ignore_whitespaces=False,
                     skip_comments=False
                 )
-                bug_introd_commits.update([entry.commit for entry in blame_data])
             except:
                 print(traceback.format_exc())
+                continue
 
-        return bug_introd_commits
+            for entry in blame_data:
+                if entry.hexsha not in found:
+                    found.add(entry.hexsha)
+                    yield entry.commit
@@ -1,21 +1,26 @@
 import logging as log
 import ntpath
 import os
+import sys
 from abc import ABC, abstractmethod
 from shutil import copytree
 from enum import Enum
 from shutil import rmtree
-from typing import List, Set
+from typing import Iterator, List, Set
 from tempfile import mkdtemp
 
 from git import Commit, Repo
+from git.util import hex_to_bin
 try:
     from pydriller import ModificationType, GitRepository as PyDrillerGitRepo
 except ImportError:
     # 新版PyDriller中GitRepository被重命名为Repository
     from pydriller import ModificationType, Repository as PyDrillerGitRepo
 
-from .comment_parser import parse_comments
+from .blame_store import BlameEntry, blame_key
+from .commit_stats import CommitStats
+from .session import SZZSession
+from .comment_parser import parse_comments, in_comment_ranges, comment_lines_in_range
 
 
 class DetectLineMoved(Enum):
@@ -40,7 +45,8 @@ class AbstractSZZ(ABC):
     commands and PyDriller to parse commit modifications.
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True):
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
         """
         Init an abstract SZZ to use as base class for SZZ implementations.
         AbstractSZZ uses a temp folder to clone and interact with the given git repo, where
@@ -50,8 +56,21 @@ class AbstractSZZ(ABC):
         :param str repo_full_name: full name of the Git repository to clone and interact with
         :param str repo_url: url of the Git repository to clone
         :param str repos_dir: temp folder where to clone the given repo
+        :param SZZSession session: share the repository and the impacted files and blame results with the other
+            SZZ implementations of the session
         """
         self.repo_full_name = repo_full_name
+        self._session = session
+        # on-disk store of blame results shared across SZZ implementations and runs, see BlameStore
+        self.blame_store = session.blame_store if session is not None else None
+
+        if session is not None and session.owner is not None:
+            # the repository has already been opened by the owner of the session
+            self.use_temp_dir = False
+            self.__temp_dir = session.temp_dir
+            self._repository_path = session.repository_path
+            self._repository = session.repository
+            return
 
         self.use_temp_dir = use_temp_dir
 
@@ -95,7 +114,14 @@ class AbstractSZZ(ABC):
 
             self._repository = Repo(self._repository_path)
 
+        if session is not None:
+            session.open(self, self._repository, self._repository_path, self.__temp_dir)
+
     def __del__(self):
+        session = getattr(self, '_session', None)
+        if session is not None and session.owner is not self:
+            return  # the repository is cleaned up with the owner of the session
+
         log.info("cleanup objects...")
         self.__cleanup_repo()
         self.__clear_gitpython()
@@ -118,6 +144,16 @@ class AbstractSZZ(ABC):
         """
         return self._repository_path
 
+    @property
+    def commit_stats(self) -> CommitStats:
+        """
+         Getter of the index of commit sizes (modified files, added plus deleted lines), which is shared by all
+         the SZZ instances.
+
+         :returns CommitStats commit_stats
+        """
+        return CommitStats(self.repository)
+
     @abstractmethod
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
@@ -130,13 +166,26 @@ class AbstractSZZ(ABC):
         """
         pass
 
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+         Generator variant of find_bic, yielding each bug introducing commit candidate once. Implementations that
+         can emit candidates as soon as they are found override it, by default the result of find_bic is yielded.
+
+        :param str fix_commit_hash: hash of fix commit to scan for buggy commits
+        :param List[ImpactedFile] impacted_files: list of impacted files in fix commit
+        :param **kwargs: optional parameters specific for each SZZ implementation
+        :returns Iterator[Commit] the bug introducing commits candidates, represented by Commit object
+        """
+        yield from self.find_bic(fix_commit_hash, impacted_files, **kwargs)
+
     def get_impacted_files(self, fix_commit_hash: str,
                            file_ext_to_parse: List[str] = None,
                            only_deleted_lines: bool = True) -> List['ImpactedFile']:
         """
          Parse the diff of given fix commit using PyDriller to obtain a list of ImpactedFile with
          impacted file path and modified line ranges. As default behaviour, all deleted lines in the diff which
-         are also added are treated as modified lines.
+         are also added are treated as modified lines. Within a session, the diff is parsed once for all the
+         SZZ implementations, each getting its own copy of the impacted files.
 
         :param List[str] file_ext_to_parse: parse only the given file extensions
         :param only_deleted_lines: considers as modified lines only the line numbers that are deleted and added.
@@ -144,6 +193,18 @@ class AbstractSZZ(ABC):
         :param str fix_commit_hash: hash of fix commit to parse
         :returns List[ImpactedFile] impacted_files
         """
+        if self._session is None:
+            return self._parse_impacted_files(fix_commit_hash, file_ext_to_parse, only_deleted_lines)
+
+        key = (fix_commit_hash, tuple(file_ext_to_parse or ()), only_deleted_lines)
+        if key not in self._session.impacted_files:
+            self._session.impacted_files[key] = self._parse_impacted_files(fix_commit_hash, file_ext_to_parse,
+                                                                           only_deleted_lines)
+        return [ImpactedFile(f.file_path, list(f.modified_lines)) for f in self._session.impacted_files[key]]
+
+    def _parse_impacted_files(self, fix_commit_hash: str,
+                              file_ext_to_parse: List[str] = None,
+                              only_deleted_lines: bool = True) -> List['ImpactedFile']:
         impacted_files = list()
 
         # 使用PyDriller获取指定提交
@@ -292,6 +353,67 @@ class AbstractSZZ(ABC):
         :returns Set[BlameData] a set of bug introducing commits candidates, represented by BlameData object
         """
 
+        kwargs = self._blame_kwargs(ignore_revs_list, ignore_revs_file_path, ignore_whitespaces,
+                                    detect_move_within_file, detect_move_from_other_files)
+
+        cache_key = None
+        if self._session is not None:
+            cache_key = (rev, file_path, tuple(modified_lines), skip_comments, frozenset(ignore_revs_list or ()),
+                         ignore_revs_file_path, ignore_whitespaces, detect_move_within_file,
+                         detect_move_from_other_files)
+            if cache_key in self._session.blame_data:
+                return set(self._session.blame_data[cache_key])
+
+        bug_introd_commits = set()
+        mod_line_ranges = self._parse_line_ranges(modified_lines)
+        log.info(f"processing file: {file_path}")
+        # blamed files already read, (commit, path) -> (lines, comment ranges)
+        sources = dict()
+        for entry in self._blame_entries(rev, file_path, mod_line_ranges, kwargs):
+            # entry.orig_start, entry.num_lines = output line numbers from blame (previous commit lines from blame)
+            source_key = (entry.hexsha, entry.orig_path)
+            if source_key not in sources:
+                source_file_content = self.repository.git.show(f"{entry.hexsha}:{entry.orig_path}")
+                comment_ranges = None
+                if skip_comments:
+                    comment_ranges = parse_comments(source_file_content, ntpath.basename(entry.orig_path),
+                                                    self.__temp_dir)
+                sources[source_key] = (source_file_content.split('\n'), comment_ranges)
+            lines, comment_ranges = sources[source_key]
+
+            orig_linenos = range(entry.orig_start, entry.orig_start + entry.num_lines)
+            comment_lines = set()
+            if skip_comments:
+                comment_lines = comment_lines_in_range(comment_ranges, orig_linenos)
+
+            entry_blame_data = list()
+            for line_num in orig_linenos:
+                line_str = lines[line_num - 1].strip()
+                if line_num in comment_lines:
+                    log.info(f"skip comment line ({line_num}): {line_str}")
+                    continue
+
+                b_data = BlameData(entry.hexsha, line_num, line_str, entry.orig_path, self.repository)
+                log.info(b_data)
+                entry_blame_data.append(b_data)
+
+            bug_introd_commits.update(entry_blame_data)
+
+        if cache_key is not None:
+            self._session.blame_data[cache_key] = set(bug_introd_commits)
+        return bug_introd_commits
+
+    @staticmethod
+    def _blame_kwargs(ignore_revs_list: List[str] = None,
+                      ignore_revs_file_path: str = None,
+                      ignore_whitespaces: bool = False,
+                      detect_move_within_file: bool = False,
+                      detect_move_from_other_files: 'DetectLineMoved' = None) -> dict:
+        """
+         Options of git blame, as given to GitPython, for the parameters of _blame.
+
+        :returns dict kwargs
+        """
         kwargs = dict()
         if ignore_whitespaces:
             kwargs['w'] = True
@@ -307,26 +429,32 @@ class AbstractSZZ(ABC):
             kwargs['C'] = [True, True]
         if detect_move_from_other_files and detect_move_from_other_files == DetectLineMoved.ANY_COMMIT:
             kwargs['C'] = [True, True, True]
+        return kwargs
 
-        bug_introd_commits = set()
-        mod_line_ranges = self._parse_line_ranges(modified_lines)
-        log.info(f"processing file: {file_path}")
-        for entry in self.repository.blame_incremental(**kwargs, rev=rev, L=mod_line_ranges, file=file_path):
-            # entry.linenos = input lines to blame (current lines)
-            # entry.orig_lineno = output line numbers from blame (previous commit lines from blame)
-            for line_num in entry.orig_linenos:
-                source_file_content = self.repository.git.show(f"{entry.commit.hexsha}:{entry.orig_path}")
-                line_str = source_file_content.split('\n')[line_num - 1].strip()
-                b_data = BlameData(entry.commit, line_num, line_str, entry.orig_path)
-
-                if skip_comments and self._is_comment(line_num, source_file_content, ntpath.basename(b_data.file_path)):
-                    log.info(f"skip comment line ({line_num}): {line_str}")
-                    continue
-
-                log.info(b_data)
-                bug_introd_commits.add(b_data)
+    def _blame_entries(self, rev: str, file_path: str, line_ranges: List[str], blame_kwargs: dict) -> List[BlameEntry]:
+        """
+         Run git blame on line ranges of a file, or read its result from the blame store if it has already been
+         computed, by this or another SZZ implementation or run.
 
-        return bug_introd_commits
+        :param str rev: commit revision
+        :param str file_path: path of file to blame
+        :param List[str] line_ranges: line ranges, as given to the param '-L' of git blame
+        :param dict blame_kwargs: options of git blame, see _blame_kwargs
+        :returns List[BlameEntry] the groups of blamed lines
+        """
+        key = None
+        if self.blame_store is not None:
+            key = blame_key(self.repository.rev_parse(rev).hexsha, file_path, line_ranges, blame_kwargs)
+            entries = self.blame_store.get(key)
+            if entries is not None:
+                return entries
+
+        entries = [BlameEntry(entry.commit.hexsha, entry.orig_path, entry.orig_linenos.start, len(entry.orig_linenos))
+                   for entry in self.repository.blame_incremental(**blame_kwargs, rev=rev, L=line_ranges,
+                                                                  file=file_path)]
+        if key is not None:
+            self.blame_store.put(key, entries)
+        return entries
 
     def _parse_line_ranges(self, modified_lines: List) -> List[str]:
         """
@@ -372,10 +500,7 @@ class AbstractSZZ(ABC):
 
         comment_ranges = parse_comments(source_file_content, source_file_name, self.__temp_dir)
 
-        for comment_range in comment_ranges:
-            if comment_range.start <= line_num <= comment_range.end:
-                return True
-        return False
+        return in_comment_ranges(comment_ranges, line_num)
 
     def _set_working_tree_to_commit(self, commit: str):
         # self.repository.head.reference = self.repository.commit(fix_commit_hash)
@@ -411,6 +536,8 @@ class AbstractSZZ(ABC):
 
 class ImpactedFile:
     """ Data class to represent impacted files """
+    __slots__ = ('file_path', 'modified_lines')
+
     def __init__(self, file_path: str, modified_lines: List[int]):
         """
         :param str file_path: previous path of the current impacted file
@@ -425,22 +552,35 @@ class ImpactedFile:
 
 
 class BlameData:
-    """ Data class to represent blame data """
-    def __init__(self, commit: Commit, line_num: int, line_str: str, file_path: str):
+    """ Data class to represent blame data, the blamed commit is only resolved from its hash when accessed """
+    __slots__ = ('hexsha', 'line_num', 'line_str', 'file_path', '_repository')
+
+    def __init__(self, hexsha: str, line_num: int, line_str: str, file_path: str, repository: Repo = None):
         """
-        :param Commit commit: commit detected by git blame
+        :param str hexsha: hash of the commit detected by git blame
         :param int line_num: number of the blamed line
-        :param str line_str: content of the blamed line
-        :param str file_path: path of the blamed file
+        :param str line_str: content of the blamed line, can be None
+        :param str file_path: path of the blamed file, interned as many records share it
+        :param Repo repository: repository to resolve the commit from
         :returns BlameData
         """
-        self.commit = commit
+        self.hexsha = hexsha
         self.line_num = line_num
         self.line_str = line_str
-        self.file_path = file_path
+        self.file_path = sys.intern(file_path)
+        self._repository = repository
+
+    @property
+    def commit(self) -> Commit:
+        """
+         Commit detected by git blame, built on demand from its hash.
+
+         :returns Commit commit
+        """
+        return Commit(self._repository, hex_to_bin(self.hexsha))
 
     def __str__(self) -> str:
-        return f'{self.__class__.__name__}(commit={self.commit.hexsha},line_num={self.line_num},file_path="{self.file_path}",line_str="{self.line_str}")'
+        return f'{self.__class__.__name__}(commit={self.hexsha},line_num={self.line_num},file_path="{self.file_path}",line_str="{self.line_str}")'
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, self.__class__):
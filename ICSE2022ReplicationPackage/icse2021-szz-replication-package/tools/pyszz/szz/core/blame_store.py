@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from typing import List, Optional
+
+# a group of consecutive blamed lines: orig_start, ..., orig_start + num_lines - 1 of orig_path in the commit hexsha
+BlameEntry = namedtuple('BlameEntry', 'hexsha orig_path orig_start num_lines')
+
+IGNORE_REVS_OPTIONS = ('ignore-rev', 'ignore-revs-file')
+
+
+def normalize_blame_flags(blame_kwargs: dict) -> List[str]:
+    """
+    Sorted command line flags of git blame, e.g. {'w': True, 'C': [True, True]} -> ['-C', '-C', '-w']. The commits
+    to ignore are left to ignore_revs_digest.
+    """
+    flags = list()
+    for name, value in blame_kwargs.items():
+        if name in IGNORE_REVS_OPTIONS or not value:
+            continue
+        flag = ('-' if len(name) == 1 else '--') + name
+        flags += [flag] * (len(value) if isinstance(value, list) else 1)
+    return sorted(flags)
+
+
+def ignore_revs_digest(blame_kwargs: dict) -> str:
+    """
+    Digest of the commits ignored by git blame: the ignore-rev list, whatever its order, and the content (not the
+    path) of the ignore-revs file.
+    """
+    digest = hashlib.sha1()
+    for rev in sorted(blame_kwargs.get('ignore-rev') or ()):
+        digest.update(rev.encode('utf-8') + b'\n')
+    ignore_revs_file_path = blame_kwargs.get('ignore-revs-file')
+    if ignore_revs_file_path:
+        with open(ignore_revs_file_path, 'rb') as f:
+            digest.update(b'\0' + f.read())
+    return digest.hexdigest()
+
+
+def blame_key(commit_hash: str, file_path: str, line_ranges: List[str], blame_kwargs: dict) -> bytes:
+    """
+    Content address of a git blame. The blamed revision must be resolved to its commit hash, which addresses the
+    whole history, so the key is the same in every clone of a repository.
+
+    :param str commit_hash: hash of the blamed revision
+    :param str file_path: path of the blamed file
+    :param List[str] line_ranges: the '-L' line ranges
+    :param dict blame_kwargs: the options of git blame, as given to GitPython
+    :returns bytes key
+    """
+    key = json.dumps([commit_hash, file_path, list(line_ranges), normalize_blame_flags(blame_kwargs),
+                      ignore_revs_digest(blame_kwargs)])
+    return hashlib.sha1(key.encode('utf-8')).digest()
+
+
+class BlameStore:
+    """
+    SQLite store of git blame results, addressed by blame_key. It is persisted on disk so that the SZZ
+    implementations and the runs share the blames, and can be written by several processes at once.
+    """
+
+    def __init__(self, db_path: str):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS blames (key BLOB PRIMARY KEY, entries TEXT) WITHOUT ROWID')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM blames').fetchone()[0]
+
+    def __contains__(self, key: bytes):
+        return self.conn.execute('SELECT 1 FROM blames WHERE key = ?', (key,)).fetchone() is not None
+
+    def get(self, key: bytes) -> Optional[List[BlameEntry]]:
+        row = self.conn.execute('SELECT entries FROM blames WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return [BlameEntry(*entry) for entry in json.loads(row[0])]
+
+    def put(self, key: bytes, entries: List[BlameEntry]):
+        self.conn.execute('INSERT OR REPLACE INTO blames VALUES (?, ?)', (key, json.dumps([list(e) for e in entries])))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
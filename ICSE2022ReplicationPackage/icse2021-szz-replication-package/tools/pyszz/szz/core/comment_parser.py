@@ -1,173 +1,229 @@
+import bisect
 import logging as log
-import os
 import re
-import subprocess
-from collections import namedtuple
 import tempfile
+from collections import namedtuple
 
 CommentRange = namedtuple('CommentRange', 'start end')
-srcml_file_ext = ['.c', '.h', '.hh', '.hpp', '.hxx', '.cxx', '.cpp', '.cc', '.cs', '.java']
 
 
-def parse_comments(file_str: str, file_name: str, temp_dir: str = tempfile.gettempdir()):
-    if file_name.endswith(".py"):
-        line_comment_ranges = py_comment_parser(file_str, file_name)
-    elif file_name.endswith(".js"):
-        line_comment_ranges = js_comment_parser(file_str, file_name)
-    elif file_name.endswith(".php") or file_name.endswith(".phpt"):
-        line_comment_ranges = php_comment_parser(file_str, file_name)
-    elif file_name.endswith(".rb"):
-        line_comment_ranges = rb_comment_parser(file_str, file_name)
-    else:
-        line_comment_ranges = parse_comments_srcml(file_str, file_name, temp_dir)
-
-    return line_comment_ranges
-
-
-def parse_comments_srcml(file_str: str, file_name: str, temp_folder: str = tempfile.gettempdir()):
-    line_comment_ranges = list()
-
-    if any(file_name.endswith(e) for e in srcml_file_ext):
-        if not os.path.isdir(temp_folder):
-            os.makedirs(temp_folder)
-
-        file_name = os.path.join(temp_folder, 'temp_' + file_name)
-        with open(file_name, 'w', encoding='utf-8', errors='ignore') as temp_file:
-            temp_file.write(file_str)
-
-        process_out = list()
-        try:
-            # 使用列表形式避免路径中空格问题
-            p = subprocess.Popen(['srcml', '--position', file_name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        except FileNotFoundError:
-            # srcml未安装，跳过注释过滤
-            if os.path.isfile(file_name):
-                os.remove(file_name)
-            return line_comment_ranges
-        
-        for line in p.stdout.readlines():
-            # 使用errors='ignore'来处理无法解码的字符
-            try:
-                decoded_line = line.decode('utf-8').strip()
-            except UnicodeDecodeError:
-                # 尝试使用其他编码或忽略错误
-                decoded_line = line.decode('utf-8', errors='ignore').strip()
-            process_out.append(decoded_line)
-        status = p.wait()
-
-        if status == 0:
-            for line in process_out:
-                if line.strip().startswith("<comment"):
-                    line_comment_ranges.append(CommentRange(start=int(re.search(r'pos:start="(\d+):', line).groups()[0]),
-                                                            end=int(re.search(r'pos:end="(\d+):', line).groups()[0])))
-        else:
-            log.error(process_out)
-
-        if os.path.isfile(file_name):
-            os.remove(file_name)
-    else:
-        log.error(f"file not supported by srcML: {file_name}")
-
-    return line_comment_ranges
-
-
-def js_comment_parser(file_str, file_name):
-    line_comment_ranges = list()
-
-    if file_name.endswith(".js"):
-        lines = file_str.splitlines()
-        l_idx = 0
-        while l_idx < len(lines):
-            line = lines[l_idx].strip()
-            if line.startswith("/*"):
-                for i in range(l_idx, len(lines)):
-                    line = lines[i].strip()
-                    if i == l_idx:
-                        line = line[2:]
-                    if line and line.endswith("*/"):
-                        line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(i + 1)))
-                        l_idx = i
-                        break
-            elif line.startswith("//"):
-                line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(l_idx + 1)))
-            l_idx += 1
-    else:
-        log.error(f"unable to parse comments for: {file_name}")
+class Syntax:
+    """
+    Comment and string syntax of a language, as needed to find its comments: strings are skipped so that
+    comment markers inside them are ignored.
+    """
+
+    def __init__(self, line_comments=(), block_comments=None, quotes=(), multiline_strings=False,
+                 multiline_quotes=(), triple_quotes=(), docstrings=False, regex_literals=False, raw_strings=False,
+                 verbatim_strings=False, embedded_docs=False):
+        self.line_comments = line_comments
+        self.block_comments = block_comments or {}
+        self.triple_quotes = triple_quotes
+        self.docstrings = docstrings
+        self.regex_literals = regex_literals
+        self.raw_strings = raw_strings
+        self.verbatim_strings = verbatim_strings
+        self.embedded_docs = embedded_docs
+
+        self.string_ends = dict()
+        for q in list(quotes) + list(multiline_quotes):
+            stop = '' if multiline_strings or q in multiline_quotes else '\n'
+            self.string_ends[q] = re.compile(r'(?:[^%s\\%s]|\\.)*(?:%s)?' % (q, stop, q), re.S)
+
+        tokens = []
+        if raw_strings:
+            tokens.append(r'R"[^()\\\s"]{0,16}\(')
+        if verbatim_strings:
+            tokens.append(r'@"')
+        if embedded_docs:
+            tokens.append(r'(?m:^=begin\b)')
+        tokens += [re.escape(t) for t in sorted(list(triple_quotes) + list(self.block_comments) + list(line_comments) +
+                                                list(self.string_ends), key=len, reverse=True)]
+        if regex_literals:
+            tokens.append('/')
+        self.token_re = re.compile('|'.join(tokens))
+
+
+C_SYNTAX = Syntax(line_comments=('//',), block_comments={'/*': '*/'}, quotes=('"', "'"), raw_strings=True)
+CS_SYNTAX = Syntax(line_comments=('//',), block_comments={'/*': '*/'}, quotes=('"', "'"), verbatim_strings=True)
+JAVA_SYNTAX = Syntax(line_comments=('//',), block_comments={'/*': '*/'}, quotes=('"', "'"), triple_quotes=('"""',))
+JS_SYNTAX = Syntax(line_comments=('//',), block_comments={'/*': '*/'}, quotes=('"', "'"), multiline_quotes=('`',),
+                   regex_literals=True)
+PHP_SYNTAX = Syntax(line_comments=('//', '#'), block_comments={'/*': '*/'}, quotes=('"', "'"), multiline_strings=True)
+RB_SYNTAX = Syntax(line_comments=('#',), quotes=('"', "'"), multiline_strings=True, embedded_docs=True)
+PY_SYNTAX = Syntax(line_comments=('#',), quotes=('"', "'"), triple_quotes=('"""', "'''"), docstrings=True)
+
+LANGUAGES = {
+    '.c': C_SYNTAX, '.h': C_SYNTAX, '.hh': C_SYNTAX, '.hpp': C_SYNTAX, '.hxx': C_SYNTAX, '.cxx': C_SYNTAX,
+    '.cpp': C_SYNTAX, '.cc': C_SYNTAX,
+    '.cs': CS_SYNTAX,
+    '.java': JAVA_SYNTAX,
+    '.js': JS_SYNTAX,
+    '.php': PHP_SYNTAX, '.phpt': PHP_SYNTAX,
+    '.rb': RB_SYNTAX,
+    '.py': PY_SYNTAX,
+}
+
+# a '/' after one of these characters starts a regular expression literal rather than a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_LITERAL_END = re.compile(r'(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])*/?')
+EMBEDDED_DOC_END = re.compile(r'^=end\b.*$', re.M)
+PY_STRING_PREFIX = re.compile(r'[rRbBuUfF]{0,2}$')
 
-    return line_comment_ranges
-
-
-def php_comment_parser(file_str, file_name):
-    line_comment_ranges = list()
-
-    if file_name.endswith(".php"):
-        lines = file_str.splitlines()
-        l_idx = 0
-        while l_idx < len(lines):
-            line = lines[l_idx].strip()
-            if line.startswith("/*"):
-                for i in range(l_idx, len(lines)):
-                    line = lines[i].strip()
-                    if i == l_idx:
-                        line = line[2:]
-                    if line and line.endswith("*/"):
-                        line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(i + 1)))
-                        l_idx = i
-                        break
-            elif line.startswith("//") or line.startswith("#"):
-                line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(l_idx + 1)))
-            l_idx += 1
-    else:
-        log.error(f"unable to parse comments for: {file_name}")
 
-    return line_comment_ranges
-
-
-def rb_comment_parser(file_str, file_name):
-    line_comment_ranges = list()
-
-    if file_name.endswith(".rb"):
-        lines = file_str.splitlines()
-        l_idx = 0
-        while l_idx < len(lines):
-            line = lines[l_idx].strip()
-            if line.startswith("=begin"):
-                for i in range(l_idx, len(lines)):
-                    line = lines[i].strip()
-                    if line and line.endswith("=end"):
-                        line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(i + 1)))
-                        l_idx = i
-                        break
-            elif line.startswith("//") or line.startswith("#"):
-                line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(l_idx + 1)))
-            l_idx += 1
-    else:
-        log.error(f"unable to parse comments for: {file_name}")
-
-    return line_comment_ranges
-
-
-def py_comment_parser(file_str, file_name):
-    line_comment_ranges = list()
-
-    if file_name.endswith(".py"):
-        lines = file_str.splitlines()
-        l_idx = 0
-        while l_idx < len(lines):
-            line = lines[l_idx].strip()
-            if line.startswith("'''") or line.startswith('"""'):
-                for i in range(l_idx, len(lines)):
-                    line = lines[i].strip()
-                    if i == l_idx:
-                        line = line[3:]
-                    if line and (line.endswith("'''") or line.endswith('"""') or line.startswith("'''") or line.startswith('"""')):
-                        line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(i + 1)))
-                        l_idx = i
-                        break
-            elif line.startswith("#"):
-                line_comment_ranges.append(CommentRange(start=(l_idx + 1), end=(l_idx + 1)))
-            l_idx += 1
-    else:
+def parse_comments(file_str: str, file_name: str, temp_dir: str = tempfile.gettempdir()):
+    """
+    Find the lines of a file that only hold comments (and whitespace).
+
+    :param str file_str: content of the file
+    :param str file_name: name of the file, its extension selects the language
+    :param str temp_dir: unused, kept for compatibility with the former srcML based parser
+    :returns List[CommentRange] the sorted, non overlapping ranges of comment lines
+    """
+    syntax = next((s for ext, s in LANGUAGES.items() if file_name.endswith(ext)), None)
+    if syntax is None:
         log.error(f"unable to parse comments for: {file_name}")
-
-    return line_comment_ranges
+        return list()
+
+    return comment_line_ranges(file_str, scan_comments(file_str, syntax))
+
+
+def scan_comments(text: str, syntax: Syntax):
+    """
+    Scan the text once and return the (start, end) offsets of its comments, in order. The scanner jumps from one
+    comment or string opener to the next, strings being skipped as a whole.
+    """
+    spans = list()
+    n = len(text)
+    pos = 0
+    while True:
+        m = syntax.token_re.search(text, pos)
+        if not m:
+            break
+        token, start, pos = m.group(), m.start(), m.end()
+
+        if token in syntax.line_comments:
+            if token == '#' and syntax is PHP_SYNTAX and text.startswith('#[', start):
+                continue  # PHP attribute
+            end = text.find('\n', pos)
+            pos = n if end < 0 else end
+            spans.append((start, pos))
+        elif token in syntax.block_comments:
+            end = text.find(syntax.block_comments[token], pos)
+            pos = n if end < 0 else end + len(syntax.block_comments[token])
+            spans.append((start, pos))
+        elif token in syntax.triple_quotes:
+            end = text.find(token, pos)
+            while end > 0 and _is_escaped(text, end):
+                end = text.find(token, end + 1)
+            pos = n if end < 0 else end + len(token)
+            if syntax.docstrings:
+                prefix = _docstring_prefix(text, start)
+                if prefix is not None:
+                    spans.append((start - len(prefix), pos))
+        elif token in syntax.string_ends:
+            pos = syntax.string_ends[token].match(text, pos).end()
+        elif token == '/':
+            if _regex_allowed(text, start):
+                pos = REGEX_LITERAL_END.match(text, pos).end()
+        elif token == '@"':
+            pos = _verbatim_string_end(text, pos)
+        elif token.startswith('R"'):
+            end = text.find(')' + token[2:-1] + '"', pos)
+            pos = n if end < 0 else end + len(token) - 1
+        elif token == '=begin':
+            m = EMBEDDED_DOC_END.search(text, pos)
+            pos = n if m is None else m.end()
+            spans.append((start, pos))
+
+    return spans
+
+
+def comment_line_ranges(text: str, spans):
+    """
+    Convert comment offsets to the ranges of 1-based line numbers of the lines that only hold comments.
+    """
+    # the text without its comments, with the line breaks of the comments kept
+    pieces = list()
+    last = 0
+    for start, end in spans:
+        pieces.append(text[last:start])
+        pieces.append('\n' * text.count('\n', start, end))
+        last = end
+    pieces.append(text[last:])
+    code_lines = ''.join(pieces).split('\n')
+
+    ranges = list()
+    line = 1
+    last = 0
+    for start, end in spans:
+        line += text.count('\n', last, start)
+        end_line = line + text.count('\n', start, max(start, end - 1))
+        last = start
+
+        for line_num in range(line, end_line + 1):
+            if code_lines[line_num - 1].strip():
+                continue
+            if ranges and ranges[-1].end >= line_num - 1:
+                if ranges[-1].end < line_num:
+                    ranges[-1] = CommentRange(ranges[-1].start, line_num)
+            else:
+                ranges.append(CommentRange(line_num, line_num))
+
+    return ranges
+
+
+def in_comment_ranges(comment_ranges, line_num: int) -> bool:
+    """
+    Check with a binary search whether a line number is inside sorted, non overlapping comment ranges.
+    """
+    i = bisect.bisect_right(comment_ranges, (line_num, float('inf'))) - 1
+    return i >= 0 and comment_ranges[i].start <= line_num <= comment_ranges[i].end
+
+
+def comment_lines_in_range(comment_ranges, lines: range) -> set:
+    """
+    Intersect a range of line numbers with sorted, non overlapping comment ranges in one sweep, returns the set of
+    line numbers of the range that are comments.
+    """
+    comment_lines = set()
+    if not lines:
+        return comment_lines
+
+    i = max(bisect.bisect_right(comment_ranges, (lines[0], float('inf'))) - 1, 0)
+    while i < len(comment_ranges) and comment_ranges[i].start <= lines[-1]:
+        comment_lines.update(range(max(comment_ranges[i].start, lines[0]), min(comment_ranges[i].end, lines[-1]) + 1))
+        i += 1
+    return comment_lines
+
+
+def _is_escaped(text: str, pos: int) -> bool:
+    backslashes = 0
+    while pos - backslashes - 1 >= 0 and text[pos - backslashes - 1] == '\\':
+        backslashes += 1
+    return backslashes % 2 == 1
+
+
+def _docstring_prefix(text: str, pos: int):
+    """ A string is a docstring if nothing but a string prefix precedes it on its line, returns that prefix """
+    line_start = text.rfind('\n', 0, pos) + 1
+    m = PY_STRING_PREFIX.match(text[line_start:pos].lstrip())
+    return None if m is None else m.group()
+
+
+def _regex_allowed(text: str, pos: int) -> bool:
+    i = pos - 1
+    while i >= 0 and text[i] in ' \t\r\n':
+        i -= 1
+    return i < 0 or text[i] in REGEX_PRECEDERS
+
+
+def _verbatim_string_end(text: str, pos: int) -> int:
+    """ End of a C# verbatim string, where "" is an escaped quote """
+    while True:
+        end = text.find('"', pos)
+        if end < 0:
+            return len(text)
+        if not text.startswith('""', end):
+            return end + 1
+        pos = end + 2
@@ -0,0 +1,122 @@
+import logging as log
+from collections import namedtuple
+from itertools import islice
+from typing import Dict, Iterable, Iterator
+
+from git import Repo
+
+CommitStat = namedtuple('CommitStat', 'files lines')
+
+# hash -> CommitStat, shared by all the repositories (and temp copies) as a hash always has the same stats
+_STATS = dict()
+
+HEADER = 'commit: '
+
+
+def parse_numstat(lines: Iterable[str]) -> Iterator[tuple]:
+    """
+    Parse the output of git log --numstat --pretty=format:"commit: %H", the format of the numstat logs of GitLogs.
+    Binary files ("-" instead of numbers) count as a modified file without lines.
+
+    :param Iterable[str] lines: lines of the log
+    :returns Iterator[tuple] (hash, CommitStat) for each commit of the log
+    """
+    commit = None
+    files = changed = 0
+    for line in lines:
+        if line.startswith(HEADER):
+            if commit is not None:
+                yield commit, CommitStat(files, changed)
+            commit = line[len(HEADER):].strip()
+            files = changed = 0
+        elif line.strip():
+            added, deleted, _ = line.split('\t', 2)
+            files += 1
+            if added != '-':
+                changed += int(added) + int(deleted)
+    if commit is not None:
+        yield commit, CommitStat(files, changed)
+
+
+class CommitStats:
+    """
+    Index of the size of commits (number of modified files and of added plus deleted lines), as given by
+    git log --numstat -M. Commits are loaded in batches with a single git log, merge commits have no stats.
+    """
+
+    def __init__(self, repository: Repo, batch_size: int = 500):
+        """
+        :param Repo repository: repository to read the commits from
+        :param int batch_size: maximum number of commits loaded by a single git log
+        """
+        self.repository = repository
+        self.batch_size = batch_size
+
+    @property
+    def stats(self) -> Dict[str, CommitStat]:
+        return _STATS
+
+    def load(self, commits: Iterable[str] = None):
+        """
+        Load the stats of the given commits that are not indexed yet, or of all the commits of the repository.
+
+        :param Iterable[str] commits: hashes of the commits, all the commits if None
+        """
+        if commits is None:
+            self._read_log('--all')
+            return
+
+        missing = iter([c for c in dict.fromkeys(commits) if c not in _STATS])
+        batch = list(islice(missing, self.batch_size))
+        while batch:
+            self._read_log('--no-walk', *batch)
+            # commits that git log does not report (e.g. unknown hashes) are not looked up again
+            for commit in batch:
+                _STATS.setdefault(commit, CommitStat(0, 0))
+            batch = list(islice(missing, self.batch_size))
+
+    def load_log(self, numstat_log_path: str):
+        """
+        Load the stats from a numstat log, as written by log_generation.py (git log --pretty=format:"commit: %H"
+        --numstat -M).
+
+        :param str numstat_log_path: path of the log
+        """
+        with open(numstat_log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            _STATS.update(parse_numstat(f))
+
+    def get(self, commit: str) -> CommitStat:
+        if commit not in _STATS:
+            self.load([commit])
+        return _STATS[commit]
+
+    def iter_stats(self, commits: Iterable[str]) -> Iterator[tuple]:
+        """
+        Yield the stats of a stream of commits, e.g. a walk of the history that may be stopped early. The commits
+        are loaded in batches that double in size, so that stopping at the first commits stays cheap.
+
+        :param Iterable[str] commits: hashes of the commits
+        :returns Iterator[tuple] (hash, CommitStat) for each commit
+        """
+        commits = iter(commits)
+        size = 1
+        batch = list(islice(commits, size))
+        while batch:
+            self.load(batch)
+            for commit in batch:
+                yield commit, _STATS[commit]
+            size = min(2 * size, self.batch_size)
+            batch = list(islice(commits, size))
+
+    def files_count(self, commit: str) -> int:
+        """ Number of files modified by the commit """
+        return self.get(commit).files
+
+    def lines_count(self, commit: str) -> int:
+        """ Number of lines added plus deleted by the commit """
+        return self.get(commit).lines
+
+    def _read_log(self, *args):
+        log.info(f"indexing commit stats: {args[0]} ({len(args) - 1} commits)")
+        output = self.repository.git.log(*args, '-M', '--numstat', f'--pretty=format:{HEADER}%H')
+        _STATS.update(parse_numstat(output.split('\n')))
@@ -0,0 +1,34 @@
+class SZZSession:
+    """
+    SZZSession is shared by several SZZ implementations analyzing the same repository. The first implementation
+    created with the session opens the repository and owns it, the others reuse it. The session also keeps the
+    impacted files and the blame results, which are the same for all the implementations given the same parameters.
+    A BlameStore given to the session is used by all its implementations, to share the blames with other runs too.
+    """
+
+    def __init__(self, blame_store=None):
+        self.owner = None
+        self.blame_store = blame_store
+        self.repository = None
+        self.repository_path = None
+        self.temp_dir = None
+        # (fix commit, file extensions, only deleted lines) -> List[ImpactedFile]
+        self.impacted_files = dict()
+        # blame parameters -> Set[BlameData]
+        self.blame_data = dict()
+
+    def open(self, owner, repository, repository_path: str, temp_dir: str):
+        """
+        Register the repository opened by the owner of the session.
+        """
+        self.owner = owner
+        self.repository = repository
+        self.repository_path = repository_path
+        self.temp_dir = temp_dir
+
+    def clear(self):
+        """
+        Drop the cached results, e.g. once a fix commit has been analyzed by all the implementations.
+        """
+        self.impacted_files.clear()
+        self.blame_data.clear()
@@ -1,9 +1,9 @@
 import logging as log
-from typing import List, Set
+from typing import Iterator, List, Set
 
 from git import Commit
-from pydriller.metrics.process.lines_count import LinesCount
 from szz.core.abstract_szz import ImpactedFile
+from szz.core.session import SZZSession
 from szz.ma_szz import MASZZ
 
 
@@ -12,8 +12,9 @@ class LSZZ(MASZZ):
     Large-SZZ implementation.
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
-        super().__init__(repo_full_name, repo_url, repos_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
 
     # TODO: add parse and type check on kwargs
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
@@ -33,13 +34,13 @@ class LSZZ(MASZZ):
 
         bic_candidates = super().find_bic(fix_commit_hash=fix_commit_hash, impacted_files=impacted_files, **kwargs)
 
+        commit_stats = self.commit_stats
+        commit_stats.load([commit.hexsha for commit in bic_candidates])
+
         bic_candidate = None
         max_mod_lines = 0
         for commit in bic_candidates:
-            lc = LinesCount(path_to_repo=self.repository_path, from_commit=commit.hexsha, to_commit=commit.hexsha).count()
-            mod_lines_count = 0
-            for k in lc.keys():
-                mod_lines_count += lc.get(k)
+            mod_lines_count = commit_stats.lines_count(commit.hexsha)
 
             if mod_lines_count > max_mod_lines:
                 max_mod_lines = mod_lines_count
@@ -48,3 +49,9 @@ class LSZZ(MASZZ):
         log.info(f"selected bug introducing commit: {bic_candidate}")
 
         return {bic_candidate}
+
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+        The selection of find_bic needs all the candidates, so it cannot stream them.
+        """
+        yield from self.find_bic(fix_commit_hash, impacted_files, **kwargs)
@@ -1,11 +1,12 @@
 import logging as log
-from typing import List, Set
+from typing import Iterator, List, Set
 from time import time as ts
 from git import Commit
 from pydriller import Repository as RepositoryMining, ModificationType
 
 from szz.ag_szz import AGSZZ
 from szz.core.abstract_szz import ImpactedFile, DetectLineMoved
+from szz.core.session import SZZSession
 
 
 class MASZZ(AGSZZ):
@@ -13,8 +14,9 @@ class MASZZ(AGSZZ):
     Meta-Change-Aware-SZZ implementation.
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True):
-        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
         self.__changes_to_ignore = [
             ModificationType.RENAME,
             ModificationType.COPY
@@ -79,6 +81,14 @@ class MASZZ(AGSZZ):
         :returns Set[Commit] a set of bug introducing commits candidates, represented by Commit object
         """
 
+        # not self.iter_bic: R-SZZ and L-SZZ filter the candidates of find_bic in their iter_bic
+        return set(MASZZ.iter_bic(self, fix_commit_hash, impacted_files, **kwargs))
+
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+        Yield the bug introducing commits candidates of each impacted file once its blame is settled, see find_bic.
+        """
+
         log.info(f"find_bic() kwargs: {kwargs}")
         # self._set_working_tree_to_commit(fix_commit_hash)
 
@@ -95,7 +105,7 @@ class MASZZ(AGSZZ):
         blame_data = list()
         commits_to_ignore = set()
         commits_to_ignore_current_file = set()
-        bic = set()
+        found = set()
         for imp_file in impacted_files:
             commits_to_ignore_current_file = commits_to_ignore.copy()
 
@@ -107,11 +117,11 @@ class MASZZ(AGSZZ):
                 new_commits_to_ignore = set()
                 new_commits_to_ignore_current_file = set()
                 for bd in blame_data:
-                    if bd.commit.hexsha not in new_commits_to_ignore and bd.commit.hexsha not in new_commits_to_ignore_current_file:
-                        if bd.commit.hexsha not in commits_to_ignore_current_file:
-                            new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size=max_change_size))
-                            new_commits_to_ignore.update(self.get_merge_commits(bd.commit.hexsha))
-                            new_commits_to_ignore_current_file.update(self.get_meta_changes(bd.commit.hexsha, bd.file_path))
+                    if bd.hexsha not in new_commits_to_ignore and bd.hexsha not in new_commits_to_ignore_current_file:
+                        if bd.hexsha not in commits_to_ignore_current_file:
+                            new_commits_to_ignore.update(self._exclude_commits_by_change_size(bd.hexsha, max_change_size=max_change_size))
+                            new_commits_to_ignore.update(self.get_merge_commits(bd.hexsha))
+                            new_commits_to_ignore_current_file.update(self.get_meta_changes(bd.hexsha, bd.file_path))
 
                 if len(new_commits_to_ignore) == 0 and len(new_commits_to_ignore_current_file) == 0:
                     to_blame = False
@@ -124,6 +134,8 @@ class MASZZ(AGSZZ):
                 commits_to_ignore_current_file.update(new_commits_to_ignore_current_file)
                 params['ignore_revs_list'] = list(commits_to_ignore_current_file)
 
-            bic.update(set([bd.commit for bd in blame_data if bd.commit.hexsha not in self._exclude_commits_by_change_size(bd.commit.hexsha, max_change_size)]))
-
-        return bic
+            for bd in blame_data:
+                if bd.hexsha not in found:
+                    found.add(bd.hexsha)
+                    if bd.hexsha not in self._exclude_commits_by_change_size(bd.hexsha, max_change_size):
+                        yield bd.commit
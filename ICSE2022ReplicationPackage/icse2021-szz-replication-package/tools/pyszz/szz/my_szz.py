@@ -9,6 +9,7 @@ import json
 from git import Commit
 
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.core.session import SZZSession
 
 try:
     from pydriller import ModificationType, GitRepository as PyDrillerGitRepo
@@ -37,8 +38,9 @@ class MySZZ(AbstractSZZ):
 
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True, ast_map_path = None):
-        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True, ast_map_path = None,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
         self.ast_map_path = ast_map_path
 
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
@@ -71,24 +73,24 @@ class MySZZ(AbstractSZZ):
                 )
 
                 for entry in blame_data:
-                    print(entry.commit, entry.line_num, entry.line_str)
+                    print(entry.hexsha, entry.line_num, entry.line_str)
                     previous_commits = []
                     
                     blame_result = entry
                     while True:
                         if imp_file.file_path.endswith(".java"):
                             mapped_line_num, change_type = self.map_modified_line_java(blame_result, imp_file.file_path)
-                            previous_commits.append((blame_result.commit.hexsha, blame_result.line_num, blame_result.line_str, change_type))
+                            previous_commits.append((blame_result.hexsha, blame_result.line_num, blame_result.line_str, change_type))
                         else:
                             mapped_line_num = self.map_modified_line(blame_result, imp_file.file_path)
-                            previous_commits.append((blame_result.commit.hexsha, blame_result.line_num, blame_result.line_str))
+                            previous_commits.append((blame_result.hexsha, blame_result.line_num, blame_result.line_str))
                         
                         if mapped_line_num == -1:
                             break
                         
                         
                         blame_data2 = self._blame(
-                                        rev='{commit_id}^'.format(commit_id=blame_result.commit.hexsha),
+                                        rev='{commit_id}^'.format(commit_id=blame_result.hexsha),
                                         file_path=imp_file.file_path,
                                         modified_lines=[mapped_line_num],
                                         ignore_revs_file_path=ignore_revs_file_path,
@@ -111,7 +113,7 @@ class MySZZ(AbstractSZZ):
     def map_modified_line_java(self, blame_entry, blame_file_path):
         ast_map_temp = os.path.join(self.ast_map_path, 'temp')
 
-        commit_id = blame_entry.commit.hexsha
+        commit_id = blame_entry.hexsha
         file_path = blame_file_path.replace('\\', '/')
         
         line_num = blame_entry.line_num
@@ -188,13 +190,13 @@ class MySZZ(AbstractSZZ):
         blame_commit = None
         try:
             # 新版PyDriller使用only_commits参数
-            for commit in PyDrillerGitRepo(self.repository_path).traverse_commits(only_commits=[blame_entry.commit.hexsha]):
+            for commit in PyDrillerGitRepo(self.repository_path).traverse_commits(only_commits=[blame_entry.hexsha]):
                 blame_commit = commit
                 break
         except TypeError:
             # 更旧的版本可能不支持only_commits，直接遍历
             for commit in PyDrillerGitRepo(self.repository_path).traverse_commits():
-                if commit.hash == blame_entry.commit.hexsha or commit.hash.startswith(blame_entry.commit.hexsha):
+                if commit.hash == blame_entry.hexsha or commit.hash.startswith(blame_entry.hexsha):
                     blame_commit = commit
                     break
         
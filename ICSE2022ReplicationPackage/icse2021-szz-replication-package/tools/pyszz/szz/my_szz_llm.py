@@ -2,7 +2,7 @@
 LLM 增强版 MySZZ
 
 设计原则：
-- 保持原始 V-SZZ 流程完全不变（git blame → srcml过滤注释 → AST映射）
+- 保持原始 V-SZZ 流程完全不变（git blame → 过滤注释 → AST映射）
 - 只在关键位置（判断是否是引入点）加入 LLM 验证
 - LLM 调用最小化，只在必要时调用
 """
@@ -172,7 +172,7 @@ class MySZZWithLLM(MySZZ):
     LLM 增强版 MySZZ
     
     工作流程：
-    1. 完全复用 MySZZ 的追踪逻辑（git blame + srcml + AST）
+    1. 完全复用 MySZZ 的追踪逻辑（git blame + 注释过滤 + AST）
     2. 当 AST 判断为 Insert/New File（即找到引入点）时，调用大模型验证
     3. 大模型判断后，小模型验证决策的合理性
     4. 如果小模型认为判断错误，反馈给大模型重新分析
@@ -220,11 +220,11 @@ class MySZZWithLLM(MySZZ):
                     modified_lines=imp_file.modified_lines,
                     ignore_revs_file_path=ignore_revs_file_path,
                     ignore_whitespaces=False,
-                    skip_comments=True  # srcml 过滤注释
+                    skip_comments=True  # 过滤注释
                 )
 
                 for entry in blame_data:
-                    print(entry.commit, entry.line_num, entry.line_str)
+                    print(entry.hexsha, entry.line_num, entry.line_str)
                     previous_commits = []
                     
                     blame_result = entry
@@ -237,7 +237,7 @@ class MySZZWithLLM(MySZZ):
                         if imp_file.file_path.endswith(".java"):
                             # Java 文件：使用 AST 映射
                             mapped_line_num, change_type = self.map_modified_line_java(blame_result, imp_file.file_path)
-                            previous_commits.append((blame_result.commit.hexsha, blame_result.line_num, blame_result.line_str, change_type))
+                            previous_commits.append((blame_result.hexsha, blame_result.line_num, blame_result.line_str, change_type))
                             
                             # ========== LLM 增强点（双模型验证 + 反馈循环）==========
                             # 当 AST 判断为 Insert 或 New File 时，用大模型+小模型验证
@@ -258,7 +258,7 @@ class MySZZWithLLM(MySZZ):
                                     if change_type == "New File":
                                         print(f"   🔍 尝试用 git log --follow 继续追踪...")
                                         next_commit = self._find_previous_commit_by_git_log(
-                                            blame_result.commit.hexsha,
+                                            blame_result.hexsha,
                                             imp_file.file_path,
                                             blame_result.line_str
                                         )
@@ -293,13 +293,13 @@ class MySZZWithLLM(MySZZ):
                         else:
                             # 非 Java 文件：使用 Levenshtein 匹配
                             mapped_line_num = self.map_modified_line(blame_result, imp_file.file_path)
-                            previous_commits.append((blame_result.commit.hexsha, blame_result.line_num, blame_result.line_str))
+                            previous_commits.append((blame_result.hexsha, blame_result.line_num, blame_result.line_str))
                         
                         if mapped_line_num == -1:
                             break
                         
                         blame_data2 = self._blame(
-                            rev='{commit_id}^'.format(commit_id=blame_result.commit.hexsha),
+                            rev='{commit_id}^'.format(commit_id=blame_result.hexsha),
                             file_path=imp_file.file_path,
                             modified_lines=[mapped_line_num],
                             ignore_revs_file_path=ignore_revs_file_path,
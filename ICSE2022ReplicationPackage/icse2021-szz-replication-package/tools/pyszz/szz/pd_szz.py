@@ -1,23 +1,25 @@
 import logging as log
 import traceback
-from typing import List, Set
+from typing import Iterator, List, Set
 
 from git import Commit
-from pydriller import Repository as RepositoryMining, Repository as GitRepository
 
 from szz.core.abstract_szz import AbstractSZZ, ImpactedFile
+from szz.core.session import SZZSession
 
 
-def match_files(file: str, impacted_files: List['ImpactedFile']) -> bool:
-    for entry in impacted_files:
-        if entry.file_path == file:
-            return True
-    return False
+def is_useless_line(line: str) -> bool:
+    """ Same filter as PyDriller's get_commits_last_modified_lines: blank lines and lines starting like a comment """
+    line = line.strip()
+    return not line or line.startswith(('//', '#', '/*', "'''", '"""', '*'))
 
 
 class PyDrillerSZZ(AbstractSZZ):
     """
-    PyDriller SZZ implementation.
+    PyDriller SZZ implementation, i.e. the SZZ of PyDriller's get_commits_last_modified_lines: the deleted lines of
+    the fix commit are blamed (ignoring whitespaces) on its parent, except blank lines and comment-like lines.
+    Only the impacted line ranges are blamed, with git blame -L, and the working tree is never touched, so several
+    fix commits of a repository can be analyzed concurrently.
 
     Supported **kwargs:
 
@@ -25,8 +27,9 @@ class PyDrillerSZZ(AbstractSZZ):
 
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
-        super().__init__(repo_full_name, repo_url, repos_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
 
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
         """
@@ -38,21 +41,33 @@ class PyDrillerSZZ(AbstractSZZ):
         :returns Set[Commit] a set of bug introducing commits candidates, represented by Commit object
         """
 
-        log.info(f"find_bic() kwargs: {kwargs}")
+        return set(self.iter_bic(fix_commit_hash, impacted_files, **kwargs))
 
-        ignore_revs_file_path = kwargs.get('ignore_revs_file_path', None)
-        self._set_working_tree_to_commit(fix_commit_hash)
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+        Yield the bug introducing commits candidates as the impacted files are blamed, see find_bic.
+        """
 
-        bug_introd_commits = set()
+        log.info(f"find_bic() kwargs: {kwargs}")
 
-        gr = GitRepository(self.repository_path)
-        pydriller_fix_commit = gr.get_commit(fix_commit_hash)
-        for mod in pydriller_fix_commit.modifications:
-            if match_files(mod.new_path, impacted_files) or match_files(mod.old_path, impacted_files):
-                bics_per_mod = gr.get_commits_last_modified_lines(pydriller_fix_commit, mod)
-                for bic_path, bic_commit_hashes in bics_per_mod.items():
-                    for bic_commit_hash in bic_commit_hashes:
-                        commit_introducing = self.get_commit(bic_commit_hash)
-                        bug_introd_commits.add(commit_introducing)
+        ignore_revs_file_path = kwargs.get('ignore_revs_file_path', None)
 
-        return bug_introd_commits
+        found = set()
+        for imp_file in impacted_files:
+            try:
+                blame_data = self._blame(
+                    rev='{commit_id}^'.format(commit_id=fix_commit_hash),
+                    file_path=imp_file.file_path,
+                    modified_lines=imp_file.modified_lines,
+                    ignore_revs_file_path=ignore_revs_file_path,
+                    ignore_whitespaces=True,
+                    skip_comments=False
+                )
+            except:
+                print(traceback.format_exc())
+                continue
+
+            for entry in blame_data:
+                if entry.hexsha not in found and not is_useless_line(entry.line_str):
+                    found.add(entry.hexsha)
+                    yield entry.commit
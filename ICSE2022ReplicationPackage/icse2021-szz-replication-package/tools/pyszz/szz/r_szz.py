@@ -1,10 +1,11 @@
 import logging as log
 from operator import attrgetter
-from typing import List, Set
+from typing import Iterator, List, Set
 
 from git import Commit
 
 from szz.core.abstract_szz import ImpactedFile
+from szz.core.session import SZZSession
 from szz.ma_szz import MASZZ
 
 
@@ -13,8 +14,9 @@ class RSZZ(MASZZ):
     Recent-SZZ implementation.
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None):
-        super().__init__(repo_full_name, repo_url, repos_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
 
     # TODO: add parse and type check on kwargs
     def find_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Set[Commit]:
@@ -26,3 +28,9 @@ class RSZZ(MASZZ):
             log.info(f"selected bug introducing commit: {latest_bic.hexsha}")
 
         return {latest_bic}
+
+    def iter_bic(self, fix_commit_hash: str, impacted_files: List['ImpactedFile'], **kwargs) -> Iterator[Commit]:
+        """
+        The selection of find_bic needs all the candidates, so it cannot stream them.
+        """
+        yield from self.find_bic(fix_commit_hash, impacted_files, **kwargs)
@@ -8,6 +8,7 @@ import subprocess
 from typing import List, Set
 from git import Commit
 from szz.ma_szz import MASZZ
+from szz.core.session import SZZSession
 from options import Options
 
 
@@ -19,8 +20,9 @@ class RASZZ(MASZZ):
 
     """
 
-    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True):
-        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir)
+    def __init__(self, repo_full_name: str, repo_url: str, repos_dir: str = None, use_temp_dir: bool = True,
+                 session: SZZSession = None):
+        super().__init__(repo_full_name, repo_url, repos_dir, use_temp_dir, session)
         
     def _extract_refactorings_unix(self, commits):
         PATH_TO_REFMINER = os.path.join(Options.PYSZZ_HOME, 'tools/RefactoringMiner-2.0/bin/RefactoringMiner')
@@ -106,7 +108,7 @@ class RASZZ(MASZZ):
             detect_move_from_other_files
         )
         
-        commits = set([blame.commit.hexsha for blame in candidate_blame_data])
+        commits = set([blame.hexsha for blame in candidate_blame_data])
         blame_refactorings = self._extract_refactorings(commits)
         
         to_reblame = dict()
@@ -114,7 +116,7 @@ class RASZZ(MASZZ):
         result_blame_data = set()
         for blame in candidate_blame_data:
             can_add = True
-            for refactoring in blame_refactorings[blame.commit.hexsha]['commits'][0]['refactorings']:
+            for refactoring in blame_refactorings[blame.hexsha]['commits'][0]['refactorings']:
                 for location in refactoring['rightSideLocations']:
                     file_path = location['filePath']
                     from_line = location['startLine']
@@ -122,10 +124,10 @@ class RASZZ(MASZZ):
                     
                     if blame.file_path == file_path and blame.line_num >= from_line and blame.line_num <= to_line:
                         log.info(f'Ignoring {blame.file_path} line {blame.line_num} (refactoring {refactoring["type"]})')
-                        if not (blame.commit.hexsha + "@" + blame.file_path) in to_reblame:
-                            to_reblame[blame.commit.hexsha + "@" + blame.file_path] = ReblameCandidate(blame.commit.hexsha, blame.file_path, [blame.line_num])
+                        if not (blame.hexsha + "@" + blame.file_path) in to_reblame:
+                            to_reblame[blame.hexsha + "@" + blame.file_path] = ReblameCandidate(blame.hexsha, blame.file_path, [blame.line_num])
                         else:
-                            to_reblame[blame.commit.hexsha + "@" + blame.file_path].modified_lines.append(blame.line_num)
+                            to_reblame[blame.hexsha + "@" + blame.file_path].modified_lines.append(blame.line_num)
                         can_add = False
                     
             if can_add:
@@ -0,0 +1,115 @@
+import importlib
+import logging as log
+from collections import namedtuple
+from typing import Dict, List
+
+from szz.core.abstract_szz import AbstractSZZ, DetectLineMoved
+from szz.core.blame_store import BlameStore
+from szz.core.session import SZZSession
+
+# How to build and run an SZZ implementation:
+# * module, class_name: where the implementation is, imported on demand as some need optional dependencies
+# * find_bic_args: the configuration parameters passed to find_bic
+# * init_args: the extra parameters passed to the constructor
+# * returns_commits: whether find_bic returns commits, otherwise its result is kept as is
+SZZVariant = namedtuple('SZZVariant', 'module class_name find_bic_args init_args returns_commits')
+
+SZZ_VARIANTS = {
+    'b': SZZVariant('szz.b_szz', 'BaseSZZ', ('ignore_revs_file_path',), (), True),
+    'ag': SZZVariant('szz.ag_szz', 'AGSZZ', ('ignore_revs_file_path', 'max_change_size'), (), True),
+    'ma': SZZVariant('szz.ma_szz', 'MASZZ',
+                     ('ignore_revs_file_path', 'max_change_size', 'detect_move_from_other_files'), (), True),
+    'r': SZZVariant('szz.r_szz', 'RSZZ',
+                    ('ignore_revs_file_path', 'max_change_size', 'detect_move_from_other_files'), (), True),
+    'l': SZZVariant('szz.l_szz', 'LSZZ',
+                    ('ignore_revs_file_path', 'max_change_size', 'detect_move_from_other_files'), (), True),
+    'ra': SZZVariant('szz.ra_szz', 'RASZZ',
+                     ('ignore_revs_file_path', 'max_change_size', 'detect_move_from_other_files'), (), True),
+    'pd': SZZVariant('szz.pd_szz', 'PyDrillerSZZ', ('ignore_revs_file_path',), (), True),
+    'my': SZZVariant('szz.my_szz', 'MySZZ', ('ignore_revs_file_path',), ('ast_map_path',), False),
+}
+
+
+def load_variant(szz_name: str) -> type:
+    """
+    Import the class of an SZZ implementation.
+
+    :param str szz_name: name of the implementation in SZZ_VARIANTS
+    :returns type the AbstractSZZ subclass
+    """
+    variant = SZZ_VARIANTS[szz_name]
+    return getattr(importlib.import_module(variant.module), variant.class_name)
+
+
+def find_bic_kwargs(szz_name: str, conf: dict) -> dict:
+    """
+    Select the parameters of find_bic of an SZZ implementation in a configuration, as in the yml files of conf/.
+    Parameters which are not set are left to the defaults of the implementation.
+
+    :param str szz_name: name of the implementation in SZZ_VARIANTS
+    :param dict conf: configuration
+    :returns dict kwargs of find_bic
+    """
+    kwargs = {arg: conf[arg] for arg in SZZ_VARIANTS[szz_name].find_bic_args if conf.get(arg) is not None}
+    if 'detect_move_from_other_files' in kwargs:
+        kwargs['detect_move_from_other_files'] = DetectLineMoved(kwargs['detect_move_from_other_files'])
+    return kwargs
+
+
+class SZZPipeline:
+    """
+    SZZPipeline runs several SZZ implementations on the fix commits of a repository in one pass. The implementations
+    share an SZZSession: the repository is opened once, and the impacted files and blame results are computed once
+    for all of them, so comparing several implementations costs little more than running the most expensive one.
+    """
+
+    def __init__(self, szz_names: List[str], repo_full_name: str, repo_url: str, repos_dir: str = None,
+                 use_temp_dir: bool = True, blame_store: BlameStore = None, **init_kwargs):
+        """
+        :param List[str] szz_names: names of the implementations to run, see SZZ_VARIANTS
+        :param str repo_full_name: full name of the Git repository
+        :param str repo_url: url of the Git repository to clone
+        :param str repos_dir: folder of the cloned repositories
+        :param bool use_temp_dir: work on a copy of the repository in a temp folder
+        :param BlameStore blame_store: on-disk store of blame results, to reuse the blames of previous runs
+        :param **init_kwargs: extra parameters of the implementations, e.g. ast_map_path
+        """
+        unknown = [szz_name for szz_name in szz_names if szz_name not in SZZ_VARIANTS]
+        if unknown:
+            raise ValueError(f'SZZ implementation not found: {", ".join(unknown)}')
+
+        self.session = SZZSession(blame_store)
+        self.szzs = dict()
+        for szz_name in szz_names:
+            kwargs = {arg: init_kwargs[arg] for arg in SZZ_VARIANTS[szz_name].init_args if arg in init_kwargs}
+            self.szzs[szz_name] = load_variant(szz_name)(repo_full_name, repo_url, repos_dir, use_temp_dir,
+                                                         session=self.session, **kwargs)
+
+    def run(self, fix_commit_hash: str, conf: dict, overrides: Dict[str, dict] = None) -> Dict[str, object]:
+        """
+        Run all the implementations on a fix commit.
+
+        :param str fix_commit_hash: hash of fix commit to scan for buggy commits
+        :param dict conf: parameters of get_impacted_files and find_bic, as in the yml files of conf/
+        :param Dict[str, dict] overrides: parameters specific to some implementations, by name
+        :returns Dict[str, object] for each implementation, the hashes of the bug introducing commits (or the result
+            of find_bic for the implementations which do not return commits)
+        """
+        results = dict()
+        for szz_name, szz in self.szzs.items():
+            szz_conf = dict(conf, **(overrides or {}).get(szz_name, {}))
+            imp_files = szz.get_impacted_files(fix_commit_hash=fix_commit_hash,
+                                               file_ext_to_parse=szz_conf.get('file_ext_to_parse'),
+                                               only_deleted_lines=szz_conf.get('only_deleted_lines', True))
+            kwargs = find_bic_kwargs(szz_name, szz_conf)
+            if SZZ_VARIANTS[szz_name].returns_commits:
+                results[szz_name] = [bic.hexsha for bic in szz.iter_bic(fix_commit_hash, imp_files, **kwargs) if bic]
+            else:
+                results[szz_name] = szz.find_bic(fix_commit_hash, imp_files, **kwargs)
+            log.info(f"{szz_name}-szz result: {results[szz_name]}")
+
+        self.session.clear()
+        return results
+
+    def get_szz(self, szz_name: str) -> AbstractSZZ:
+        return self.szzs[szz_name]
@@ -4,14 +4,15 @@ import json
 import subprocess
 import re
 import hashlib
-import git # get diff patch on Windows 
+import sqlite3
+import multiprocessing
 from unidiff import PatchSet
 from io import StringIO
 from log_generation import GitLog
 
 from setting import *
 
-from git_analysis.analyze_git_logs import retrieve_git_logs, retrieve_git_logs_dict, get_ancestors, get_parent_tags, get_son_tags, traverse_affected_versions
+from git_analysis.analyze_git_logs import retrieve_git_logs_dict, get_ancestors, get_parent_tags, get_son_tags
 from data_loader import JAVA_CVE_FIX_COMMITS, C_CVE_FIX_COMMITS, read_cve_commits, REPOS_DIR, JAVA_PROJECTS, C_PROJECTS, ANNOTATED_CVES
 
 repos_dir = REPOS_DIR
@@ -76,46 +77,234 @@ def genereate_hashes_for_patch(repository, commit_id):
     
     return hashes
 
-def identify_duplicate_patch(project):
-    git_logs = retrieve_git_logs(os.path.join(log_dir, project+"-meta.log"), project)
-    
+def split_patched_files(diff_text):
+    """
+    Split the diff of a commit into (path, patch) pairs laid out as str(PatchedFile), so that hashes match
+    the ones of genereate_hashes_for_patch. Returns None when a file has no regular ---/+++ header (renames,
+    binary, mode-only or empty files), as unidiff merges those headers into neighbouring patches.
+    """
+    if diff_text == '':
+        return []
+
+    parts = diff_text.split('\ndiff --git ')
+    patched_files = []
+    for i, part in enumerate(parts):
+        patched_file = part if i == 0 else 'diff --git ' + part
+        # as repository.git.diff strips the final newline, only the last patch may lack it
+        if i < len(parts) - 1:
+            patched_file += '\n'
+
+        header = patched_file.split('\n@@ ', 1)[0].split('\n')
+        source_lines = [l for l in header if l.startswith('--- ')]
+        target_lines = [l for l in header if l.startswith('+++ ')]
+        if len(source_lines) != 1 or len(target_lines) != 1 or any(l.startswith('rename from ') for l in header):
+            return None
+
+        source_file, target_file = source_lines[0][4:], target_lines[0][4:]
+        if '\t' in source_file or '\t' in target_file:
+            return None
+
+        # same as unidiff PatchedFile.path
+        if source_file.startswith('a/'):
+            path = source_file[2:]
+        elif source_file == '/dev/null' and target_file.startswith('b/'):
+            path = target_file[2:]
+        else:
+            path = source_file
+
+        if patched_file.endswith('\n\\ No newline at end of file'):
+            patched_file += '\n'
+        patched_files.append((path, patched_file))
+
+    return patched_files
+
+def hash_commit_patch(commit_record):
+    commit_id, parents, diff_text = commit_record
+    # no parent to diff against, genereate_hashes_for_patch fails on c~1 as well
+    if len(parents) == 0:
+        return commit_id, None
+
+    diff_text = diff_text.strip('\n')
+    patched_files = split_patched_files(diff_text)
+    if patched_files is None:
+        patched_files = [(patched_file.path, str(patched_file)) for patched_file in PatchSet(StringIO(diff_text))]
+
+    hashes = []
+    for file_path, patched_file in patched_files:
+        if not is_target_file(file_path):
+            continue
+
+        content = clear_patched_file(patched_file)
+        hashes.append(hashlib.sha1(content.encode('utf-8', 'ignore')).hexdigest())
+
+    return commit_id, hashes
+
+def iter_patch_log(stdout, chunk_size=1 << 20):
+    """ Yield (commit_id, parents, diff_text) from the output of GitLog.git_log_patch_pipe """
+    buf = b''
+    while True:
+        chunk = stdout.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        records = buf.split(b'\0')
+        buf = records.pop()
+        for record in records:
+            if record != b'':
+                yield parse_patch_record(record)
+
+    if buf.strip() != b'':
+        yield parse_patch_record(buf)
+
+def parse_patch_record(record):
+    header, _, diff_text = record.decode('utf-8', 'ignore').partition('\n')
+    header = header.split()
+    return header[0], header[1:], diff_text
+
+def stream_patch_hashes(project_path, commits=None, n_jobs=None):
+    """
+    Yield (commit_id, hashes) for every commit of the repository (or only the given commits)
+    from a single `git log -p` stream, the patches being normalized and hashed by a process pool.
+    hashes is None for root commits.
+    """
+    proc = GitLog().git_log_patch_pipe(project_path, commits)
+    with proc, multiprocessing.Pool(n_jobs) as pool:
+        for commit_id, hashes in pool.imap(hash_commit_patch, iter_patch_log(proc.stdout), chunksize=64):
+            yield commit_id, hashes
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, 'git log -p')
+
+
+class PatchStore:
+    """
+    SQLite store of the commit -> patch hashes and patch hash -> commits maps of a project.
+    Commit ids and hashes are kept as 20-byte blobs; commit_patch_map and patch_commit_map are
+    read-only views with the same lookups as the former JSON dicts.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS commits (commit_id BLOB PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS commit_patch (commit_id BLOB, pos INTEGER, patch BLOB,
+                                                     PRIMARY KEY (commit_id, pos)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS commit_patch_patch ON commit_patch (patch);
+        ''')
+        self.commit_patch_map = CommitPatchView(self.conn)
+        self.patch_commit_map = PatchCommitView(self.conn)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+
+    def add(self, commit_id, hashes):
+        key = bytes.fromhex(commit_id)
+        self.conn.execute('INSERT OR REPLACE INTO commits VALUES (?)', (key,))
+        self.conn.execute('DELETE FROM commit_patch WHERE commit_id = ?', (key,))
+        self.conn.executemany('INSERT INTO commit_patch VALUES (?, ?, ?)',
+                              [(key, i, bytes.fromhex(h)) for i, h in enumerate(hashes)])
+
+    def hashed_commits(self):
+        return set(row[0].hex() for row in self.conn.execute('SELECT commit_id FROM commits'))
+
+    def import_json(self, commit_patch_map):
+        for commit_id, hashes in commit_patch_map.items():
+            self.add(commit_id, hashes)
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CommitPatchView:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __contains__(self, commit_id):
+        return self.conn.execute('SELECT 1 FROM commits WHERE commit_id = ?', (bytes.fromhex(commit_id),)).fetchone() is not None
+
+    def __getitem__(self, commit_id):
+        if commit_id not in self:
+            raise KeyError(commit_id)
+        rows = self.conn.execute('SELECT patch FROM commit_patch WHERE commit_id = ? ORDER BY pos', (bytes.fromhex(commit_id),))
+        return [row[0].hex() for row in rows]
+
+
+class PatchCommitView:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __contains__(self, patch):
+        return self.conn.execute('SELECT 1 FROM commit_patch WHERE patch = ? LIMIT 1', (bytes.fromhex(patch),)).fetchone() is not None
+
+    def __getitem__(self, patch):
+        rows = self.conn.execute('SELECT commit_id FROM commit_patch WHERE patch = ?', (bytes.fromhex(patch),)).fetchall()
+        if len(rows) == 0:
+            raise KeyError(patch)
+        return [row[0].hex() for row in rows]
+
+
+def patch_map_paths(project):
+    return os.path.join(WORK_DIR, f'data_commit_patch_map/{project}-commit-patch.json'), \
+        os.path.join(WORK_DIR, f'data_commit_patch_map/{project}-patch-commit.json')
+
+def patch_store_path(project):
+    return os.path.join(WORK_DIR, f'data_commit_patch_map/{project}-patch.db')
+
+def open_patch_store(project):
+    """ Open the patch store of a project, importing the JSON maps of older runs on first use """
+    db_path = patch_store_path(project)
+    is_new = not os.path.exists(db_path)
+    store = PatchStore(db_path)
+
+    commit_patch_path, _ = patch_map_paths(project)
+    if is_new and os.path.exists(commit_patch_path):
+        with open(commit_patch_path) as fin:
+            store.import_json(json.load(fin))
+
+    return store
+
+def identify_duplicate_patch(project, commits=None, n_jobs=None, batch_size=10000):
+    """ Hash the patches of all commits (or only the given ones) of a project into its patch store """
+    store = open_patch_store(project)
     project_path = os.path.join(repos_dir, project)
-    repository = git.Repo(project_path)
-
-    commit_patch_map = {}
-    for gl in git_logs:
-        print(gl.commit_id)
-        hashes = genereate_hashes_for_patch(repository, gl.commit_id)
-        if hashes is not None:
-            commit_patch_map[gl.commit_id] = hashes
-    
-    patch_commit_map = {}
-    for commit_id in commit_patch_map:
-        for h in commit_patch_map[commit_id]:
-            if h in patch_commit_map:
-                patch_commit_map[h].append(commit_id)
-            else:
-                patch_commit_map[h] = [commit_id]
-    
-    return commit_patch_map, patch_commit_map
+
+    n = 0
+    for commit_id, hashes in stream_patch_hashes(project_path, commits, n_jobs):
+        if hashes is None:
+            continue
+
+        store.add(commit_id, hashes)
+        n += 1
+        if n % batch_size == 0:
+            print(project, n, 'commits hashed')
+            store.commit()
+
+    store.commit()
+    return store
+
+def update_duplicate_patch(project, commit_ids):
+    """ Hash only the given (new) commits and merge them into the patch store of the project """
+    store = open_patch_store(project)
+    hashed_commits = store.hashed_commits()
+    store.close()
+
+    commits = [c for c in commit_ids if c not in hashed_commits]
+    if len(commits) == 0:
+        return open_patch_store(project)
+    return identify_duplicate_patch(project, commits)
 
 def batch_duplicate_detection(projects):
     # for project in C_PROJECTS:
     for project in projects:
         try:
-            commit_patch_map, patch_commit_map = identify_duplicate_patch(project)
-            with open(f'data_commit_patch_map/{project}-commit-patch.json', 'w') as fout1, \
-                open(f'data_commit_patch_map/{project}-patch-commit.json', 'w') as fout2:
-                json.dump(commit_patch_map, fout1, indent=4)
-                json.dump(patch_commit_map, fout2, indent=4)
+            identify_duplicate_patch(project).close()
         except Exception as e:
             print(project, e)
-        else:
-            pass
-        
-        break
-   
+
 if __name__ == '__main__':
     # Generate hashes for hunks in commits
-    batch_duplicate_detection()
-   
+    batch_duplicate_detection(JAVA_PROJECTS + C_PROJECTS)
@@ -42,14 +42,16 @@ class GitLog:
     }
 
     def __init__(self):
-        self.meta_cmd = 'git log --reverse --all --pretty=format:\"commit: %H%n' \
-                        'parent: %P%n' \
-                        'author: %an%n' \
-                        'author email: %ae%n' \
-                        'time stamp: %at%n' \
-                        'committer: %cn%n' \
-                        'committer email: %ce%n' \
-                        '%B%n\"  '
+        # every record starts with a NUL byte so that commit messages cannot be taken for headers
+        self.meta_format = '--pretty=format:\"%x00commit: %H%n' \
+                           'parent: %P%n' \
+                           'author: %an%n' \
+                           'author email: %ae%n' \
+                           'time stamp: %at%n' \
+                           'committer: %cn%n' \
+                           'committer email: %ce%n' \
+                           '%B%n\"  '
+        self.meta_cmd = 'git log --reverse --all ' + self.meta_format
         self.numstat_cmd = 'git log --pretty=format:\"commit: %H\" --numstat -M --all --reverse '
         self.namestat_cmd = 'git log  --pretty=format:\"commit: %H\" --name-status -M --all --reverse '
         self.merge_numstat_cmd = 'git log --pretty=oneline --numstat -m --merges -M --all --reverse '
@@ -62,7 +64,56 @@ class GitLog:
         cmd = getattr(self, GitLog.commands.get('meta'))
         out = subprocess.check_output(cmd, shell=True).decode('utf-8', errors='ignore')
         return out
+
+    @wrapper_change_path
+    def git_log_pipe(self, project_path):
+        """ Start the meta log command and return the process, its stdout can be read incrementally """
+        os.chdir(project_path)
+
+        cmd = getattr(self, GitLog.commands.get('meta'))
+        return subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+                                encoding='utf-8', errors='ignore')
     
+    @wrapper_change_path
+    def git_log_patch_pipe(self, project_path, commits=None):
+        """
+        Start a `git log -p` over the whole history (or only the given commits) and return the process.
+        Every commit starts with a NUL byte followed by its id and parents, merges are diffed against
+        their first parent as `git diff c~1 c` does.
+        """
+        os.chdir(project_path)
+
+        cmd = 'git log -p --no-color --no-ext-diff --ignore-blank-lines --ignore-space-at-eol ' \
+              '--diff-merges=first-parent --format="%x00%H %P" '
+        cmd += '--all' if commits is None else '--no-walk --stdin'
+        proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        if commits is not None:
+            proc.stdin.write(''.join(c + '\n' for c in commits).encode('utf-8'))
+        proc.stdin.close()
+        return proc
+
+    @wrapper_change_path
+    def git_log_range(self, project_path, new_revs, old_revs):
+        """ Meta log of the commits reachable from new_revs but not from old_revs (git log old..new) """
+        os.chdir(project_path)
+
+        cmd = 'git log --reverse --stdin ' + self.meta_format
+        revs = ''.join(r + '\n' for r in new_revs) + ''.join('^' + r + '\n' for r in old_revs)
+        out = subprocess.check_output(cmd, shell=True, input=revs.encode('utf-8')).decode('utf-8', errors='ignore')
+        return out
+
+    @wrapper_change_path
+    def git_refs(self, project_path):
+        os.chdir(project_path)
+
+        # same line format as git_tag_refs, for every ref plus HEAD
+        cmd = 'git for-each-ref --format="%(objecttype) %(objectname) %(*objecttype) %(*objectname) %(refname)"'
+        out = subprocess.check_output(cmd, shell=True).decode('utf-8', errors='ignore')
+        head = subprocess.run('git rev-parse --verify -q HEAD', shell=True, stdout=subprocess.PIPE).stdout.decode('utf-8').strip()
+        if head != '':
+            out += 'commit {head}   HEAD\n'.format(head=head)
+        return out
+
     @wrapper_change_path
     def git_tag(self, project_path):
         os.chdir(project_path)
@@ -78,7 +129,16 @@ class GitLog:
         cmd = 'git show {tag} --pretty=format:"commit: %H%ntimestamp: %ct%n"'.format(tag=tag)
         out = subprocess.check_output(cmd, shell=True).decode('utf-8', errors='ignore')
         return out
-    
+
+    @wrapper_change_path
+    def git_tag_refs(self, project_path):
+        os.chdir(project_path)
+
+        # one line per tag: object type/id, peeled type/id (annotated tags only) and tag name
+        cmd = 'git for-each-ref refs/tags --format="%(objecttype) %(objectname) %(*objecttype) %(*objectname) %(refname:short)"'
+        out = subprocess.check_output(cmd, shell=True).decode('utf-8', errors='ignore')
+        return out
+
     def git_diff(self, project_path, commit_id):
         repository = git.Repo(project_path)
         try:
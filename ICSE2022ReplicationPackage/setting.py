@@ -17,4 +17,6 @@ DEFAULT_MAX_CHANGE_SIZE = sys.maxsize
 
 AST_MAP_PATH = os.path.join(WORK_DIR, 'ASTMapEval_jar')
 
-LOG_DIR = os.path.join(WORK_DIR, 'GitLogs')
\ No newline at end of file
+LOG_DIR = os.path.join(WORK_DIR, 'GitLogs')
+VERSION_INDEX_DIR = os.path.join(WORK_DIR, 'data_version_index')
+BLAME_STORE_PATH = os.path.join(WORK_DIR, 'data_blame_store', 'blames.db')  # SZZ方法共享的git blame结果
@@ -0,0 +1,104 @@
+"""
+Pre-blame the labeled fixing commits in parallel, so that the SZZ methods compared by evaluate.py (see run_szz in
+main.py) read the git blame results from the blame store (BLAME_STORE_PATH) instead of computing them again.
+Only the first blame of each method is pre-computed, the next ones (e.g. ignoring the commits found by a blame)
+depend on its results and are stored by the first run.
+
+    python warmup_blames.py                          # all the projects, methods b ag ma r l ra pd my
+    python warmup_blames.py -m b ag ma -p linux -j 8
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+import traceback
+
+from setting import *
+
+sys.path.append(os.path.join(SZZ_FOLDER, 'tools/pyszz/'))
+
+from szz.b_szz import BaseSZZ
+from szz.core.abstract_szz import DetectLineMoved
+from szz.core.blame_store import BlameStore
+from szz.core.session import SZZSession
+
+from data_loader import load_annotated_commits
+from main import FILE_EXT_TO_PARSE, METHOD_OVERRIDES
+
+# parameters of the first blame of each method, at the parent of the fixing commit
+MOVE_DETECTION = dict(ignore_whitespaces=True, detect_move_within_file=True,
+                      detect_move_from_other_files=DetectLineMoved.SAME_COMMIT)
+FIRST_BLAME_PARAMS = {
+    'b': dict(),
+    'ag': dict(ignore_whitespaces=True),
+    'ma': MOVE_DETECTION,
+    'r': MOVE_DETECTION,
+    'l': MOVE_DETECTION,
+    'ra': MOVE_DETECTION,
+    'pd': dict(ignore_whitespaces=True),
+    'my': dict(),
+}
+
+
+def warmup_commits(task):
+    """
+    Blame the impacted files of fixing commits of a project with the parameters of each method, the blames that
+    are already in the store are skipped.
+    """
+    project, commits, methods = task
+    blame_store = BlameStore(BLAME_STORE_PATH)
+    session = SZZSession(blame_store)
+    szz = BaseSZZ(repo_full_name=project, repo_url=None, repos_dir=REPOS_DIR, use_temp_dir=False, session=session)
+
+    blames = 0
+    for commit in commits:
+        for method in methods:
+            file_ext_to_parse = METHOD_OVERRIDES.get(method, {}).get('file_ext_to_parse', FILE_EXT_TO_PARSE)
+            blame_kwargs = szz._blame_kwargs(**FIRST_BLAME_PARAMS[method])
+            try:
+                imp_files = szz.get_impacted_files(fix_commit_hash=commit, file_ext_to_parse=file_ext_to_parse,
+                                                   only_deleted_lines=True)
+                for imp_file in imp_files:
+                    szz._blame_entries('{commit_id}^'.format(commit_id=commit), imp_file.file_path,
+                                       szz._parse_line_ranges(imp_file.modified_lines), blame_kwargs)
+                    blames += 1
+            except Exception:
+                print(project, commit, method)
+                traceback.print_exc()
+        session.clear()
+
+    blame_store.close()
+    return project, len(commits), blames
+
+
+def warmup_blames(project_commits, methods, n_jobs=None, chunk_size=8):
+    """
+    Fill the blame store for the fixing commits of the given projects, the commits being split in chunks blamed
+    by a process pool.
+    """
+    # create the store before the workers open it
+    BlameStore(BLAME_STORE_PATH).close()
+
+    tasks = list()
+    for project, commits in project_commits.items():
+        if not os.path.isdir(os.path.join(REPOS_DIR, project)):
+            print('Repository not found:', project)
+            continue
+        for i in range(0, len(commits), chunk_size):
+            tasks.append((project, commits[i:i + chunk_size], methods))
+
+    with multiprocessing.Pool(n_jobs) as pool:
+        for project, n_commits, blames in pool.imap_unordered(warmup_commits, tasks):
+            print(f'{project}: {n_commits} commits, {blames} blames')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pre-blame the labeled fixing commits into the blame store')
+    parser.add_argument('-m', '--methods', nargs='+', default=list(FIRST_BLAME_PARAMS),
+                        choices=list(FIRST_BLAME_PARAMS), help='SZZ methods to pre-blame for')
+    parser.add_argument('-p', '--projects', nargs='+', help='projects to pre-blame (default: all)')
+    parser.add_argument('-j', '--jobs', type=int, help='number of processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    project_commits = load_annotated_commits(args.projects)
+    warmup_blames(project_commits, args.methods, args.jobs)